@@ -3,15 +3,31 @@ VisionQA Analyst Agent
 Working version with correct Gemini model names (January 2026)
 """
 
+import asyncio
+import copy
+import hashlib
 import os
+import shutil
+import tempfile
 import time
-import re
 import json
 from pathlib import Path
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
+from agents.scheduler import get_default_scheduler
+from utils import metrics
+from utils.baseline import BaselineStore, blended_score, diff_recordings, reconcile_issues
+from utils.cache import AnalysisCache, UploadRegistry, file_sha256
+from utils.jsonstream import IssueStreamParser
+from utils.keyframes import extract_keyframes, frame_fingerprints, video_duration
+from utils.results import RESULT_SCHEMA, AuditResult, Issue, parse_audit
+from utils.segments import (SEGMENT_CONCURRENCY, SEGMENT_RETRIES, SEGMENT_SECONDS,
+                            merge_segment_results, plan_segments, shift_issues)
+from utils.transcode import cut_segment, ffmpeg_available
+from utils.timecode import format_timestamp
+
 load_dotenv()
 
 MODEL_FALLBACK_CHAIN = [
@@ -20,165 +36,568 @@ MODEL_FALLBACK_CHAIN = [
     "gemini-3-flash-preview",     
 ]
 
+AUDIT_PROMPT = """
+    You are a strict UI/UX Lead Auditor. Your job is to critique the user interface in this video.
+    Do NOT just look for functional crashes. Look for VISUAL CLUTTER, BAD ALIGNMENT, and DATED DESIGN.
+
+    Analyze the video against these "Usability Heuristics":
+    1. Aesthetic and Minimalist Design: Is the screen cluttered? Is there too much information?
+    2. Consistency: Do fonts and colors clash?
+    3. Visibility: Is text too small or low contrast?
+
+    If the website looks chaotic, dated, or overwhelming (like a catalog from the 1990s), FLAG IT AS A HIGH SEVERITY ISSUE.
+
+    Return valid JSON with this EXACT structure:
+    {
+        "description": "A 1-sentence summary of what the site is",
+        "ux_score": 5,  // Integer 1-10 (1 is unreadable, 10 is perfect)
+        "issues": [
+            {
+                "timestamp": "00:05",
+                "severity": "High",
+                "issue": "Brief name of issue",
+                "details": "Explanation of why this is bad"
+            }
+        ]
+    }
+    """
+
+KEYFRAME_PROMPT = """
+    The input is NOT a video but a sequence of keyframes captured from a screen recording
+    of a website. Near-duplicate frames were removed. Each image is preceded by a label
+    "Frame at MM:SS" giving its time in the original recording: use that label as the
+    "timestamp" of any issue you see in it.
+    """ + AUDIT_PROMPT.replace("in this video", "in these frames").replace("Analyze the video", "Analyze the frames")
+
+# Upload readiness polling: 0.5s, 1s, 2s, 4s, 8s, 8s, ... up to the timeout
+READY_POLL_INITIAL_SECONDS = 0.5
+READY_POLL_MAX_SECONDS = 8
+READY_TIMEOUT_SECONDS = 300
+
+# Rough token estimates, used to pace requests before the real usage is known
+VIDEO_REQUEST_TOKENS = 20_000
+FRAME_TOKENS = 300
+
+# Per-call timeouts for the async client
+UPLOAD_TIMEOUT_SECONDS = 300
+POLL_TIMEOUT_SECONDS = 30
+GENERATE_TIMEOUT_SECONDS = 600
+
+# Part of the analysis cache key: changing any of these invalidates old results
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "response_mime_type": "application/json",
+    "response_schema": RESULT_SCHEMA,
+}
+
+async def _aiter(frames):
+    """Accepts both async iterables (live capture) and plain lists of frames."""
+    if hasattr(frames, "__aiter__"):
+        async for frame in frames:
+            yield frame
+    else:
+        for frame in frames:
+            yield frame
+
+def _estimate_tokens(contents):
+    """Pre-call guess for the token bucket; corrected from usage_metadata afterwards."""
+    tokens = 0
+    for part in contents:
+        if isinstance(part, str):
+            tokens += len(part) // 4
+        elif getattr(part, "inline_data", None) is not None:
+            tokens += FRAME_TOKENS
+        else:
+            tokens += VIDEO_REQUEST_TOKENS
+    return tokens
+
+def _record_usage(model_name, usage):
+    """Token counters from the response's usage_metadata, per model."""
+    if usage is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("output", "candidates_token_count"),
+                       ("thinking", "thoughts_token_count"), ("cached", "cached_content_token_count")):
+        metrics.count("tokens", getattr(usage, attr, None) or 0, model=model_name, kind=kind)
+
+class _StreamedResponse:
+    """What a streamed call hands back to the scheduler: full text + final usage."""
+
+    def __init__(self, text, usage_metadata):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+def _print_streamed_issue(issue, number):
+    icon = "🔴" if issue.severity == "High" else "🟡" if issue.severity == "Medium" else "🟢"
+    print(f"   ⚡ {number}. {icon} [{issue.severity}] {issue.timestamp} {issue.issue}")
+
 class GeminiAnalyst:
+    """
+    Async-first Gemini client. The *_async methods never block the event loop,
+    so many analyses can share one loop with Playwright sessions. The plain
+    methods are thin asyncio.run() wrappers for one-shot scripts.
+    """
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, use_cache=True, scheduler=None, client=None, uploads=None):
+        # `client` replaces genai.Client (e.g. the offline stand-in in benchmarks/)
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
-        if not self.api_key:
+        if not self.api_key and client is None:
             raise ValueError(" GEMINI_API_KEY not found in .env file")
         
         # Timeout to prevent "503 Overloaded" on client side
-        self.client = genai.Client(
+        self.client = client or genai.Client(
             api_key=self.api_key,
             http_options={'timeout': 600000}  # 10 minutes
         )
-    
-    def upload_video(self, video_path):
+        self.cache = AnalysisCache() if use_cache else None
+        self.uploads = uploads or UploadRegistry()
+        # One scheduler per process, so concurrent analyses share the quota view
+        self.scheduler = scheduler or get_default_scheduler(MODEL_FALLBACK_CHAIN)
+
+    def with_cache(self, use_cache):
+        """This analyst, or a copy sharing its client, uploads and scheduler with the cache switched."""
+        if use_cache == (self.cache is not None):
+            return self
+        analyst = copy.copy(self)
+        analyst.cache = AnalysisCache() if use_cache else None
+        return analyst
+
+    # --- Sync wrappers ---
+
+    def analyze(self, video_path, keyframes=False, stream=False, on_issue=None):
+        return asyncio.run(self.analyze_async(video_path, keyframes, stream, on_issue))
+
+    def analyze_segmented(self, video_path, keyframes=False):
+        return asyncio.run(self.analyze_segmented_async(video_path, keyframes))
+
+    def upload_video(self, video_path, video_hash=None):
+        return asyncio.run(self.upload_video_async(video_path, video_hash))
+
+    def analyze_video_full(self, video_file):
+        return asyncio.run(self.analyze_video_full_async(video_file))
+
+    # --- Async API ---
+
+    async def analyze_async(self, video_path, keyframes=False, stream=False, on_issue=None):
+        """
+        Full pipeline for one recording: cache lookup -> upload -> analysis -> parse.
+        A cache hit returns the parsed result without touching the API.
+        With keyframes=True only deduplicated, timestamped frames are sent.
+        With stream=True each issue is printed (and passed to on_issue) as soon
+        as the model has finished writing it.
+        """
+        prompt = KEYFRAME_PROMPT if keyframes else AUDIT_PROMPT
+        cache_keys = {}
+        with metrics.span("hash"):
+            video_hash = await asyncio.to_thread(file_sha256, video_path)
+        if self.cache is not None:
+            cache_keys = {
+                model: self.cache.make_key(video_hash, prompt, model, GENERATION_CONFIG)
+                for model in MODEL_FALLBACK_CHAIN
+            }
+            cached = self.cache.get(*cache_keys.values())
+            metrics.count("cache_lookups", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                print(f" Cache hit for {Path(video_path).name}, skipping upload and analysis.")
+                return AuditResult.from_dict(cached)
+
+        if keyframes:
+            contents = await self._keyframe_contents(video_path)
+        else:
+            video_file = await self.upload_video_async(video_path, video_hash)
+            contents = self._video_contents(video_file)
+        model_name, result = await self._generate_result_async(contents, stream, on_issue)
+
+        if self.cache is not None:
+            self.cache.put(cache_keys[model_name], result.to_dict(), model=model_name)
+        return result
+
+    async def analyze_segmented_async(self, video_path, keyframes=False,
+                                      max_concurrency=SEGMENT_CONCURRENCY, retries=SEGMENT_RETRIES):
+        """
+        Long recordings: cut into overlapping windows, analyze them concurrently
+        (at most max_concurrency at once) and merge. A failing window is retried
+        on its own; if it keeps failing the rest of the result is still returned.
+        """
+        duration = await asyncio.to_thread(video_duration, video_path)
+        segments = plan_segments(duration)
+        if len(segments) == 1 or not ffmpeg_available():
+            return await self.analyze_async(video_path, keyframes)
+
+        print(f" Segmented analysis: {len(segments)} windows over {duration:.0f}s")
+        results = await self._analyze_windows_async(video_path, segments, keyframes, max_concurrency, retries)
+        if all(r is None for r in results):
+            raise Exception(" All segments failed.")
+        merged = merge_segment_results([r.to_dict() if r else None for r in results], segments)
+        return AuditResult.from_dict(merged)
+
+    async def _analyze_windows_async(self, video_path, windows, keyframes=False,
+                                     max_concurrency=SEGMENT_CONCURRENCY, retries=SEGMENT_RETRIES):
+        """
+        Cuts each (start, end) window out of the recording and analyzes them
+        concurrently. Returns one AuditResult per window (window-relative
+        timestamps), or None for a window that kept failing.
+        """
+        limit = asyncio.Semaphore(max_concurrency)
+        segment_dir = Path(tempfile.mkdtemp(prefix="segments_", dir=Path(video_path).parent))
+
+        async def run_segment(index, start, end):
+            async with limit:
+                segment_path = segment_dir / f"segment_{index:03d}.mp4"
+                for attempt in range(retries + 1):
+                    try:
+                        if not segment_path.exists():
+                            await cut_segment(video_path, segment_path, start, end - start)
+                        return await self.analyze_async(segment_path, keyframes)
+                    except Exception as e:
+                        print(f"   Segment {index} ({start:.0f}-{end:.0f}s) failed "
+                              f"(attempt {attempt + 1}/{retries + 1}): {e}")
+                        if attempt < retries:
+                            await asyncio.sleep(2 ** attempt)
+                return None
+
+        try:
+            return await asyncio.gather(*(run_segment(i, start, end) for i, (start, end) in enumerate(windows)))
+        finally:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+
+    async def analyze_incremental_async(self, url, video_path, keyframes=False, variant="", baselines=None):
+        """
+        Re-audit against the URL's baseline: nothing visibly changed -> the old
+        result is reused without calling Gemini; some windows changed -> only
+        those are analyzed and merged with the carried-over issues; most of it
+        changed (or no baseline / no ffmpeg) -> a full analysis. Issues are
+        labelled new / carried, and vanished ones are listed as resolved.
+        """
+        baselines = baselines or BaselineStore()
+        with metrics.span("fingerprint"):
+            duration = await asyncio.to_thread(video_duration, video_path)
+            fingerprints = await asyncio.to_thread(frame_fingerprints, video_path)
+        baseline = baselines.load(url, variant)
+
+        if baseline is None:
+            print(" No baseline for this URL yet; running a full analysis.")
+            result = await self.analyze_async(video_path, keyframes)
+            result.extra["incremental"] = {"mode": "baseline"}
+            baselines.save(url, fingerprints, result.to_dict(), duration, variant)
+            return result
+
+        diff = diff_recordings(baseline["fingerprints"], fingerprints, duration)
+        previous = AuditResult.from_dict(baseline["result"])
+        previous_issues = [i.to_dict() for i in previous.issues]
+        print(f" Re-audit: {diff.changed_fraction:.0%} of frames changed since {baseline.get('saved', 'last run')}")
+
+        if diff.unchanged:
+            print(" Nothing meaningful changed; reusing the previous result (no Gemini call).")
+            metrics.count("incremental", mode="unchanged")
+            diff.windows = []
+            issues, resolved = reconcile_issues(previous_issues, [], diff)
+            data = {**previous.to_dict(), "issues": issues}
+            mode = "unchanged"
+            complete = False
+        else:
+            if diff.full or not ffmpeg_available():
+                diff.windows = [(0.0, duration)]
+                fresh = [await self.analyze_async(video_path, keyframes)]
+                mode = "full"
+            else:
+                print(f" Analyzing {len(diff.windows)} changed window(s), "
+                      f"{diff.covered_seconds:.0f}s of {duration:.0f}s")
+                fresh = await self._analyze_windows_async(video_path, diff.windows, keyframes)
+                if all(r is None for r in fresh):
+                    raise Exception(" All changed windows failed.")
+                mode = "partial"
+            metrics.count("incremental", mode=mode)
+
+            analyzed = diff.keep_analyzed(fresh)
+            complete = len(analyzed) == len(fresh)
+            fresh_issues, scores = [], []
+            for window_result, (start, end) in analyzed:
+                fresh_issues.extend(shift_issues([i.to_dict() for i in window_result.issues], start, end))
+                scores.append((window_result.ux_score, end - start))
+            fresh_score = (round(sum(s * w for s, w in scores) / sum(w for _, w in scores))
+                           if scores and sum(w for _, w in scores) else None)
+
+            issues, resolved = reconcile_issues(previous_issues, fresh_issues, diff)
+            data = {
+                **previous.to_dict(),
+                "ux_score": blended_score(previous.ux_score, fresh_score, diff),
+                "issues": issues,
+            }
+            if mode == "full":
+                data["description"] = fresh[0].description
+
+        data["resolved_issues"] = resolved
+        data["incremental"] = {
+            "mode": mode,
+            "changed_fraction": round(diff.changed_fraction, 3),
+            "windows": [[format_timestamp(a), format_timestamp(b)] for a, b in diff.windows],
+            "baseline_saved": baseline.get("saved"),
+        }
+        result = AuditResult.from_dict(data)
+        # The baseline moves only when every changed frame was re-analyzed: an
+        # unchanged run keeps comparing against the same reference (so small
+        # drifts add up), and a failed window is retried next time
+        if mode == "unchanged":
+            baselines.touch(url, variant)
+        elif complete:
+            baselines.save(url, fingerprints, result.to_dict(), duration, variant)
+        else:
+            print(" Some windows failed; keeping the previous baseline so they are re-analyzed next run.")
+        return result
+
+    async def upload_video_async(self, video_path, video_hash=None):
+        """
+        Uploads a recording (or reuses a still-ACTIVE earlier upload of the same
+        content) and returns the remote file once it can be used.
+        """
         video_path = Path(video_path)
+        video_hash = video_hash or await asyncio.to_thread(file_sha256, video_path)
+
+        started = time.perf_counter()
+        remote_name = self.uploads.get(video_hash)
+        if remote_name:
+            try:
+                uploaded_file = await asyncio.wait_for(
+                    self.client.aio.files.get(name=remote_name), POLL_TIMEOUT_SECONDS)
+                if uploaded_file.state.name == "ACTIVE":
+                    print(f" Reusing upload: {remote_name} ({video_path.name})")
+                    return uploaded_file
+            except Exception:
+                pass  # Deleted or expired server-side; upload again
+            self.uploads.forget(video_hash)
+
         print(f" Uploading: {video_path.name}...")
-        
-        uploaded_file = self.client.files.upload(file=str(video_path))
-        
+        with metrics.span("upload"):
+            uploaded_file = await asyncio.wait_for(
+                self.client.aio.files.upload(file=str(video_path)), UPLOAD_TIMEOUT_SECONDS)
+        upload_s = time.perf_counter() - started
+        metrics.count("uploaded_bytes", video_path.stat().st_size)
+
+        with metrics.span("ready_wait"):
+            uploaded_file = await self._wait_until_active_async(uploaded_file)
+        ready_s = time.perf_counter() - started - upload_s
+
+        expires = uploaded_file.expiration_time.timestamp() if uploaded_file.expiration_time else None
+        self.uploads.put(video_hash, uploaded_file.name, expires)
+
+        print(f"\n Video Active: {uploaded_file.name} (upload {upload_s:.1f}s, ready after {ready_s:.1f}s)")
+        return uploaded_file
+
+    async def _wait_until_active_async(self, uploaded_file):
+        """Polls with bounded exponential backoff; returns as soon as the file is ACTIVE."""
+        delay = READY_POLL_INITIAL_SECONDS
+        deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+
         while uploaded_file.state.name == "PROCESSING":
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f" Video still processing after {READY_TIMEOUT_SECONDS}s.")
             print(".", end="", flush=True)
-            time.sleep(2)
-            uploaded_file = self.client.files.get(name=uploaded_file.name)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, READY_POLL_MAX_SECONDS)
+            uploaded_file = await asyncio.wait_for(
+                self.client.aio.files.get(name=uploaded_file.name), POLL_TIMEOUT_SECONDS)
 
         if uploaded_file.state.name == "FAILED":
             raise Exception(" Video processing failed.")
-
-        print(f"\n Video Active: {uploaded_file.name}")
-        
-        # Wait for file propagation across Google's regions
-        print(" Letting file propagate (10s)...")
-        time.sleep(10) 
-        
         return uploaded_file
 
-    def analyze_video_full(self, video_file):
+    async def analyze_video_full_async(self, video_file):
         """
-        Analyzes video with aggressive backoff and STRICT JSON enforcement
+        Analyzes an already-uploaded video; returns an AuditResult.
         """
-        print(f" Analyzing video content...")
-        
-        prompt = """
-        You are a strict UI/UX Lead Auditor. Your job is to critique the user interface in this video.
-        Do NOT just look for functional crashes. Look for VISUAL CLUTTER, BAD ALIGNMENT, and DATED DESIGN.
-
-        Analyze the video against these "Usability Heuristics":
-        1. Aesthetic and Minimalist Design: Is the screen cluttered? Is there too much information?
-        2. Consistency: Do fonts and colors clash?
-        3. Visibility: Is text too small or low contrast?
-
-        If the website looks chaotic, dated, or overwhelming (like a catalog from the 1990s), FLAG IT AS A HIGH SEVERITY ISSUE.
-
-        Return valid JSON with this EXACT structure:
-        {
-            "description": "A 1-sentence summary of what the site is",
-            "ux_score": 5,  // Integer 1-10 (1 is unreadable, 10 is perfect)
-            "issues": [
-                {
-                    "timestamp": "00:05",
-                    "severity": "High",
-                    "issue": "Brief name of issue",
-                    "details": "Explanation of why this is bad"
-                }
-            ]
-        }
+        _, result = await self._generate_result_async(self._video_contents(video_file))
+        return result
+
+    def _video_contents(self, video_file):
+        return [
+            types.Part.from_uri(
+                file_uri=video_file.uri,
+                mime_type=video_file.mime_type
+            ),
+            AUDIT_PROMPT
+        ]
+
+    async def _keyframe_contents(self, video_path):
+        """Decodes the recording off-loop and interleaves 'Frame at MM:SS' labels with JPEGs."""
+        with metrics.span("keyframes"):
+            frames = await asyncio.to_thread(extract_keyframes, video_path)
+        if not frames:
+            raise Exception(" No frames could be decoded from the recording.")
+
+        frame_bytes = sum(len(frame.jpeg) for frame in frames)
+        video_bytes = Path(video_path).stat().st_size
+        metrics.count("uploaded_bytes", frame_bytes)
+        print(f" Keyframes: {len(frames)} frames, {frame_bytes / 1e6:.2f} MB "
+              f"(video was {video_bytes / 1e6:.2f} MB)")
+
+        contents = []
+        for frame in frames:
+            contents.append(f"Frame at {format_timestamp(frame.timestamp)}:")
+            contents.append(types.Part.from_bytes(data=frame.jpeg, mime_type="image/jpeg"))
+        contents.append(KEYFRAME_PROMPT)
+        return contents
+
+    async def analyze_frames_async(self, frames, stream=False, on_issue=None):
+        """
+        Analyzes a stream of Keyframes (e.g. BrowserRecorder.stream_screenshots).
+        Frames are added to the request as they arrive, so decoding/encoding
+        overlaps with capture; the model call starts once the stream ends.
         """
+        contents = []
+        digest = hashlib.sha256(KEYFRAME_PROMPT.encode("utf-8"))
+        frame_bytes = 0
+        async for frame in _aiter(frames):
+            label = f"Frame at {format_timestamp(frame.timestamp)}:"
+            contents.append(label)
+            contents.append(types.Part.from_bytes(data=frame.jpeg, mime_type="image/jpeg"))
+            digest.update(label.encode("utf-8"))
+            digest.update(frame.jpeg)
+            frame_bytes += len(frame.jpeg)
 
-        for i, model_name in enumerate(MODEL_FALLBACK_CHAIN):
-            try:
-                print(f"   Attempting with {model_name}...")
-                
-                # FORCE JSON MODE
-                # Output ONLY JSON. No Markdown."
-                response = self.client.models.generate_content(
+        if not contents:
+            raise Exception(" No frames were captured.")
+        print(f" Frames received: {len(contents) // 2} ({frame_bytes / 1e6:.2f} MB)")
+        metrics.count("uploaded_bytes", frame_bytes)
+
+        cache_keys = {}
+        if self.cache is not None:
+            cache_keys = {
+                model: self.cache.make_key(digest.hexdigest(), KEYFRAME_PROMPT, model, GENERATION_CONFIG)
+                for model in MODEL_FALLBACK_CHAIN
+            }
+            cached = self.cache.get(*cache_keys.values())
+            metrics.count("cache_lookups", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                print(" Cache hit for captured frames, skipping analysis.")
+                return AuditResult.from_dict(cached)
+
+        contents.append(KEYFRAME_PROMPT)
+        model_name, result = await self._generate_result_async(contents, stream, on_issue)
+
+        if self.cache is not None:
+            self.cache.put(cache_keys[model_name], result.to_dict(), model=model_name)
+        return result
+
+    async def _generate_result_async(self, contents, stream=False, on_issue=None):
+        """
+        Generates and parses into an AuditResult. Only output that cannot even
+        be partially salvaged costs a second request.
+        """
+        model_name, result_text = await self._generate_async(contents, stream, on_issue)
+        try:
+            result = parse_audit(result_text)
+        except ValueError as e:
+            print(f" Unusable response ({e}); asking once more...")
+            model_name, result_text = await self._generate_async(contents)
+            result = parse_audit(result_text)
+        if result.extra.get("salvaged"):
+            print(f" Response was cut short; kept {len(result.issues)} complete issues.")
+        return model_name, result
+
+    async def _generate_async(self, contents, stream=False, on_issue=None):
+        """Runs the call through the shared model scheduler; returns (model_name, response_text)."""
+        print(f" Analyzing video content...")
+        est_tokens = _estimate_tokens(contents)
+        config = types.GenerateContentConfig(**GENERATION_CONFIG)
+        started = time.perf_counter()
+
+        async def call(model_name):
+            # FORCE JSON MODE
+            # Output ONLY JSON. No Markdown."
+            return await asyncio.wait_for(
+                self.client.aio.models.generate_content(
                     model=model_name,
-                    contents=[
-                        types.Part.from_uri(
-                            file_uri=video_file.uri,
-                            mime_type=video_file.mime_type
-                        ),
-                        prompt
-                    ],
-                    config=types.GenerateContentConfig(
-                        temperature=0.2,
-                        response_mime_type="application/json"  
-                    )
-                )
-                print(f"    Success with {model_name}!")
-                return response.text
-                
-            except Exception as e:
-                error_msg = str(e)
-                print(f"    {model_name} failed.")
-                
-                # Handle Rate Limits (429)
-                if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-                    print(f"      ↳ Quota limit hit. Sleeping 30s...")
-                    time.sleep(30)
-                
-                # Handle Overload (503)
-                elif "503" in error_msg or "overloaded" in error_msg:
-                    print(f"      ↳ Server overloaded. Sleeping 5s...")
-                    time.sleep(5)
-                
-                # If last model, crash
-                if i == len(MODEL_FALLBACK_CHAIN) - 1:
-                    raise Exception(f" All models failed. Last error: {error_msg}")
-                
-                print("      ↳ Switching to next model...")
-                continue
+                    contents=contents,
+                    config=config
+                ),
+                GENERATE_TIMEOUT_SECONDS
+            )
+
+        emitted = set()   # A retried stream must not print the same issue twice
+        first_issue_s = None
 
-        return None
+        async def call_streaming(model_name):
+            nonlocal first_issue_s
+            parser = IssueStreamParser()
+            chunks, usage = [], None
+            response_stream = await self.client.aio.models.generate_content_stream(
+                model=model_name,
+                contents=contents,
+                config=config
+            )
+            async for chunk in response_stream:
+                usage = chunk.usage_metadata or usage
+                if not chunk.text:
+                    continue
+                chunks.append(chunk.text)
+                for raw in parser.feed(chunk.text):
+                    issue = Issue.from_dict(raw)
+                    key = (issue.timestamp, issue.issue)
+                    if key in emitted:
+                        continue
+                    emitted.add(key)
+                    if first_issue_s is None:
+                        first_issue_s = time.perf_counter() - started
+                    _print_streamed_issue(issue, len(emitted))
+                    if on_issue:
+                        on_issue(issue)
+            return _StreamedResponse("".join(chunks), usage)
+
+        if stream:
+            model_name, response = await self.scheduler.run(
+                lambda m: asyncio.wait_for(call_streaming(m), GENERATE_TIMEOUT_SECONDS), est_tokens)
+            total_s = time.perf_counter() - started
+            first = f"{first_issue_s:.1f}s" if first_issue_s is not None else "n/a"
+            print(f" Time to first issue: {first} | total analysis: {total_s:.1f}s")
+            if first_issue_s is not None:
+                metrics.observe("first_issue", first_issue_s, model=model_name)
+        else:
+            model_name, response = await self.scheduler.run(call, est_tokens)
+        metrics.observe("inference", time.perf_counter() - started, model=model_name)
+        _record_usage(model_name, getattr(response, "usage_metadata", None))
+        return model_name, response.text
 
 def main():
-    import sys
-    
-    if len(sys.argv) < 2:
-        print("Usage: python -m agents.analyst <video_path>")
-        return
-    
-    video_path = sys.argv[1]
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m agents.analyst")
+    parser.add_argument("video_path", help="Recording to analyze")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore cached results and always call Gemini")
+    parser.add_argument("--keyframes", action="store_true",
+                        help="Send deduplicated keyframes instead of the full video")
+    parser.add_argument("--segmented", action="store_true",
+                        help=f"Analyze long videos as overlapping ~{SEGMENT_SECONDS}s windows in parallel")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream the response and print each issue as soon as it is complete")
+    args = parser.parse_args()
+
+    video_path = args.video_path
     
     try:
-        analyst = GeminiAnalyst()
-        video_file = analyst.upload_video(video_path)
-        result_text = analyst.analyze_video_full(video_file)
-        
-        # Clean up Markdown just in case (though JSON mode usually prevents it)
-        clean_json = result_text.strip()
-        if clean_json.startswith('```'):
-            clean_json = re.sub(r'^```(?:json)?\s*', '', clean_json)
-            clean_json = re.sub(r'\s*```$', '', clean_json)
-        
-        # Parse Results
-        data = json.loads(clean_json)
+        analyst = GeminiAnalyst(use_cache=not args.no_cache)
+        if args.segmented:
+            data = analyst.analyze_segmented(video_path, keyframes=args.keyframes)
+        else:
+            data = analyst.analyze(video_path, keyframes=args.keyframes, stream=args.stream)
         
         print("\n" + "=" * 70)
         print(" VISIONQA ANALYSIS REPORT")
         print("=" * 70)
         
-        print(f"\n Description: {data.get('description', 'N/A')}")
-        print(f" UX Score: {data.get('ux_score', '?')}/10")
+        print(f"\n Description: {data.description}")
+        print(f" UX Score: {data.ux_score}/10")
         
-        # NOTE: We look for 'issues' now, matching the new prompt
-        issues = data.get('issues', [])
+        issues = data.sorted_issues()
         print(f"\n Issues Found: {len(issues)}")
         
         if issues:
-            # Sort by severity (High first)
-            severity_order = {"High": 0, "Medium": 1, "Low": 2}
-            issues.sort(key=lambda x: severity_order.get(x.get('severity', 'Low'), 3))
-
             for i, issue in enumerate(issues, 1):
-                sev = issue.get('severity', 'Low')
-                icon = "🔴" if sev == "High" else "🟡" if sev == "Medium" else "🟢"
+                icon = "🔴" if issue.severity == "High" else "🟡" if issue.severity == "Medium" else "🟢"
                 
-                print(f"\n   {i}. {icon} [{sev.upper()}] {issue.get('issue', 'Unknown Issue')}")
-                print(f"      Timestamp: {issue.get('timestamp', 'N/A')}")
-                print(f"      ↳ {issue.get('details', '')}")
+                print(f"\n   {i}. {icon} [{issue.severity.upper()}] {issue.issue}")
+                print(f"      Timestamp: {issue.timestamp}")
+                print(f"      ↳ {issue.details}")
         else:
             print("\n    No issues detected. (If this is Arngren.net, something is wrong!)")
         
@@ -187,8 +606,10 @@ def main():
         # Save Report
         output_file = Path(video_path).stem + "_qa_report.json"
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+            json.dump(data.to_dict(), f, indent=2, ensure_ascii=False)
         print(f" Saved to: {output_file}")
+        if analyst.cache is not None:
+            print(f" Cache: {analyst.cache.stats()}")
         
     except Exception as e:
         print(f"\n CRITICAL ERROR: {e}")
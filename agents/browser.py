@@ -1,105 +1,251 @@
 """
 VisionQA Browser Agent 
 It Uses manual stealth script injection to avoid import errors.
+Browsers come from a BrowserPool, so Chromium stays warm across sessions.
 """
 
 import asyncio
+import hashlib
+import io
 import os
 import shutil
 import random
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlparse
 
 # Import Playwright
 try:
-    from playwright.async_api import async_playwright, Page
+    from playwright.async_api import Page
 except ImportError:
     print(" Critical Import Error. Run: pip install playwright")
     exit(1)
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from agents.browser_pool import BrowserPool
+from agents.heuristics import HeuristicChecker
+from agents.profiles import (DEFAULT_BLOCKED_DOMAINS, DEFAULT_BLOCKED_RESOURCE_TYPES, DEFAULT_DEVICE,
+                             DEVICE_PROFILES, VIEWPORT_SIZE)
+from agents.popups import DEFAULT_POPUP_RULES, compile_popup_script
+from utils import metrics
+from utils.keyframes import Keyframe
+
 # --- CONFIGURATION ---
-VIEWPORT_SIZE = {"width": 1920, "height": 1080}
-SCROLL_DURATION_SECONDS = 20
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+SCROLL_DURATION_SECONDS = 20  # "fixed" scroll mode only
+SCROLL_STEP_RATIO = 0.75      # Adaptive step = 75% of the viewport, so frames overlap
+STEP_QUIET_MS = 300           # DOM/network must be quiet this long before the next step
+STEP_MAX_WAIT_MS = 1500       # ...but never wait longer than this per step
+LOAD_MAX_WAIT_MS = 5000       # Cap for the settle wait right after navigation
+BOTTOM_STABLE_CHECKS = 2      # Stop once the bottom is reached and height stops growing
+MAX_SCROLL_STEPS = 150
+MAX_SCROLL_SECONDS = 90
+SCREENSHOT_QUALITY = 60     # JPEG quality for screenshot capture
+SCREENSHOT_MAX_WIDTH = 1280 # Screenshots are downscaled to at most this width
+
+# Resolves once no DOM mutation happened for quietMs (or after maxMs regardless)
+DOM_QUIET_JS = """
+([quietMs, maxMs]) => new Promise(resolve => {
+    let timer = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(done, quietMs);
+    });
+    const cap = setTimeout(done, maxMs);
+    function done() {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(cap);
+        resolve();
+    }
+    observer.observe(document, {subtree: true, childList: true, attributes: true});
+    timer = setTimeout(done, quietMs);
+})
+"""
+
+# Scrolls by dy and reports the new position in the same round trip
+SCROLL_STEP_JS = """
+(dy) => {
+    window.scrollBy(0, dy);
+    const doc = document.documentElement;
+    return {
+        y: window.scrollY,
+        viewport: window.innerHeight,
+        height: Math.max(doc.scrollHeight, document.body ? document.body.scrollHeight : 0)
+    };
+}
+"""
+
+
+@dataclass
+class SessionStats:
+    """Numbers for one browser session, filled in by the recorder."""
+    url: str = ""
+    capture: str = "video"
+    wall_s: float = 0.0
+    cpu_s: float = 0.0   # This process + Chromium children, see _cpu_seconds()
+    frames: int = 0
+    bytes: int = 0
+    scroll_steps: int = 0
+    scroll_s: float = 0.0
+    page_height: int = 0
+    popups: list = field(default_factory=list)  # Popup rules that fired, see agents/popups.py
+    blocked_requests: int = 0
+    har: str = None   # HAR archive recorded to / replayed from
+    device: str = DEFAULT_DEVICE  # Key of DEVICE_PROFILES
+    skipped: str = None  # Why the page hook stopped the session (e.g. duplicate template)
+    heuristics: dict = None  # DOM check summary when dom_checks is on, see agents/heuristics.py
+
+
+class SessionSkipped(Exception):
+    """Raised when the page hook declines a page; nothing is saved for it."""
+
+
+def _cpu_seconds():
+    """
+    CPU seconds used by this process and its children (the Chromium tree).
+    With a shared pool this includes concurrent sessions, so compare modes one at a time.
+    """
+    if psutil is None:
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system
+    proc = psutil.Process()
+    total = sum(proc.cpu_times()[:2])
+    for child in proc.children(recursive=True):
+        try:
+            total += sum(child.cpu_times()[:2])
+        except psutil.Error:
+            pass
+    return total
+
+
+class _NetworkTracker:
+    """Counts in-flight requests of a page so scroll steps can wait for lazy loads."""
+
+    def __init__(self, page: Page):
+        self.inflight = 0
+        page.on("request", self._started)
+        page.on("requestfinished", self._finished)
+        page.on("requestfailed", self._finished)
+
+    def _started(self, _):
+        self.inflight += 1
+
+    def _finished(self, _):
+        self.inflight = max(0, self.inflight - 1)
+
+    async def wait_idle(self, idle_ms, max_ms):
+        deadline = time.perf_counter() + max_ms / 1000
+        idle_since = None
+        while time.perf_counter() < deadline:
+            if self.inflight == 0:
+                idle_since = idle_since or time.perf_counter()
+                if (time.perf_counter() - idle_since) * 1000 >= idle_ms:
+                    return
+            else:
+                idle_since = None
+            await asyncio.sleep(0.05)
+
+
+def _downscale_jpeg(jpeg, max_width, quality):
+    if Image is None:
+        return jpeg
+    image = Image.open(io.BytesIO(jpeg))
+    if image.width <= max_width:
+        return jpeg
+    image = image.resize((max_width, int(image.height * max_width / image.width)))
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
 
 class BrowserRecorder:
-    def __init__(self, output_dir="output"):
+    def __init__(self, output_dir="output", pool: BrowserPool = None, scroll="adaptive",
+                 popup_rules=None, block_domains=None, block_resource_types=None,
+                 har_mode=None, har_dir=None, page_hook=None, dom_checks=False):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
-        self.temp_dir = self.output_dir / "temp_video"
-        self.temp_dir.mkdir(exist_ok=True)
+        # Shared pool (batch/service) or None for a one-off browser per session
+        self.pool = pool
+        self.scroll = scroll
+        self.popup_rules = popup_rules if popup_rules is not None else DEFAULT_POPUP_RULES
+        self.block_domains = [d.lower() for d in (DEFAULT_BLOCKED_DOMAINS if block_domains is None else block_domains)]
+        self.block_resource_types = set(DEFAULT_BLOCKED_RESOURCE_TYPES if block_resource_types is None
+                                        else block_resource_types)
+        # "record": save every response to a HAR; "replay": serve only from it (no network)
+        self.har_mode = har_mode
+        self.har_dir = Path(har_dir) if har_dir else self.output_dir / "har"
+        # async page_hook(page, url, stats) runs after load, before scrolling;
+        # returning False ends the session early (see agents/crawler.py)
+        self.page_hook = page_hook
+        # Contrast/font/overlap/density checks on the live DOM at every scroll step
+        self.dom_checks = dom_checks
 
-    async def _apply_stealth(self, page: Page):
-        """
-        Manually injects stealth scripts to hide automation flags.
-        """
-        # 1. Mask the webdriver property
-        await page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-        """)
-        
-        # 2. Mock languages and plugins to look real
-        await page.add_init_script("""
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['en-US', 'en']
-            });
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5]
-            });
-        """)
-
-        # 3. Mask Chrome-specific automation variables
-        await page.add_init_script("""
-            window.chrome = { runtime: {} };
-            const originalQuery = window.navigator.permissions.query;
-            return window.navigator.permissions.query = (parameters) => (
-                parameters.name === 'notifications' ?
-                Promise.resolve({ state: Notification.permission }) :
-                originalQuery(parameters)
-            );
-        """)
+    @asynccontextmanager
+    async def _browser_pool(self):
+        if self.pool is not None:
+            yield self.pool
+        else:
+            async with BrowserPool(size=1) as pool:
+                yield pool
+
+    def session_filename(self, url: str, device: str = None) -> str:
+        """Host + timestamp + URL hash (+ device), so parallel sessions never share a file name.
+        Playwright records VP8 WebM; utils/transcode.py makes the MP4s from it."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_name = url.replace("https://", "").replace("http://", "").replace("www.", "").split('/')[0]
+        url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+        suffix = f"_{device}" if device and device != DEFAULT_DEVICE else ""
+        return f"{safe_name}_{timestamp}_{url_hash}{suffix}.webm"
 
     async def _human_mouse_move(self, page: Page):
         """Moves the mouse in a random, curvy human-like path."""
         try:
+            viewport = page.viewport_size or VIEWPORT_SIZE
             for _ in range(3):
-                x = random.randint(100, 1000)
-                y = random.randint(100, 800)
+                x = random.randint(0, viewport["width"] - 1)
+                y = random.randint(0, viewport["height"] - 1)
                 await page.mouse.move(x, y, steps=10)
                 await page.wait_for_timeout(random.randint(100, 300))
         except Exception:
             pass
 
-    async def _handle_popups(self, page: Page):
-        """Handles Cookies AND Amazon-style 'Continue' barriers."""
+    async def _handle_popups(self, page: Page, stats: SessionStats):
+        """One round trip: the injected popup script applies every rule at once."""
         print("     Checking for popups/barriers...")
-        
-        # 1. Generic Cookie Buttons
-        cookie_texts = ["Accept", "Accept All", "Allow", "I Agree", "Got it", "Consent"]
-        for text in cookie_texts:
-            try:
-                btn = page.get_by_role("button", name=text, exact=False)
-                if await btn.count() > 0 and await btn.is_visible():
-                    print(f"      ↳ Clicking cookie button: '{text}'")
-                    await btn.first.click()
-                    return
-            except: continue
+        try:
+            fired = await page.evaluate("window.__vqaPopups ? window.__vqaPopups.scan('initial') : []")
+        except Exception:
+            fired = []
+        for hit in fired:
+            print(f"      ↳ Rule '{hit['rule']}' clicked '{hit['text']}' ({hit['ms']}ms)")
 
-        # 2. Amazon-specific "Continue"
+    async def _collect_popup_log(self, page: Page, stats: SessionStats):
+        """Everything the script dismissed during the session, including mid-scroll banners."""
         try:
-            amazon_btn = page.get_by_text("Continue shopping", exact=False)
-            if await amazon_btn.count() > 0 and await amazon_btn.is_visible():
-                 print("      ↳  Detected Amazon Block. Attempting to click through...")
-                 await amazon_btn.first.click()
-                 await page.wait_for_timeout(2000)
-        except: pass
-
-    async def _smooth_scroll(self, page: Page):
+            stats.popups = await page.evaluate("window.__vqaPopups ? window.__vqaPopups.log() : []")
+        except Exception:
+            return
+        for hit in stats.popups:
+            if hit["reason"] != "initial":
+                print(f"      ↳ Late popup: rule '{hit['rule']}' clicked '{hit['text']}' ({hit['ms']}ms)")
+
+    async def _smooth_scroll(self, page: Page, on_step=None):
         print("    Starting smooth scroll...")
         total_height = await page.evaluate("document.body.scrollHeight")
-        viewport_height = VIEWPORT_SIZE["height"]
+        viewport_height = (page.viewport_size or VIEWPORT_SIZE)["height"]
         steps = 40
         step_height = (total_height - viewport_height) / steps
         delay_ms = (SCROLL_DURATION_SECONDS * 1000) / steps
@@ -110,74 +256,270 @@ class BrowserRecorder:
             
             if i % 5 == 0: 
                 await self._human_mouse_move(page)
+
+            if on_step:
+                await on_step(i + 1)
                 
             await page.wait_for_timeout(delay_ms)
         
         await page.wait_for_timeout(2000)
 
-    async def record_session(self, url: str) -> str:
-        print(f"\n🎥 Starting Browser Session for: {url}")
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_name = url.replace("https://", "").replace("http://", "").replace("www.", "").split('/')[0]
-        final_filename = f"{safe_name}_{timestamp}.mp4"
-        final_path = self.output_dir / final_filename
-
-        async with async_playwright() as p:
-            # Launch with "Stealth" flags
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    "--disable-blink-features=AutomationControlled", 
-                    "--no-sandbox",
-                    "--disable-infobars"
-                ]
-            )
-            
-            context = await browser.new_context(
-                record_video_dir=self.temp_dir,
-                record_video_size=VIEWPORT_SIZE,
-                viewport=VIEWPORT_SIZE,
-                user_agent=USER_AGENT,
-                locale="en-US",
-                timezone_id="America/New_York"
+    async def _wait_for_quiet(self, page: Page, network: _NetworkTracker, quiet_ms, max_ms):
+        """Waits until both the network and the DOM have settled (bounded by max_ms)."""
+        try:
+            await asyncio.gather(
+                network.wait_idle(quiet_ms, max_ms),
+                page.evaluate(DOM_QUIET_JS, [quiet_ms, max_ms]),
             )
+        except Exception:
+            pass  # Navigation mid-wait etc.; just carry on scrolling
 
-            try:
-                page = await context.new_page()
-                
-                # ACTIVATE MANUAL STEALTH
-                await self._apply_stealth(page)
-                
-                print("    Navigating (Stealth Mode ON)...")
-                await page.goto(url, wait_until="domcontentloaded", timeout=45000)
-                
+    async def _adaptive_scroll(self, page: Page, network: _NetworkTracker, stats: SessionStats, on_step=None):
+        """
+        Scrolls in viewport-sized steps, re-measuring the page height after each
+        one so lazy-loaded content is followed. Each step waits for the page to
+        settle instead of a fixed delay, and the scroll stops once the bottom is
+        reached and the height has stopped growing.
+        """
+        print("    Starting adaptive scroll...")
+        started = time.perf_counter()
+        last_height = None
+        stable = 0
+        position = await page.evaluate(SCROLL_STEP_JS, 0)
+
+        while stats.scroll_steps < MAX_SCROLL_STEPS and time.perf_counter() - started < MAX_SCROLL_SECONDS:
+            at_bottom = position["y"] + position["viewport"] >= position["height"] - 2
+            if at_bottom:
+                stable = stable + 1 if position["height"] == last_height else 0
+                if stable >= BOTTOM_STABLE_CHECKS:
+                    break
+            last_height = position["height"]
+
+            step = int(position["viewport"] * SCROLL_STEP_RATIO)
+            position = await page.evaluate(SCROLL_STEP_JS, 0 if at_bottom else step)
+            stats.scroll_steps += 1
+            if on_step:
+                await on_step(stats.scroll_steps)
+            await self._wait_for_quiet(page, network, STEP_QUIET_MS, STEP_MAX_WAIT_MS)
+
+        stats.page_height = position["height"]
+        stats.scroll_s = round(time.perf_counter() - started, 2)
+        print(f"    Scroll done: {stats.scroll_steps} steps, {stats.page_height}px in {stats.scroll_s}s")
+
+    def har_path(self, url: str, device: str = None) -> Path:
+        """One archive per URL (and device: sites serve mobile pages differently)."""
+        url_hash = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+        host = urlparse(url).hostname or "page"
+        suffix = f"_{device}" if device and device != DEFAULT_DEVICE else ""
+        return self.har_dir / f"{host}_{url_hash}{suffix}.har"
+
+    def _is_blocked(self, request):
+        if request.resource_type in self.block_resource_types:
+            return True
+        host = (urlparse(request.url).hostname or "").lower()
+        return any(host == d or host.endswith("." + d) for d in self.block_domains)
+
+    async def _setup_routing(self, context, url: str, stats: SessionStats):
+        """HAR record/replay first, then the blocklist on top (handlers run last-registered first)."""
+        if self.har_mode:
+            har_path = self.har_path(url, stats.device)
+            stats.har = str(har_path)
+            if self.har_mode == "replay":
+                if not har_path.exists():
+                    raise FileNotFoundError(f"No HAR archive for {url} (expected {har_path}); record it first")
+                print(f"    Replaying from HAR: {har_path.name} (offline)")
+                await context.route_from_har(har_path, not_found="abort")
+            else:
+                self.har_dir.mkdir(parents=True, exist_ok=True)
+                print(f"    Recording HAR: {har_path.name}")
+                await context.route_from_har(har_path, update=True, update_content="embed")
+
+        if self.block_domains or self.block_resource_types:
+            async def route_request(route):
+                if self._is_blocked(route.request):
+                    stats.blocked_requests += 1
+                    await route.abort()
+                else:
+                    await route.fallback()
+            await context.route("**/*", route_request)
+
+    def _context_options(self, device=DEFAULT_DEVICE, **extra):
+        return dict(
+            **DEVICE_PROFILES[device],
+            locale="en-US",
+            timezone_id="America/New_York",
+            **extra
+        )
+
+    async def _run_session(self, page: Page, url: str, stats: SessionStats, on_step=None):
+        """Navigate, clear popups and scroll; on_step(i) fires after each scroll step."""
+        network = _NetworkTracker(page)
+        if self.dom_checks:
+            # Started with the page, so finding times line up with the video
+            checker = HeuristicChecker()
+            capture = on_step
+
+            async def on_step(step):
+                await checker.check(page, step)
+                if capture:
+                    await capture(step)
+        # Registered before goto so the observer is live from the first paint
+        await page.context.add_init_script(compile_popup_script(self.popup_rules, url))
+        await self._setup_routing(page.context, url, stats)
+
+        print("    Navigating (Stealth Mode ON)...")
+        with metrics.span("navigation"):
+            await page.goto(url, wait_until="domcontentloaded", timeout=45000)
+
+        with metrics.span("settle"):
+            if self.scroll == "fixed":
                 await page.wait_for_timeout(3000)
-                await self._handle_popups(page)
-                await self._human_mouse_move(page)
-                await self._smooth_scroll(page)
+            else:
+                await self._wait_for_quiet(page, network, STEP_QUIET_MS, LOAD_MAX_WAIT_MS)
+        with metrics.span("popups"):
+            await self._handle_popups(page, stats)
+        if self.page_hook is not None and await self.page_hook(page, url, stats) is False:
+            raise SessionSkipped(stats.skipped or "declined by page hook")
+        await self._human_mouse_move(page)
+        if on_step:
+            await on_step(0)
 
-                print("    Saving video...")
-                await context.close()
-                await browser.close()
-                
-                video_files = list(self.temp_dir.glob("*.webm")) + list(self.temp_dir.glob("*.mp4"))
-                if not video_files: return None
-                
-                latest_video = max(video_files, key=os.path.getctime)
-                shutil.move(str(latest_video), str(final_path))
-                shutil.rmtree(self.temp_dir, ignore_errors=True)
-                
-                print(f"    Recording Complete: {final_path}")
-                return str(final_path)
+        with metrics.span("scroll"):
+            if self.scroll == "fixed":
+                started = time.perf_counter()
+                await self._smooth_scroll(page, on_step)
+                stats.scroll_s = round(time.perf_counter() - started, 2)
+            else:
+                await self._adaptive_scroll(page, network, stats, on_step)
+        await self._collect_popup_log(page, stats)
+        if self.dom_checks:
+            stats.heuristics = checker.summary()
+            print(f"    DOM checks: {len(stats.heuristics['issues'])} issue(s) over "
+                  f"{stats.heuristics['viewports']} viewports")
+        if stats.blocked_requests:
+            print(f"    Blocked {stats.blocked_requests} tracker/ad requests")
+            metrics.count("blocked_requests", stats.blocked_requests)
+
+    def _finish_stats(self, stats, started, cpu_started):
+        stats.wall_s = round(time.perf_counter() - started, 2)
+        stats.cpu_s = round(_cpu_seconds() - cpu_started, 2)
+        print(f"    Session stats [{stats.capture}/{self.scroll}]: wall {stats.wall_s}s "
+              f"(scroll {stats.scroll_s}s, {stats.scroll_steps} steps), CPU {stats.cpu_s}s, "
+              f"{stats.bytes / 1e6:.2f} MB")
+
+    async def record_session(self, url: str, stats: SessionStats = None, device: str = DEFAULT_DEVICE) -> str:
+        print(f"\n🎥 Starting Browser Session for: {url} [{device}]")
+        final_path = self.output_dir / self.session_filename(url, device)
+        stats = stats if stats is not None else SessionStats()
+        stats.url, stats.capture, stats.device = url, "video", device
+        started, cpu_started = time.perf_counter(), _cpu_seconds()
+
+        # Each session records into its own temp dir so parallel sessions
+        # never pick up (or delete) each other's videos.
+        session_dir = Path(tempfile.mkdtemp(prefix="temp_video_", dir=self.output_dir))
+
+        try:
+            async with self._browser_pool() as pool:
+                async with pool.new_context(**self._context_options(
+                    device,
+                    record_video_dir=session_dir,
+                    record_video_size=DEVICE_PROFILES[device]["viewport"]
+                )) as context:
+                    page = await context.new_page()
+                    await self._run_session(page, url, stats)
+                    print("    Saving video...")
+                    save_started = time.perf_counter()
 
+            # The video file is only complete once the context is closed
+            raw_video = Path(await page.video.path()) if page.video else None
+            if not raw_video or not raw_video.exists(): return None
+
+            shutil.move(str(raw_video), str(final_path))
+            metrics.observe("video_save", time.perf_counter() - save_started)
+            stats.bytes = final_path.stat().st_size
+            metrics.count("recorded_bytes", stats.bytes)
+            self._finish_stats(stats, started, cpu_started)
+
+            print(f"    Recording Complete: {final_path}")
+            return str(final_path)
+
+        except SessionSkipped as e:
+            print(f"    Skipped: {e}")
+            return None
+        except Exception as e:
+            print(f"    Browser Error: {e}")
+            return None
+        finally:
+            shutil.rmtree(session_dir, ignore_errors=True)
+
+    async def stream_screenshots(self, url: str, quality=SCREENSHOT_QUALITY,
+                                 max_width=SCREENSHOT_MAX_WIDTH, stats: SessionStats = None,
+                                 device: str = DEFAULT_DEVICE):
+        """
+        Screenshot capture mode: async generator yielding one JPEG Keyframe per
+        scroll step as soon as it is taken. No video is encoded or written.
+        Timestamps are seconds since navigation started.
+        """
+        print(f"\n📸 Starting Screenshot Session for: {url} [{device}]")
+        stats = stats if stats is not None else SessionStats()
+        stats.url, stats.capture, stats.device = url, "screenshots", device
+        profile = DEVICE_PROFILES[device]
+        shot_width = profile["viewport"]["width"] * profile["device_scale_factor"]
+        started, cpu_started = time.perf_counter(), _cpu_seconds()
+
+        queue = asyncio.Queue()
+        done = object()
+
+        async def produce():
+            try:
+                async with self._browser_pool() as pool:
+                    async with pool.new_context(**self._context_options(device)) as context:
+                        page = await context.new_page()
+                        nav_started = time.perf_counter()
+
+                        async def capture(step):
+                            with metrics.span("screenshot"):
+                                jpeg = await page.screenshot(type="jpeg", quality=quality)
+                                if max_width < shot_width:
+                                    jpeg = await asyncio.to_thread(_downscale_jpeg, jpeg, max_width, quality)
+                            stats.frames += 1
+                            stats.bytes += len(jpeg)
+                            metrics.count("recorded_bytes", len(jpeg))
+                            await queue.put(Keyframe(time.perf_counter() - nav_started, jpeg, step))
+
+                        await self._run_session(page, url, stats, on_step=capture)
+                self._finish_stats(stats, started, cpu_started)
+                print(f"    Capture Complete: {stats.frames} screenshots")
+            except SessionSkipped as e:
+                print(f"    Skipped: {e}")
             except Exception as e:
                 print(f"    Browser Error: {e}")
-                await context.close()
-                await browser.close()
-                return None
+            finally:
+                await queue.put(done)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is done:
+                    break
+                yield frame
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+async def _compare_capture(url, capture):
+    r = BrowserRecorder()
+    stats = SessionStats()
+    if capture == "screenshots":
+        async for _ in r.stream_screenshots(url, stats=stats):
+            pass
+    else:
+        await r.record_session(url, stats=stats)
+    return stats
 
 if __name__ == "__main__":
     import sys
     url = sys.argv[1] if len(sys.argv) > 1 else "https://www.google.com"
-    r = BrowserRecorder()
-    asyncio.run(r.record_session(url))
\ No newline at end of file
+    capture = sys.argv[2] if len(sys.argv) > 2 else "video"
+    asyncio.run(_compare_capture(url, capture))
\ No newline at end of file
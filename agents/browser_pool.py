@@ -0,0 +1,174 @@
+"""
+VisionQA Browser Pool
+Keeps Chromium warm between sessions and hands out fresh, stealth-ready contexts.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright, Browser
+
+from utils import metrics
+
+# --- CONFIGURATION ---
+LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--no-sandbox",
+    "--disable-infobars"
+]
+MAX_SESSIONS_PER_BROWSER = 50
+
+# Registered once per context, so every page in it starts masked
+STEALTH_SCRIPTS = [
+    # 1. Mask the webdriver property
+    """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+    """,
+    # 2. Mock languages and plugins to look real
+    """
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['en-US', 'en']
+    });
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+    """,
+    # 3. Mask Chrome-specific automation variables
+    """
+    window.chrome = { runtime: {} };
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+        Promise.resolve({ state: Notification.permission }) :
+        originalQuery(parameters)
+    );
+    """,
+]
+
+
+class _PooledBrowser:
+    """Book-keeping for one Chromium process in the pool."""
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.sessions = 0   # contexts handed out over its lifetime
+        self.active = 0     # contexts currently open
+        self.retired = False
+
+    @property
+    def usable(self):
+        return not self.retired and self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    Long-lived pool of Chromium browsers.
+
+    A browser is retired after `max_sessions` contexts (to cap memory creep)
+    or as soon as it disconnects, and is replaced lazily on the next request.
+
+        async with BrowserPool(size=2) as pool:
+            async with pool.new_context(viewport=...) as context:
+                page = await context.new_page()
+    """
+
+    def __init__(self, size=1, max_sessions=MAX_SESSIONS_PER_BROWSER, headless=True):
+        self.size = max(1, size)
+        self.max_sessions = max_sessions
+        self.headless = headless
+        self._playwright = None
+        self._browsers = []
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+
+    async def close(self):
+        for pooled in self._browsers:
+            await self._close_browser(pooled)
+        self._browsers.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self) -> _PooledBrowser:
+        print("    Launching pooled browser...")
+        with metrics.span("browser_launch"):
+            browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+        pooled = _PooledBrowser(browser)
+        # A crashed browser is dropped from rotation immediately
+        browser.on("disconnected", lambda _: setattr(pooled, "retired", True))
+        return pooled
+
+    async def _close_browser(self, pooled: _PooledBrowser):
+        try:
+            if pooled.browser.is_connected():
+                await pooled.browser.close()
+        except Exception:
+            pass
+
+    async def _acquire(self) -> _PooledBrowser:
+        async with self._lock:
+            if self._playwright is None:
+                await self.start()
+
+            # Forget browsers that crashed or finished their last session
+            for pooled in [b for b in self._browsers if not b.usable and b.active == 0]:
+                self._browsers.remove(pooled)
+                await self._close_browser(pooled)
+
+            live = [b for b in self._browsers if b.usable]
+            if len(live) < self.size:
+                pooled = await self._launch()
+                self._browsers.append(pooled)
+            else:
+                pooled = min(live, key=lambda b: b.active)
+
+            pooled.sessions += 1
+            pooled.active += 1
+            if pooled.sessions >= self.max_sessions:
+                pooled.retired = True
+            return pooled
+
+    async def _release(self, pooled: _PooledBrowser):
+        pooled.active -= 1
+        if pooled.active == 0 and not pooled.usable:
+            async with self._lock:
+                if pooled in self._browsers:
+                    self._browsers.remove(pooled)
+            await self._close_browser(pooled)
+
+    @asynccontextmanager
+    async def new_context(self, **context_options):
+        """Yields a fresh BrowserContext; it is closed (and the video flushed) on exit."""
+        pooled = await self._acquire()
+        context = None
+        try:
+            with metrics.span("context_create"):
+                context = await pooled.browser.new_context(**context_options)
+                for script in STEALTH_SCRIPTS:
+                    await context.add_init_script(script)
+            yield context
+        except Exception:
+            # A context that died with its browser means the browser is gone too
+            if not pooled.browser.is_connected():
+                pooled.retired = True
+            raise
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pooled.retired = True
+            await self._release(pooled)
+
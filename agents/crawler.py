@@ -0,0 +1,273 @@
+"""
+VisionQA Site Crawler
+Breadth-first crawl of one origin. Links are read from each page while it is
+being recorded (the crawler is the recorder's page hook), so every page is
+loaded once; pages whose DOM skeleton matches a page already recorded (e.g.
+template-identical product pages) are dropped before they are scrolled,
+transcoded or sent to Gemini.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import posixpath
+import urllib.request
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+from xml.etree import ElementTree
+
+from utils import metrics
+
+# --- CONFIGURATION ---
+MAX_PAGES = 20               # Pages actually recorded and analyzed
+MAX_DEPTH = 2                # Link hops from the start URL / sitemap entries
+MAX_VISITS_PER_PAGE = 4      # Navigations allowed per page budget (duplicates still cost a load)
+STRUCTURE_MAX_DEPTH = 12     # DOM levels that count towards the template hash
+SITEMAP_TIMEOUT_SECONDS = 15
+SITEMAP_MAX_FILES = 10       # Child sitemaps followed from a sitemap index
+USER_AGENT = "Mozilla/5.0 (compatible; VisionQA crawler)"
+
+# Query parameters that never change what a page shows: utm_* by prefix, the rest by exact name
+TRACKING_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "ref", "_ga"}
+# Links to these are downloads, not pages
+SKIP_EXTENSIONS = {
+    ".pdf", ".zip", ".gz", ".tar", ".dmg", ".exe", ".msi", ".apk",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".bmp",
+    ".mp4", ".webm", ".mov", ".mp3", ".wav", ".css", ".js", ".json", ".xml", ".txt",
+}
+
+# One round trip per page: links, canonical URL and a tag skeleton of the DOM.
+# Text, attributes and repeated siblings are ignored, so two product pages
+# built from the same template give the same skeleton.
+PAGE_INFO_JS = """
+(maxDepth) => {
+    const SKIP = new Set(['script', 'style', 'noscript', 'template', 'svg', 'iframe', 'link', 'meta']);
+    const walk = (el, depth) => {
+        if (depth > maxDepth) return '';
+        const parts = [];
+        for (const child of el.children) {
+            const tag = child.tagName.toLowerCase();
+            if (SKIP.has(tag)) continue;
+            const inner = walk(child, depth + 1);
+            const node = inner ? tag + '(' + inner + ')' : tag;
+            // 3 or 30 items in a list look the same
+            if (parts[parts.length - 1] !== node) parts.push(node);
+        }
+        return parts.join(',');
+    };
+    const canonical = document.querySelector('link[rel="canonical"]');
+    return {
+        links: Array.from(document.querySelectorAll('a[href]'), a => a.href),
+        canonical: canonical ? canonical.href : null,
+        structure: walk(document.body || document.documentElement, 0),
+    };
+}
+"""
+
+
+def _is_tracking_param(key):
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url, base=None):
+    """
+    Resolves `url` against `base` and reduces it to one spelling per page:
+    lower-case scheme/host, no default port, no fragment, no tracking
+    parameters, sorted query, '/.' segments collapsed. None if not http(s).
+    """
+    if not url:
+        return None
+    parts = urlparse(urljoin(base, url.strip()) if base else url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower()
+    if parts.port and parts.port != {"http": 80, "https": 443}[scheme]:
+        host = f"{host}:{parts.port}"
+    path = posixpath.normpath(parts.path) if parts.path else "/"
+    if parts.path.endswith("/") and path != "/":
+        path += "/"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(k)
+    ))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+
+def _origin(url):
+    parts = urlparse(url)
+    return parts.scheme, parts.netloc
+
+
+def fetch_sitemap(url, limit=MAX_PAGES * MAX_VISITS_PER_PAGE, _nested=False):
+    """
+    <loc> URLs listed in a sitemap.xml (plain or gzipped), following one level
+    of sitemap index. Blocking: run it with asyncio.to_thread.
+    """
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=SITEMAP_TIMEOUT_SECONDS) as response:
+            body = response.read()
+        if body[:2] == b"\x1f\x8b":
+            body = gzip.decompress(body)
+        root = ElementTree.fromstring(body)
+    except (OSError, ValueError, ElementTree.ParseError) as e:
+        print(f"    Sitemap unavailable ({url}): {e}")
+        return []
+
+    locs = [el.text.strip() for el in root.iter() if el.tag.rsplit("}", 1)[-1] == "loc" and el.text]
+    if root.tag.rsplit("}", 1)[-1] != "sitemapindex":
+        return locs[:limit]
+    if _nested:
+        return []
+
+    urls = []
+    for child in locs[:SITEMAP_MAX_FILES]:
+        urls.extend(fetch_sitemap(child, limit - len(urls), _nested=True))
+        if len(urls) >= limit:
+            break
+    return urls[:limit]
+
+
+class SiteCrawler:
+    """
+    Frontier + dedupe state for one crawl.
+
+        crawler = SiteCrawler("https://example.com", max_pages=30)
+        recorder = BrowserRecorder(..., page_hook=crawler.inspect_page)
+        results = await crawler.run(visit, concurrency=4)   # visit(url) records + audits
+
+    Budgets: `max_pages` pages are recorded, links are followed `max_depth`
+    hops, and at most max_pages * MAX_VISITS_PER_PAGE URLs are ever queued.
+    """
+
+    def __init__(self, start_url, max_pages=MAX_PAGES, max_depth=MAX_DEPTH, dedupe_templates=True):
+        self.start_url = normalize_url(start_url)
+        if self.start_url is None:
+            raise ValueError(f"Not an http(s) URL: {start_url}")
+        self.origin = _origin(self.start_url)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.max_visits = max_pages * MAX_VISITS_PER_PAGE
+        self.dedupe_templates = dedupe_templates
+
+        self.depth = {}       # url -> link hops from a seed (every URL ever queued)
+        self.parent = {}      # url -> page it was found on
+        self.templates = {}   # DOM skeleton hash -> first page recorded with it
+        self.recorded = {}    # url (and its redirect/canonical aliases) -> recorded page
+        self.accepted = 0
+        self._decisions = {}  # url -> Future(skip reason or None); shared by a URL's device sessions
+        self.results = []
+        self._queue = asyncio.Queue()
+        self.enqueue(self.start_url, 0)
+
+    @property
+    def sitemap_url(self):
+        scheme, netloc = self.origin
+        return f"{scheme}://{netloc}/sitemap.xml"
+
+    def enqueue(self, url, depth, parent=None):
+        """Queues a same-origin page once; returns whether it was new."""
+        url = normalize_url(url)
+        if url is None or _origin(url) != self.origin or url in self.depth:
+            return False
+        if posixpath.splitext(urlparse(url).path)[1].lower() in SKIP_EXTENSIONS:
+            return False
+        if len(self.depth) >= self.max_visits:
+            return False
+        self.depth[url] = depth
+        if parent:
+            self.parent[url] = parent
+        self._queue.put_nowait(url)
+        return True
+
+    def seed(self, urls):
+        """Adds sitemap entries as depth-0 pages; returns how many were new."""
+        return sum(self.enqueue(url, 0) for url in urls)
+
+    async def inspect_page(self, page, url, stats):
+        """
+        Page hook, called once the page has loaded and before it is scrolled.
+        Queues its links and returns False (with stats.skipped set) when the
+        page is a duplicate or the page budget is used up. With a device
+        matrix the first session of a URL decides for all of them; the
+        others wait for that decision instead of racing it.
+        """
+        decision = self._decisions.get(url)
+        if decision is not None:
+            stats.skipped = await asyncio.shield(decision)
+            return stats.skipped is None
+
+        decision = self._decisions[url] = asyncio.get_running_loop().create_future()
+        reason = "page inspection cancelled"
+        try:
+            reason = await self._decide(page, url)
+            if reason is not None:
+                metrics.count("crawl_skipped")
+        finally:
+            stats.skipped = reason
+            decision.set_result(reason)
+        return reason is None
+
+    async def _decide(self, page, url):
+        """Skip reason for a freshly loaded page, or None to record it."""
+        try:
+            info = await page.evaluate(PAGE_INFO_JS, STRUCTURE_MAX_DEPTH)
+        except Exception as e:
+            print(f"    Could not read links from {url}: {e}")
+            info = {"links": [], "canonical": None, "structure": ""}
+
+        depth = self.depth.get(url, 0)
+        if depth < self.max_depth:
+            new_links = sum(self.enqueue(link, depth + 1, url) for link in info["links"])
+            if new_links:
+                print(f"    Found {new_links} new link(s) at depth {depth + 1}")
+
+        aliases = {url, normalize_url(page.url)}
+        if info.get("canonical"):
+            aliases.add(normalize_url(info["canonical"], page.url))
+        aliases.discard(None)
+        seen = next((self.recorded[a] for a in aliases if a in self.recorded), None)
+        if seen is not None:
+            return f"same page as {seen}"
+        if self.accepted >= self.max_pages:
+            return "page budget reached"
+        template = hashlib.sha1(info["structure"].encode("utf-8")).hexdigest()
+        if self.dedupe_templates and info["structure"] and template in self.templates:
+            return f"same template as {self.templates[template]}"
+        self.templates.setdefault(template, url)
+        self.recorded.update((alias, url) for alias in aliases)
+        self.accepted += 1
+        return None
+
+    async def run(self, visit, concurrency=4):
+        """Visits queued pages (and the pages they link to) until the frontier is empty."""
+
+        async def worker():
+            while True:
+                url = await self._queue.get()
+                try:
+                    # Over budget: drain the rest of the frontier without loading it
+                    if self.accepted < self.max_pages:
+                        self.results.append(await visit(url))
+                except Exception as e:
+                    print(f"    Crawl error on {url}: {e}")
+                finally:
+                    self._queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+        try:
+            await self._queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return self.results
+
+    def site_map(self):
+        """Every URL discovered, with its depth and where it was linked from."""
+        return [{"url": url, "depth": depth, "parent": self.parent.get(url),
+                 "recorded_as": self.recorded.get(url)}
+                for url, depth in self.depth.items()]
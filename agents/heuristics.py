@@ -0,0 +1,300 @@
+"""
+VisionQA DOM Checks
+A local pre-pass over the live page, run at every scroll step of a recording:
+WCAG contrast, minimum font size, overlapping and covered elements, and
+element density. Each step is one batched page.evaluate; findings carry the
+time they were seen, so they sit in the report next to Gemini's issues. A
+page that passes every check can skip the Gemini call (or use keyframes).
+"""
+
+import time
+
+from utils import metrics
+from utils.timecode import format_timestamp
+
+# --- CONFIGURATION ---
+MIN_FONT_PX = 12              # Body text below this is hard to read on any screen
+TINY_FONT_PX = 10             # ...and below this it is a High severity finding
+CONTRAST_NORMAL = 4.5         # WCAG 2.x AA, normal text
+CONTRAST_LARGE = 3.0          # WCAG 2.x AA, large text (>= 24px, or >= 18.66px bold)
+CONTRAST_HIGH_SEVERITY = 2.5  # Below this ratio the text is barely legible
+OVERLAP_RATIO = 0.3           # Intersection / smaller element's area that counts as overlap
+GRID_CELL_PX = 96             # Spatial hash cell size for the overlap search
+MAX_DENSITY = 120             # Text/interactive/image elements per megapixel of viewport
+MAX_ELEMENTS = 1500           # Per viewport, so huge pages stay within milliseconds
+MAX_FINDINGS_PER_KIND = 20    # Per viewport
+MAX_EXAMPLES = 3              # Elements quoted in one report issue
+TRIAGE_MODES = ("skip", "keyframes")
+
+CHECK_TITLES = {
+    "contrast": "Low contrast text",
+    "font_size": f"Text smaller than {MIN_FONT_PX}px",
+    "overlap": "Overlapping elements",
+    "occluded": "Interactive element covered by another element",
+    "density": "Cluttered viewport",
+}
+
+# Everything for one viewport in a single round trip. Fixed/sticky elements
+# are ignored for overlap and occlusion: a sticky header covers something at
+# every scroll position by design.
+CHECK_VIEWPORT_JS = """
+(o) => {
+    const vw = innerWidth, vh = innerHeight;
+    const findings = { contrast: [], font_size: [], overlap: [], occluded: [], density: [] };
+    const add = (kind, item) => { if (findings[kind].length < o.maxPerKind) findings[kind].push(item); };
+
+    const styles = new Map();
+    const style = el => { let s = styles.get(el); if (!s) { s = getComputedStyle(el); styles.set(el, s); } return s; };
+    const inView = r => r.width > 1 && r.height > 1 && r.bottom > 0 && r.right > 0 && r.top < vh && r.left < vw;
+    const describe = el => {
+        const parts = [];
+        for (let e = el, i = 0; e && e.nodeType === 1 && i < 3; e = e.parentElement, i++) {
+            if (e.id) { parts.unshift(e.tagName.toLowerCase() + '#' + e.id); break; }
+            const cls = (typeof e.className === 'string' ? e.className : '').trim().split(/\\s+/).filter(Boolean).slice(0, 2);
+            parts.unshift(e.tagName.toLowerCase() + (cls.length ? '.' + cls.join('.') : ''));
+        }
+        return parts.join(' > ');
+    };
+    const sample = el => (el.textContent || el.value || el.getAttribute('aria-label') || '').trim().replace(/\\s+/g, ' ').slice(0, 60);
+    const box = r => [Math.round(r.left), Math.round(r.top), Math.round(r.width), Math.round(r.height)];
+
+    // Colors: WCAG relative luminance, alpha composited over the background
+    const parse = c => {
+        const m = /rgba?\\(([^)]+)\\)/.exec(c || '');
+        if (!m) return null;
+        const p = m[1].split(/[\\s,\\/]+/).filter(Boolean).map(parseFloat);
+        return [p[0], p[1], p[2], p.length > 3 ? p[3] : 1];
+    };
+    const blend = (top, under) => [0, 1, 2].map(i => top[i] * top[3] + under[i] * (1 - top[3]));
+    const lum = rgb => {
+        const [r, g, b] = rgb.map(v => { v /= 255; return v <= 0.03928 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4); });
+        return 0.2126 * r + 0.7152 * g + 0.0722 * b;
+    };
+    const backgrounds = new Map();
+    const background = el => {   // null when an image/gradient is behind: not measurable here
+        if (!el) return [255, 255, 255];
+        if (backgrounds.has(el)) return backgrounds.get(el);
+        const s = style(el);
+        let bg = null;
+        if (s.backgroundImage === 'none') {
+            const c = parse(s.backgroundColor);
+            if (c && c[3] >= 1) bg = c.slice(0, 3);
+            else {
+                const under = background(el.parentElement);
+                bg = under && c && c[3] > 0 ? blend(c, under) : under;
+            }
+        }
+        backgrounds.set(el, bg);
+        return bg;
+    };
+    const pinned = new Map();
+    const isPinned = el => {
+        if (!el || el === document.body) return false;
+        if (pinned.has(el)) return pinned.get(el);
+        const p = style(el).position;
+        const result = p === 'fixed' || p === 'sticky' || isPinned(el.parentElement);
+        pinned.set(el, result);
+        return result;
+    };
+
+    // 1. Text: contrast and size of every element that directly holds visible text
+    const texts = new Set();
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT,
+        { acceptNode: n => n.nodeValue.trim() ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_REJECT });
+    while (walker.nextNode() && texts.size < o.maxElements) {
+        const el = walker.currentNode.parentElement;
+        if (el && !texts.has(el) && inView(el.getBoundingClientRect())) texts.add(el);
+    }
+    for (const el of texts) {
+        const s = style(el);
+        if (s.visibility === 'hidden' || parseFloat(s.opacity) === 0) continue;
+        const size = parseFloat(s.fontSize);
+        const r = el.getBoundingClientRect();
+        if (size < o.minFontPx)
+            add('font_size', { selector: describe(el), text: sample(el), value: size, limit: o.minFontPx, box: box(r) });
+        const fg = parse(s.color), bg = background(el);
+        if (!fg || !bg) continue;
+        const color = fg[3] < 1 ? blend(fg, bg) : fg.slice(0, 3);
+        const [hi, lo] = [lum(color), lum(bg)].sort((a, b) => b - a);
+        const ratio = (hi + 0.05) / (lo + 0.05);
+        const large = size >= 24 || (size >= 18.66 && parseInt(s.fontWeight, 10) >= 700);
+        const limit = large ? o.contrastLarge : o.contrastNormal;
+        if (ratio < limit)
+            add('contrast', { selector: describe(el), text: sample(el), value: Math.round(ratio * 100) / 100,
+                              limit, box: box(r) });
+    }
+
+    // 2. Overlap: text holders + controls in a uniform grid, only same-cell pairs are compared
+    const controls = Array.from(document.querySelectorAll(
+        'a[href], button, input:not([type=hidden]), select, textarea, [role=button]'))
+        .filter(el => inView(el.getBoundingClientRect())).slice(0, o.maxElements);
+    const items = [];
+    for (const el of new Set([...texts, ...controls])) {
+        const r = el.getBoundingClientRect();
+        if (r.width * r.height > vw * vh / 2 || isPinned(el)) continue;   // containers, sticky bars
+        items.push({ el, r });
+    }
+    const grid = new Map();
+    items.forEach((item, i) => {
+        const { left, top, right, bottom } = item.r;
+        for (let cx = Math.floor(Math.max(0, left) / o.cellPx); cx <= Math.floor(Math.min(vw, right) / o.cellPx); cx++)
+            for (let cy = Math.floor(Math.max(0, top) / o.cellPx); cy <= Math.floor(Math.min(vh, bottom) / o.cellPx); cy++) {
+                const key = cx + ',' + cy;
+                if (!grid.has(key)) grid.set(key, []);
+                grid.get(key).push(i);
+            }
+    });
+    const compared = new Set();
+    for (const cell of grid.values()) {
+        for (let a = 0; a < cell.length && a < 60; a++)
+            for (let b = a + 1; b < cell.length && b < 60; b++) {
+                const i = cell[a], j = cell[b], key = i < j ? i + ':' + j : j + ':' + i;
+                if (compared.has(key)) continue;
+                compared.add(key);
+                const A = items[i], B = items[j];
+                if (A.el.contains(B.el) || B.el.contains(A.el)) continue;
+                const w = Math.min(A.r.right, B.r.right) - Math.max(A.r.left, B.r.left);
+                const h = Math.min(A.r.bottom, B.r.bottom) - Math.max(A.r.top, B.r.top);
+                if (w <= 0 || h <= 0) continue;
+                const share = w * h / Math.min(A.r.width * A.r.height, B.r.width * B.r.height);
+                if (share >= o.overlapRatio)
+                    add('overlap', { selector: describe(A.el), text: sample(A.el), other: describe(B.el),
+                                     other_text: sample(B.el), value: Math.round(share * 100) / 100,
+                                     limit: o.overlapRatio, box: box(A.r) });
+            }
+    }
+
+    // 3. Occlusion: what is actually on top at the centre of each control
+    for (const el of controls.slice(0, 300)) {
+        const r = el.getBoundingClientRect();
+        const x = Math.min(vw - 1, Math.max(0, r.left + r.width / 2));
+        const y = Math.min(vh - 1, Math.max(0, r.top + r.height / 2));
+        const top = document.elementFromPoint(x, y);
+        if (!top || top === el || el.contains(top) || top.contains(el) || isPinned(top)) continue;
+        if (top.tagName === 'LABEL' && top.control === el) continue;
+        add('occluded', { selector: describe(el), text: sample(el), other: describe(top), other_text: sample(top),
+                          box: box(r) });
+    }
+
+    // 4. Density: how many things compete for attention in this viewport
+    const images = Array.from(document.images).filter(img => inView(img.getBoundingClientRect())).length;
+    const count = texts.size + controls.length + images;
+    const density = Math.round(count / (vw * vh / 1e6));
+    if (density > o.maxDensity)
+        add('density', { selector: 'viewport', text: '', value: density, limit: o.maxDensity, box: [0, 0, vw, vh] });
+
+    return { scroll_y: Math.round(scrollY), elements: count, density, findings };
+}
+"""
+
+
+def _severity(kind, finding):
+    if kind == "contrast":
+        return "High" if finding["value"] < CONTRAST_HIGH_SEVERITY else "Medium"
+    if kind == "font_size":
+        return "High" if finding["value"] < TINY_FONT_PX else "Medium"
+    if kind == "occluded":
+        return "High"
+    if kind == "density":
+        return "Medium" if finding["value"] > 1.5 * MAX_DENSITY else "Low"
+    return "Medium"
+
+
+def _describe_finding(kind, finding):
+    label = f"'{finding['text']}' ({finding['selector']})" if finding.get("text") else finding["selector"]
+    if kind == "contrast":
+        return f"{label}: contrast {finding['value']}:1, needs {finding['limit']}:1"
+    if kind == "font_size":
+        return f"{label}: {finding['value']:g}px"
+    if kind == "overlap":
+        return f"{label} overlaps {finding['other']} by {finding['value']:.0%}"
+    if kind == "occluded":
+        return f"{label} is covered by {finding['other']}"
+    return f"{finding['value']} elements per megapixel (limit {finding['limit']})"
+
+
+class HeuristicChecker:
+    """
+    Collects DOM findings for one session. `check(page)` runs at each scroll
+    step; an element seen again in the next (overlapping) viewport is kept
+    once, at the time it was first seen.
+    """
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.viewports = []
+        self.findings = {}   # (kind, selector, text) -> finding with "seconds", "severity"
+        self.errors = 0
+
+    async def check(self, page, step=0):
+        seconds = time.perf_counter() - self.started
+        options = {
+            "minFontPx": MIN_FONT_PX, "contrastNormal": CONTRAST_NORMAL, "contrastLarge": CONTRAST_LARGE,
+            "cellPx": GRID_CELL_PX, "overlapRatio": OVERLAP_RATIO, "maxDensity": MAX_DENSITY,
+            "maxElements": MAX_ELEMENTS, "maxPerKind": MAX_FINDINGS_PER_KIND,
+        }
+        started = time.perf_counter()
+        try:
+            snapshot = await page.evaluate(CHECK_VIEWPORT_JS, options)
+        except Exception as e:
+            self.errors += 1
+            print(f"    DOM checks failed at step {step}: {e}")
+            return
+        metrics.observe("dom_checks", time.perf_counter() - started)
+
+        self.viewports.append({"step": step, "seconds": round(seconds, 2), "scroll_y": snapshot["scroll_y"],
+                               "elements": snapshot["elements"], "density": snapshot["density"]})
+        for kind, found in snapshot["findings"].items():
+            for finding in found:
+                key = (kind, finding["selector"], finding.get("text"))
+                if key not in self.findings:
+                    self.findings[key] = {**finding, "kind": kind, "seconds": round(seconds, 2),
+                                          "severity": _severity(kind, finding)}
+
+    @property
+    def clean(self):
+        """Every viewport was checked and none had a High or Medium finding."""
+        if not self.viewports or self.errors:
+            return False
+        return not any(f["severity"] in ("High", "Medium") for f in self.findings.values())
+
+    def score(self):
+        """A rough 1-10 score from the findings alone, for runs where Gemini is skipped."""
+        weights = {"High": 2, "Medium": 1, "Low": 0.5}
+        penalty = sum(weights[f["severity"]] for f in self.findings.values())
+        return max(1, min(10, round(10 - penalty)))
+
+    def issues(self):
+        """Findings as report issues: one per check and scroll position, worst examples quoted."""
+        grouped = {}
+        for finding in self.findings.values():
+            grouped.setdefault((finding["kind"], finding["seconds"]), []).append(finding)
+
+        issues = []
+        for (kind, seconds), found in sorted(grouped.items(), key=lambda item: item[0][1]):
+            severity = min((f["severity"] for f in found), key=("High", "Medium", "Low").index)
+            examples = "; ".join(_describe_finding(kind, f) for f in found[:MAX_EXAMPLES])
+            more = f" (+{len(found) - MAX_EXAMPLES} more)" if len(found) > MAX_EXAMPLES else ""
+            issues.append({
+                "timestamp": format_timestamp(seconds),
+                "severity": severity,
+                "issue": CHECK_TITLES[kind] + (f" ({len(found)} elements)" if len(found) > 1 else ""),
+                "details": examples + more,
+                "source": "dom",
+                "check": kind,
+            })
+        return issues
+
+    def summary(self):
+        counts = {}
+        for finding in self.findings.values():
+            counts[finding["kind"]] = counts.get(finding["kind"], 0) + 1
+        return {
+            "viewports": len(self.viewports),
+            "clean": self.clean,
+            "score": self.score(),
+            "counts": counts,
+            "max_density": max((v["density"] for v in self.viewports), default=0),
+            "errors": self.errors,
+            "issues": self.issues(),
+        }
@@ -0,0 +1,146 @@
+"""
+VisionQA Popup Rules
+Cookie banners and interstitials are dismissed by one injected script that
+applies every rule in a single pass and keeps watching for late banners.
+"""
+
+import json
+from pathlib import Path
+from urllib.parse import urlparse
+
+# Each rule: name, optional CSS `selectors` (clicked if visible), optional
+# button `texts` (case-insensitive, whole label), optional `elements` (which
+# elements the texts are matched against) and optional `domains` (rule only
+# applies when the host contains one of them). Text matches are only clicked
+# inside a dialog, banner or fixed-position container, so ordinary page
+# controls labelled "Accept" or "OK" are left alone; `anywhere: true` lifts
+# that for full-page interstitials, which are then only tried on the initial
+# scan, never mid-recording.
+DEFAULT_POPUP_RULES = [
+    {"name": "onetrust", "selectors": ["#onetrust-accept-btn-handler"]},
+    {"name": "cookiebot", "selectors": ["#CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll",
+                                        "#CybotCookiebotDialogBodyButtonAccept"]},
+    {"name": "didomi", "selectors": ["#didomi-notice-agree-button"]},
+    {"name": "quantcast", "selectors": [".qc-cmp2-summary-buttons button[mode='primary']"]},
+    {"name": "cookie-accept", "texts": ["Accept", "Accept All", "Accept all cookies", "Accept cookies",
+                                        "Allow", "Allow all", "Allow all cookies", "I Agree", "Agree",
+                                        "Got it", "OK", "Consent"]},
+    {"name": "amazon-continue", "texts": ["Continue shopping"], "domains": ["amazon."],
+     "elements": "button, a, input[type='submit'], span.a-button-inner", "anywhere": True},
+]
+
+DEFAULT_ELEMENTS = "button, [role='button'], input[type='button'], input[type='submit']"
+# Containers a text-matched button must sit in (besides any position:fixed ancestor)
+OVERLAY_SELECTOR = ("dialog, [role='dialog'], [role='alertdialog'], [aria-modal='true'], "
+                    "[id*='cookie' i], [class*='cookie' i], [id*='consent' i], [class*='consent' i], "
+                    "[id*='gdpr' i], [class*='gdpr' i], [id*='banner' i], [class*='banner' i]")
+MAX_CLICKS_PER_PAGE = 20   # Guards against banners that re-appear forever
+OBSERVER_DEBOUNCE_MS = 150
+
+POPUP_SCRIPT = """
+(() => {
+    if (window.__vqaPopups) return;
+    const RULES = %(rules)s;
+    const MAX_CLICKS = %(max_clicks)d;
+    const state = { log: [], clicks: 0 };
+
+    const visible = el => {
+        const r = el.getBoundingClientRect();
+        if (r.width === 0 || r.height === 0) return false;
+        const s = getComputedStyle(el);
+        return s.visibility !== 'hidden' && s.display !== 'none' && s.opacity !== '0';
+    };
+    const label = el => (el.innerText || el.value || el.getAttribute('aria-label') || '').trim();
+    // "Accept all  cookies!" -> "accept all cookies"
+    const normalized = el => label(el).toLowerCase().replace(/\\s+/g, ' ').replace(/[.!:\\u2026\\u2713\\u2714]+$/, '').trim();
+    const inOverlay = el => {
+        for (let e = el; e && e !== document.documentElement; e = e.parentElement) {
+            if (e.matches(%(overlay)s) || getComputedStyle(e).position === 'fixed') return true;
+        }
+        return false;
+    };
+
+    function findTarget(rule, candidates, reason) {
+        for (const sel of rule.selectors || []) {
+            try {
+                const el = document.querySelector(sel);
+                if (el && visible(el)) return el;
+            } catch (e) {}
+        }
+        if (!rule.texts || !rule.texts.length) return null;
+        if (rule.anywhere && reason !== 'initial') return null;
+        if (!candidates[rule.elements]) {
+            candidates[rule.elements] = Array.from(document.querySelectorAll(rule.elements));
+        }
+        return candidates[rule.elements].find(el => {
+            const text = normalized(el);
+            return text && rule.texts.includes(text) && visible(el) && (rule.anywhere || inOverlay(el));
+        }) || null;
+    }
+
+    function scan(reason) {
+        const started = performance.now();
+        const fired = [];
+        if (!document.body || state.clicks >= MAX_CLICKS) return fired;
+        const candidates = {};
+        for (const rule of RULES) {
+            const target = findTarget(rule, candidates, reason);
+            if (!target) continue;
+            const text = label(target).slice(0, 60);
+            try { target.click(); } catch (e) { continue; }
+            state.clicks++;
+            fired.push({ rule: rule.name, text, reason, at_ms: Math.round(started) });
+        }
+        const ms = Math.round((performance.now() - started) * 10) / 10;
+        fired.forEach(entry => { entry.ms = ms; state.log.push(entry); });
+        return fired;
+    }
+
+    let pending = null;
+    function watch() {
+        new MutationObserver(() => {
+            if (pending || state.clicks >= MAX_CLICKS) return;
+            pending = setTimeout(() => { pending = null; scan('observer'); }, %(debounce_ms)d);
+        }).observe(document.documentElement, { childList: true, subtree: true });
+    }
+    if (document.documentElement) watch();
+    else document.addEventListener('DOMContentLoaded', watch);
+
+    window.__vqaPopups = { scan, log: () => state.log };
+})();
+"""
+
+
+def load_popup_rules(path):
+    """Reads a JSON list of rules (same shape as DEFAULT_POPUP_RULES)."""
+    with open(Path(path), "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules, list) or not all(isinstance(r, dict) and r.get("name") for r in rules):
+        raise ValueError(f"{path}: expected a JSON list of rules, each with a 'name'")
+    return rules
+
+
+def rules_for_url(rules, url):
+    """Keeps the rules that apply to this URL's host (per-domain overrides)."""
+    host = (urlparse(url).hostname or "").lower()
+    return [r for r in rules if not r.get("domains") or any(d.lower() in host for d in r["domains"])]
+
+
+def compile_popup_script(rules, url):
+    """Builds the init script for one session, with texts pre-lowercased."""
+    compiled = [
+        {
+            "name": r["name"],
+            "selectors": list(r.get("selectors", [])),
+            "texts": [" ".join(t.lower().split()) for t in r.get("texts", [])],
+            "elements": r.get("elements", DEFAULT_ELEMENTS),
+            "anywhere": bool(r.get("anywhere")),
+        }
+        for r in rules_for_url(rules, url)
+    ]
+    return POPUP_SCRIPT % {
+        "rules": json.dumps(compiled),
+        "max_clicks": MAX_CLICKS_PER_PAGE,
+        "debounce_ms": OBSERVER_DEBOUNCE_MS,
+        "overlay": json.dumps(OVERLAY_SELECTOR),
+    }
@@ -0,0 +1,39 @@
+"""
+VisionQA Capture Profiles
+Device profiles, capture modes and default blocklists: everything the CLI
+needs to parse its flags, kept free of Playwright so that the thin client
+(main.py --server) starts without importing the browser stack.
+"""
+
+# --- CONFIGURATION ---
+VIEWPORT_SIZE = {"width": 1920, "height": 1080}
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+
+# --devices profiles: each one is a separate context in the same Chromium.
+# UAs are Chrome ones on purpose: the engine really is Chromium.
+DEVICE_PROFILES = {
+    "desktop": {"viewport": VIEWPORT_SIZE, "user_agent": USER_AGENT,
+                "device_scale_factor": 1, "is_mobile": False, "has_touch": False},
+    "tablet": {"viewport": {"width": 820, "height": 1180},
+               "user_agent": "Mozilla/5.0 (Linux; Android 13; SM-X700) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+               "device_scale_factor": 2, "is_mobile": True, "has_touch": True},
+    "mobile": {"viewport": {"width": 412, "height": 915},
+               "user_agent": "Mozilla/5.0 (Linux; Android 14; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Mobile Safari/537.36",
+               "device_scale_factor": 2.625, "is_mobile": True, "has_touch": True},
+}
+DEFAULT_DEVICE = "desktop"
+
+CAPTURE_MODES = ("video", "screenshots")
+SCROLL_MODES = ("adaptive", "fixed")
+HAR_MODES = ("record", "replay")
+
+# Trackers/analytics: never visible, but they delay domcontentloaded and settle waits.
+# Subdomains match too ("www.google-analytics.com").
+DEFAULT_BLOCKED_DOMAINS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "googlesyndication.com", "connect.facebook.net", "hotjar.com",
+    "segment.io", "segment.com", "mixpanel.com", "clarity.ms",
+    "newrelic.com", "nr-data.net", "fullstory.com", "criteo.com",
+]
+# Resource types are not blocked by default (fonts/images are part of the UI under test)
+DEFAULT_BLOCKED_RESOURCE_TYPES = []
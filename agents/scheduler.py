@@ -0,0 +1,260 @@
+"""
+VisionQA Model Scheduler
+Shares Gemini quota between every concurrent analysis in the process: per-model
+request/token rate limits, Retry-After cooldowns, circuit breakers with
+half-open probing and jittered backoff. Each call goes to the first model in
+the fallback chain that has capacity right now, and a model that recovers is
+used again.
+"""
+
+import asyncio
+import random
+import re
+import time
+
+from utils import metrics
+
+# --- CONFIGURATION ---
+# Free-tier-ish defaults; override per deployment via ModelScheduler(limits=...)
+MODEL_LIMITS = {
+    "gemini-1.5-flash": {"rpm": 15, "tpm": 1_000_000},
+    "gemini-2.0-flash": {"rpm": 15, "tpm": 1_000_000},
+    "gemini-3-flash-preview": {"rpm": 10, "tpm": 250_000},
+}
+DEFAULT_LIMITS = {"rpm": 10, "tpm": 250_000}
+
+BREAKER_FAILURE_THRESHOLD = 3   # Consecutive failures before a model is taken out
+BREAKER_COOLDOWN_SECONDS = 15   # First open period; doubles on every failed probe
+BREAKER_MAX_COOLDOWN_SECONDS = 300
+DEFAULT_RETRY_AFTER_SECONDS = 30
+BACKOFF_BASE_SECONDS = 1
+BACKOFF_MAX_SECONDS = 20
+MAX_ATTEMPTS = 6
+MAX_WAIT_SECONDS = 600          # Give up if no model frees up within this long
+
+
+class NoCapacityError(Exception):
+    pass
+
+
+class _TokenBucket:
+    """Classic token bucket refilled continuously at capacity-per-minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)  # An oversized request waits for a full bucket
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Charge (positive) or refund (negative) once the real usage is known."""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class _ModelState:
+    def __init__(self, name, limits):
+        self.name = name
+        self.requests = _TokenBucket(limits["rpm"])
+        self.tokens = _TokenBucket(limits["tpm"])
+        self.blocked_until = 0.0      # Retry-After from a 429
+        self.failures = 0
+        self.state = "closed"         # closed -> open -> half_open -> closed/open
+        self.open_until = 0.0
+        self.cooldown = BREAKER_COOLDOWN_SECONDS
+        self.probing = False
+
+    def wait_time(self, est_tokens, now):
+        """Seconds until this model could take the request (0 = right now)."""
+        if self.state == "open":
+            if now < self.open_until:
+                return self.open_until - now
+            self.state = "half_open"
+        if self.state == "half_open" and self.probing:
+            return BREAKER_COOLDOWN_SECONDS  # One probe at a time
+        return max(self.blocked_until - now,
+                   self.requests.wait_time(1, now),
+                   self.tokens.wait_time(est_tokens, now),
+                   0.0)
+
+    def take(self, est_tokens, now):
+        self.requests.take(1, now)
+        self.tokens.take(est_tokens, now)
+        if self.state == "half_open":
+            self.probing = True
+
+    def succeeded(self):
+        if self.state != "closed":
+            print(f"      ↳ {self.name} recovered, circuit closed.")
+        self.failures = 0
+        self.state = "closed"
+        self.cooldown = BREAKER_COOLDOWN_SECONDS
+        self.probing = False
+
+    def release(self):
+        """Frees the half-open probe slot when a call ends without a verdict (429, fatal, cancelled)."""
+        self.probing = False
+
+    def trip(self, now, cooldown):
+        """Opens the circuit straight away (e.g. the model is not served to this key)."""
+        self.state = "open"
+        self.open_until = now + cooldown
+        self.probing = False
+        print(f"      ↳ {self.name} circuit open for {cooldown}s.")
+
+    def failed(self, now):
+        self.failures += 1
+        if self.state == "half_open":
+            self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN_SECONDS)
+        if self.state == "half_open" or self.failures >= BREAKER_FAILURE_THRESHOLD:
+            self.state = "open"
+            self.open_until = now + self.cooldown
+            print(f"      ↳ {self.name} circuit open for {self.cooldown}s.")
+        self.probing = False
+
+
+def classify_error(error):
+    """
+    'rate_limited', 'unavailable' (transient), 'missing' (model not served to
+    this key; skip it for a long time) or 'fatal' (no model will do better).
+    """
+    code = getattr(error, "code", None)
+    message = str(error)
+    if code == 429 or "429" in message or "RESOURCE_EXHAUSTED" in message:
+        return "rate_limited"
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return "unavailable"
+    if code in (500, 502, 503, 504) or any(s in message for s in ("503", "overloaded", "UNAVAILABLE", "500", "INTERNAL")):
+        return "unavailable"
+    if code == 404 or "NOT_FOUND" in message:
+        return "missing"
+    if code in (400, 401, 403) or any(s in message for s in ("PERMISSION_DENIED", "INVALID_ARGUMENT", "API key")):
+        return "fatal"
+    return "unavailable"
+
+
+def retry_after_seconds(error):
+    """Reads the server's RetryInfo ('retryDelay': '34s' / 'retry in 34.2s'), if any."""
+    match = (re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(error))
+             or re.search(r"retry in (\d+(?:\.\d+)?)\s*s", str(error), re.IGNORECASE))
+    if match:
+        return float(match.group(1))
+    response = getattr(error, "response", None)
+    header = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(header) if header else None
+    except ValueError:
+        return None
+
+
+def jittered_backoff(attempt):
+    """Full jitter: uniform(0, min(max, base * 2^attempt))."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class ModelScheduler:
+    """
+    Routes generate calls across the fallback chain. Shared by every analysis
+    in the process (see get_default_scheduler), so quota is tracked globally.
+    """
+
+    def __init__(self, models, limits=None):
+        limits = limits or MODEL_LIMITS
+        self.models = [_ModelState(m, limits.get(m, DEFAULT_LIMITS)) for m in models]
+        self.sleep_s = 0.0     # Total time spent waiting for capacity/backoff
+        self.retries = 0
+
+    async def _acquire(self, est_tokens):
+        deadline = time.monotonic() + MAX_WAIT_SECONDS
+        while True:
+            now = time.monotonic()
+            waits = []
+            for model in self.models:  # Chain order = preference order
+                wait = model.wait_time(est_tokens, now)
+                if wait <= 0:
+                    model.take(est_tokens, now)
+                    return model
+                waits.append(wait)
+
+            delay = min(waits) + random.uniform(0, 0.5)
+            if now + delay > deadline:
+                raise NoCapacityError(f" No model had capacity within {MAX_WAIT_SECONDS}s.")
+            print(f"      ↳ All models busy/cooling down. Waiting {delay:.1f}s...")
+            self.sleep_s += delay
+            metrics.count("scheduler_sleep_seconds", delay, reason="capacity")
+            await asyncio.sleep(delay)
+
+    async def run(self, call, est_tokens=20_000, max_attempts=MAX_ATTEMPTS):
+        """
+        Runs `await call(model_name)` on whichever model has capacity.
+        Returns (model_name, result); raises after max_attempts or a fatal error.
+        """
+        last_error = None
+        for attempt in range(max_attempts):
+            model = await self._acquire(est_tokens)
+            print(f"   Attempting with {model.name}...")
+            try:
+                result = await call(model.name)
+            except asyncio.CancelledError:
+                model.release()
+                raise
+            except Exception as e:
+                last_error = e
+                kind = classify_error(e)
+                print(f"    {model.name} failed ({kind}).")
+                now = time.monotonic()
+                if kind == "fatal":
+                    model.release()
+                    raise
+                if kind == "missing":
+                    model.trip(now, BREAKER_MAX_COOLDOWN_SECONDS)
+                elif kind == "rate_limited":
+                    # Quota, not health: the probe slot is freed and Retry-After gates the model
+                    retry_after = retry_after_seconds(e)
+                    if retry_after is None:
+                        retry_after = DEFAULT_RETRY_AFTER_SECONDS
+                    model.blocked_until = now + retry_after
+                    model.release()
+                    print(f"      ↳ Quota limit hit. {model.name} resting {retry_after:.0f}s; trying other models...")
+                else:
+                    model.failed(now)
+                self.retries += 1
+                metrics.count("retries", model=model.name, kind=kind)
+                delay = jittered_backoff(attempt)
+                self.sleep_s += delay
+                metrics.count("scheduler_sleep_seconds", delay, reason="backoff")
+                await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(result, "usage_metadata", None)
+            actual = getattr(usage, "total_token_count", None)
+            if actual:
+                model.tokens.adjust(actual - est_tokens)
+            model.succeeded()
+            print(f"    Success with {model.name}!")
+            return model.name, result
+
+        raise Exception(f" All models failed. Last error: {last_error}")
+
+
+_default_scheduler = None
+
+
+def get_default_scheduler(models):
+    """The process-wide scheduler; created on first use."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = ModelScheduler(models)
+    return _default_scheduler
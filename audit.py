@@ -0,0 +1,220 @@
+"""
+Audit entry points shared by the CLI (main.py), the job service (service.py)
+and the benchmarks: the options and the per-URL record -> analyze -> report run.
+"""
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+# Playwright, google-genai and OpenCV are imported inside the functions that
+# audit in-process, so importing this module stays cheap
+from agents.profiles import DEFAULT_BLOCKED_DOMAINS, DEFAULT_DEVICE, DEVICE_PROFILES
+from agents.popups import load_popup_rules
+from utils import metrics
+from utils.results import AuditResult, Issue
+from utils.transcode import transcode_recording
+
+@dataclass
+class AuditOptions:
+    """Knobs shared by single, batch and later modes; built from the CLI flags."""
+    use_cache: bool = True
+    keyframes: bool = False
+    capture: str = "video"   # "video" or "screenshots"
+    scroll: str = "adaptive" # "adaptive" or "fixed"
+    popup_rules: list = None # None -> agents.popups.DEFAULT_POPUP_RULES
+    block_domains: list = None         # None -> agents.profiles.DEFAULT_BLOCKED_DOMAINS
+    block_resource_types: list = None  # None -> agents.profiles.DEFAULT_BLOCKED_RESOURCE_TYPES
+    har: str = None          # None, "record" or "replay"
+    transcode: bool = True   # Make analysis/archive MP4s (see utils/transcode.py)
+    segmented: bool = False  # Analyze long recordings as overlapping windows
+    stream: bool = False     # Print issues as they stream in (not with segmented)
+    incremental: bool = False  # Diff against the URL's last recording; re-analyze only what changed
+    devices: list = None     # Keys of agents.profiles.DEVICE_PROFILES; None -> desktop only
+    dom_checks: bool = False # Contrast/font/overlap/density checks in the page (agents/heuristics.py)
+    triage: str = None       # Clean DOM checks -> "skip" Gemini or send only "keyframes"
+    profile: bool = False    # Print the per-phase timing table at the end
+    prom_file: str = None    # Also write metrics in Prometheus textfile format here
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(
+            use_cache=not args.no_cache,
+            keyframes=args.keyframes,
+            capture=args.capture,
+            scroll=args.scroll,
+            popup_rules=load_popup_rules(args.popup_rules) if args.popup_rules else None,
+            block_domains=[] if args.no_block else (
+                DEFAULT_BLOCKED_DOMAINS + _split_csv(args.block_domains) if args.block_domains else None),
+            block_resource_types=[] if args.no_block else (_split_csv(args.block_types) or None),
+            har=args.har,
+            transcode=not args.no_transcode,
+            segmented=args.segmented,
+            stream=args.stream,
+            incremental=args.incremental,
+            devices=_parse_devices(args.devices),
+            dom_checks=args.dom_checks or bool(args.triage),
+            triage=args.triage,
+            profile=args.profile,
+            prom_file=args.prom_file,
+        )
+
+    def recorder(self, output_dir, pool=None, page_hook=None):
+        from agents.browser import BrowserRecorder
+        return BrowserRecorder(output_dir=output_dir, pool=pool, scroll=self.scroll,
+                               popup_rules=self.popup_rules, block_domains=self.block_domains,
+                               block_resource_types=self.block_resource_types, har_mode=self.har,
+                               page_hook=page_hook, dom_checks=self.dom_checks or bool(self.triage))
+
+def _split_csv(value):
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+def _parse_devices(value):
+    if not value:
+        return None
+    devices = list(DEVICE_PROFILES) if value.strip() == "all" else _split_csv(value)
+    unknown = [d for d in devices if d not in DEVICE_PROFILES]
+    if unknown:
+        raise SystemExit(f" Unknown device(s): {', '.join(unknown)} (choose from {', '.join(DEVICE_PROFILES)})")
+    return list(dict.fromkeys(devices))
+
+def merge_dom_checks(data, stats):
+    """Adds the DOM check findings (if any ran) to a Gemini result, in timeline order."""
+    if not stats.heuristics:
+        return data
+    summary = {k: v for k, v in stats.heuristics.items() if k != "issues"}
+    data.issues.extend(Issue.from_dict(i) for i in stats.heuristics["issues"])
+    data.issues.sort(key=lambda i: i.seconds)
+    data.extra["dom_checks"] = summary
+    return data
+
+async def capture_and_analyze(url, recorder, analyst, options, stats, device=DEFAULT_DEVICE):
+    """One browser session on one device -> (AuditResult, archive video path or None)."""
+    if options.capture == "screenshots":
+        # Frames flow straight from the browser into the request; no video file
+        data = await analyst.analyze_frames_async(recorder.stream_screenshots(url, stats=stats, device=device),
+                                                  stream=options.stream)
+        return merge_dom_checks(data, stats), None
+
+    video_path = await recorder.record_session(url, stats=stats, device=device)
+    if not video_path:
+        raise Exception("Browser failed to record video.")
+
+    # Small MP4 for Gemini, full-quality MP4 for the report (ffmpeg runs out of process)
+    if options.transcode:
+        videos = await transcode_recording(video_path)
+    else:
+        videos = {"analysis": video_path, "archive": video_path}
+
+    # Triage: a page with no High/Medium DOM finding is either not sent to
+    # Gemini at all or sent as deduplicated keyframes only
+    clean = options.triage and stats.heuristics and stats.heuristics["clean"]
+    keyframes = options.keyframes or (clean and options.triage == "keyframes")
+    if options.triage and not (stats.heuristics and stats.heuristics["viewports"] and not stats.heuristics["errors"]):
+        print("    DOM checks incomplete: running the full analysis")
+    if clean and options.triage == "skip":
+        print("    DOM checks clean: skipping Gemini analysis")
+        metrics.count("triage_skipped")
+        data = AuditResult(description="Passed every DOM check (contrast, font size, overlap, occlusion, "
+                                       "density); not sent for visual analysis.",
+                           ux_score=stats.heuristics["score"], extra={"triage": "skipped"})
+        return merge_dom_checks(data, stats), videos["archive"]
+
+    # Async analyst: this URL uploads/analyzes while others keep recording
+    if options.incremental:
+        data = await analyst.analyze_incremental_async(url, videos["analysis"], keyframes=keyframes,
+                                                       variant="" if device == DEFAULT_DEVICE else device)
+    elif options.segmented:
+        data = await analyst.analyze_segmented_async(videos["analysis"], keyframes=keyframes)
+    else:
+        data = await analyst.analyze_async(videos["analysis"], keyframes=keyframes,
+                                           stream=options.stream)
+    if clean:
+        data.extra["triage"] = "keyframes"
+    return merge_dom_checks(data, stats), videos["archive"]
+
+async def audit_devices(url, recorder, analyst, options, sessions):
+    """
+    Device matrix: every device in `sessions` ({device: SessionStats}) is a
+    separate context in the same Chromium, recorded and analyzed at once.
+    Returns the merged AuditResult and {device: archive video}; fails only
+    when every device failed.
+    """
+    outcomes = await asyncio.gather(
+        *(capture_and_analyze(url, recorder, analyst, options, stats, device) for device, stats in sessions.items()),
+        return_exceptions=True)
+
+    results, videos, devices = {}, {}, {}
+    for device, outcome in zip(sessions, outcomes):
+        viewport = DEVICE_PROFILES[device]["viewport"]
+        devices[device] = {"viewport": f"{viewport['width']}x{viewport['height']}"}
+        if isinstance(outcome, Exception):
+            devices[device]["error"] = sessions[device].skipped or str(outcome)
+            print(f"    [{device}] failed: {devices[device]['error']}")
+        else:
+            results[device], videos[device] = outcome
+    if not results:
+        raise Exception("; ".join(f"{d}: {info['error']}" for d, info in devices.items()))
+
+    data = AuditResult.merge_devices(results)
+    for device, info in devices.items():
+        info.update(data.extra["devices"].get(device, {}))
+        if videos.get(device):
+            info["video"] = Path(videos[device]).name
+    data.extra["devices"] = devices
+    return data, videos
+
+async def audit_url(url, recorder, analyst, output_dir, options=None):
+    """
+    Record -> upload -> analyze -> report for one URL (on every device in options.devices).
+    Returns a per-URL result dict; never raises, so one bad URL can't sink a batch.
+    """
+    from agents.browser import SessionStats
+    from utils.reporter import HTMLReporter
+
+    # Every span recorded while auditing this URL carries its url label
+    with metrics.bind(url=url), metrics.span("audit"):
+        options = options or AuditOptions()
+        started = time.perf_counter()
+        devices = options.devices or [DEFAULT_DEVICE]
+        sessions = {device: SessionStats() for device in devices}
+        result = {"url": url, "status": "failed", "video": None, "report": None,
+                  "ux_score": None, "issue_count": None, "error": None}
+
+        try:
+            if len(devices) == 1:
+                data, video = await capture_and_analyze(url, recorder, analyst, options,
+                                                        sessions[devices[0]], devices[0])
+                result["video"] = video
+                video_name = Path(video).name if video else None
+            else:
+                data, videos = await audit_devices(url, recorder, analyst, options, sessions)
+                result["video"] = next(iter(videos.values()))
+                result["videos"] = videos
+                video_name = None   # Each device card carries its own video
+
+            # Off the loop: thumbnail decoding must not stall the other sessions
+            reporter = HTMLReporter(output_dir=output_dir)
+            report_path = await asyncio.to_thread(
+                reporter.generate_report,
+                data, video_name, report_name=Path(recorder.session_filename(url)).stem, url=url)
+
+            result.update({
+                "status": "ok",
+                "report": str(report_path),
+                "ux_score": data.ux_score,
+                "issue_count": len(data.issues),
+                "data": data.to_dict(),
+            })
+        except Exception as e:
+            # A page the crawler declined (duplicate, budget) is not a failure
+            skipped = next((s.skipped for s in sessions.values() if s.skipped), None)
+            if skipped:
+                result["status"] = "skipped"
+            result["error"] = skipped or str(e)
+
+        if len(devices) == 1:
+            result["session"] = asdict(sessions[devices[0]])
+        else:
+            result["session"] = {device: asdict(stats) for device, stats in sessions.items()}
+        result["duration_s"] = round(time.perf_counter() - started, 2)
+        return result
@@ -0,0 +1,142 @@
+"""
+Offline stand-in for genai.Client: the subset GeminiAnalyst uses
+(client.aio.files.upload/get, client.aio.models.generate_content[_stream])
+with configurable latency, injected 429/503 errors and canned JSON answers.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+CANNED_RESULT = {
+    "description": "Synthetic benchmark page with stacked sections and images.",
+    "ux_score": 6,
+    "issues": [
+        {"timestamp": "00:02", "severity": "High", "issue": "Cookie banner covers content",
+         "details": "The consent banner hides the first section until dismissed."},
+        {"timestamp": "00:06", "severity": "Medium", "issue": "Long unbroken text blocks",
+         "details": "Sections repeat dense paragraphs with no visual hierarchy."},
+        {"timestamp": "00:11", "severity": "Low", "issue": "Images without captions",
+         "details": "Decorative images add weight but no information."},
+    ],
+}
+
+
+class FakeAPIError(Exception):
+    """Carries `code` like google.genai.errors.APIError, so classify_error treats it the same."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class _Namespace:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeGenAIClient:
+    """
+    latency_s: mean generate latency (jittered +-25%); upload_s_per_mb: upload time per MB;
+    processing_polls: how many get() calls a new upload stays PROCESSING;
+    error_rate_429 / error_rate_503: probability each generate call fails that way.
+    """
+
+    def __init__(self, latency_s=2.0, upload_s_per_mb=0.2, processing_polls=1,
+                 error_rate_429=0.0, error_rate_503=0.0, retry_after_s=1, result=None, seed=None):
+        self.latency_s = latency_s
+        self.upload_s_per_mb = upload_s_per_mb
+        self.processing_polls = processing_polls
+        self.error_rate_429 = error_rate_429
+        self.error_rate_503 = error_rate_503
+        self.retry_after_s = retry_after_s
+        self.result_text = json.dumps(result or CANNED_RESULT)
+        self.random = random.Random(seed)
+        self.calls = {"upload": 0, "get": 0, "generate": 0, "errors_429": 0, "errors_503": 0}
+        self.aio = _Namespace(files=_FakeFiles(self), models=_FakeModels(self))
+
+    async def _latency(self, seconds):
+        await asyncio.sleep(max(0.0, seconds * self.random.uniform(0.75, 1.25)))
+
+    def _maybe_fail(self):
+        roll = self.random.random()
+        if roll < self.error_rate_429:
+            self.calls["errors_429"] += 1
+            raise FakeAPIError(429, f"RESOURCE_EXHAUSTED {{'retryDelay': '{self.retry_after_s}s'}}")
+        if roll < self.error_rate_429 + self.error_rate_503:
+            self.calls["errors_503"] += 1
+            raise FakeAPIError(503, "UNAVAILABLE: The model is overloaded.")
+
+    def _usage(self, contents):
+        prompt_tokens = sum(len(c) // 4 if isinstance(c, str) else 258 for c in contents)
+        output_tokens = len(self.result_text) // 4
+        return _Namespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+                          thoughts_token_count=None, cached_content_token_count=None,
+                          total_token_count=prompt_tokens + output_tokens)
+
+
+class _FakeFiles:
+    def __init__(self, client):
+        self.client = client
+        self.files = {}       # name -> file
+        self.polls = {}       # name -> remaining PROCESSING polls
+        self.counter = itertools.count(1)
+
+    def _file(self, name, state):
+        return _Namespace(
+            name=name, uri=f"https://fake.local/{name}", mime_type="video/mp4",
+            state=_Namespace(name=state),
+            expiration_time=datetime.now(timezone.utc) + timedelta(hours=47),
+        )
+
+    async def upload(self, file):
+        self.client.calls["upload"] += 1
+        size_mb = Path(file).stat().st_size / 1e6
+        await self.client._latency(size_mb * self.client.upload_s_per_mb)
+        name = f"files/fake-{next(self.counter)}"
+        self.polls[name] = self.client.processing_polls
+        self.files[name] = self._file(name, "PROCESSING" if self.polls[name] else "ACTIVE")
+        return self.files[name]
+
+    async def get(self, name):
+        self.client.calls["get"] += 1
+        if name not in self.files:
+            raise FakeAPIError(404, f"NOT_FOUND: {name}")
+        await asyncio.sleep(0.01)
+        self.polls[name] = max(0, self.polls[name] - 1)
+        if self.polls[name] == 0:
+            self.files[name] = self._file(name, "ACTIVE")
+        return self.files[name]
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self.client = client
+
+    async def generate_content(self, model, contents, config=None):
+        client = self.client
+        client.calls["generate"] += 1
+        await client._latency(client.latency_s * 0.1)   # Errors come back fast
+        client._maybe_fail()
+        await client._latency(client.latency_s * 0.9)
+        return _Namespace(text=client.result_text, usage_metadata=client._usage(contents))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        client = self.client
+        client.calls["generate"] += 1
+        await client._latency(client.latency_s * 0.1)
+        client._maybe_fail()
+        text, usage = client.result_text, client._usage(contents)
+        chunk_count = 8
+        size = len(text) // chunk_count + 1
+
+        async def chunks():
+            for i in range(0, len(text), size):
+                await client._latency(client.latency_s * 0.9 / chunk_count)
+                last = i + size >= len(text)
+                yield _Namespace(text=text[i:i + size], usage_metadata=usage if last else None)
+        return chunks()
+
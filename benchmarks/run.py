@@ -0,0 +1,271 @@
+"""
+Offline end-to-end benchmark: synthetic local site -> BrowserRecorder ->
+transcode -> GeminiAnalyst (against FakeGenAIClient) -> HTMLReporter.
+No API key or internet needed. Results are written as JSON so two runs can be
+compared with --compare.
+
+    python -m benchmarks.run --audits 24 --concurrency 4 --latency 2 --error-429 0.1
+    python -m benchmarks.run --no-browser            # replay a synthetic video instead of Chromium
+    python -m benchmarks.run --compare output/benchmarks/bench_<old>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from agents.analyst import MODEL_FALLBACK_CHAIN, GeminiAnalyst
+from agents.browser import BrowserRecorder, SessionStats
+from agents.browser_pool import BrowserPool
+from agents.profiles import CAPTURE_MODES, DEFAULT_DEVICE
+from agents.scheduler import ModelScheduler
+from benchmarks.fake_genai import FakeGenAIClient
+from benchmarks.site import IMAGE_KB, SyntheticSite
+from audit import AuditOptions, audit_url
+from utils import metrics
+from utils.cache import UploadRegistry
+
+# --- CONFIGURATION ---
+RESULTS_DIR = Path("output") / "benchmarks"
+MEMORY_SAMPLE_SECONDS = 0.25
+BENCH_RPM = 1000                 # Fake quota: high enough that only injected errors throttle
+REPLAY_SECONDS = 12              # Length of the synthetic video used with --no-browser
+REPLAY_FPS = 10
+COMPARE_KEYS = ["audits_per_min", "latency.p50_s", "latency.p95_s", "peak_rss_mb"]
+
+
+class _MemorySampler:
+    """Peak RSS of this process plus its children (Chromium, ffmpeg)."""
+
+    def __init__(self):
+        self.peak_bytes = 0
+        self._task = None
+
+    def _rss(self):
+        if psutil is None:
+            return 0
+        process = psutil.Process(os.getpid())
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    async def _run(self):
+        while True:
+            self.peak_bytes = max(self.peak_bytes, self._rss())
+            await asyncio.sleep(MEMORY_SAMPLE_SECONDS)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        if psutil is None:
+            # Fallback: the kernel's high-water marks (KB on Linux)
+            import resource
+            self.peak_bytes = 1024 * (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                                      + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def _make_replay_video(path, seconds=REPLAY_SECONDS, fps=REPLAY_FPS):
+    """
+    A page of seeded random blocks (cards, text lines, images) scrolled in
+    steps with a pause after each, like an adaptive scroll: frames differ in
+    both directions while moving and repeat while paused, so keyframe dedupe
+    and transcoding have real work.
+    """
+    import cv2
+    import numpy as np
+
+    width, height = 1280, 720
+    rng = np.random.default_rng(7)
+    page = np.full((height * 4, width, 3), 245, dtype=np.uint8)
+    for top in range(0, page.shape[0], 120):
+        left = int(rng.integers(0, width // 2))
+        color = tuple(int(c) for c in rng.integers(30, 230, 3))
+        page[top + 10:top + 100, left:left + int(rng.integers(200, width // 2))] = color
+        for line in range(top + 20, top + 100, 18):   # "Text" lines of varying length
+            start = int(rng.integers(0, width // 3))
+            page[line:line + 6, start:start + int(rng.integers(80, width - start))] = (60, 60, 60)
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    frames = seconds * fps
+    steps = max(1, seconds // 2)
+    per_step = frames / steps
+    for i in range(frames):
+        step, phase = divmod(i, per_step)
+        progress = step + min(1.0, phase / (per_step / 2))   # Move for half of each step, hold for the rest
+        offset = int(progress / steps * height * 3)
+        writer.write(np.ascontiguousarray(page[offset:offset + height]))
+    writer.release()
+    return path
+
+
+class ReplayRecorder(BrowserRecorder):
+    """BrowserRecorder that 'records' by copying a prepared video (for --no-browser)."""
+
+    def __init__(self, video_path, output_dir):
+        super().__init__(output_dir=output_dir)
+        self.video_path = Path(video_path)
+
+    async def record_session(self, url, stats=None, device=DEFAULT_DEVICE):
+        stats = stats if stats is not None else SessionStats()
+        stats.url, stats.capture, stats.device = url, "video", device
+        final_path = self.output_dir / self.session_filename(url, device)
+        with metrics.span("video_save"):
+            await asyncio.to_thread(shutil.copyfile, self.video_path, final_path)
+        stats.bytes = final_path.stat().st_size
+        return str(final_path)
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    pick = lambda pct: ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+    return {"p50_s": round(pick(50), 3), "p90_s": round(pick(90), 3),
+            "p95_s": round(pick(95), 3), "max_s": round(ordered[-1], 3)}
+
+
+async def run_benchmark(args):
+    run_metrics = metrics.start_run()
+    run_dir = RESULTS_DIR / f"run_{run_metrics.run_id}"
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    client = FakeGenAIClient(latency_s=args.latency, error_rate_429=args.error_429,
+                             error_rate_503=args.error_503, seed=args.seed)
+    scheduler = ModelScheduler(MODEL_FALLBACK_CHAIN,
+                               {m: {"rpm": BENCH_RPM, "tpm": BENCH_RPM * 100_000} for m in MODEL_FALLBACK_CHAIN})
+    analyst = GeminiAnalyst(use_cache=False, scheduler=scheduler, client=client,
+                            uploads=UploadRegistry(run_dir / "uploads.json"))
+    options = AuditOptions(use_cache=False, keyframes=args.keyframes, capture=args.capture,
+                           transcode=not args.no_transcode, stream=args.stream)
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def one(url, recorder):
+        async with limit:
+            return await audit_url(url, recorder, analyst, run_dir, options)
+
+    with SyntheticSite() as site, _MemorySampler() as memory:
+        urls = site.urls(args.audits, image_kb=args.image_kb)
+        started = time.perf_counter()
+        if args.no_browser:
+            recorder = ReplayRecorder(_make_replay_video(run_dir / "replay_source.mp4"), run_dir)
+            results = await asyncio.gather(*(one(url, recorder) for url in urls))
+        else:
+            async with BrowserPool(size=1) as pool:
+                recorder = options.recorder(run_dir, pool)
+                results = await asyncio.gather(*(one(url, recorder) for url in urls))
+        elapsed = time.perf_counter() - started
+
+    succeeded = [r for r in results if r["status"] == "ok"]
+    report = {
+        "run_id": run_metrics.run_id,
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "audits": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "errors": sorted({r["error"] for r in results if r["error"]}),
+        "elapsed_s": round(elapsed, 2),
+        "audits_per_min": round(len(succeeded) / elapsed * 60, 2) if elapsed else 0.0,
+        "latency": _percentiles([r["duration_s"] for r in succeeded]),
+        "peak_rss_mb": round(memory.peak_bytes / 1e6, 1),
+        "scheduler": {"retries": scheduler.retries, "sleep_s": round(scheduler.sleep_s, 2)},
+        "fake_api_calls": client.calls,
+        "phases": run_metrics.phase_summary(),
+        "counters": run_metrics.counter_list(),
+    }
+    if not args.keep_artifacts:
+        shutil.rmtree(run_dir, ignore_errors=True)
+    return report, run_metrics
+
+
+def _lookup(report, dotted):
+    value = report
+    for part in dotted.split("."):
+        value = value.get(part, {}) if isinstance(value, dict) else {}
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare(current, baseline):
+    """Prints headline and per-phase p50/p95 deltas against an earlier result file."""
+    print("\n" + "-" * 72)
+    print(f" COMPARE {current['run_id']} vs {baseline['run_id']}")
+    print("-" * 72)
+    rows = [(key, _lookup(current, key), _lookup(baseline, key)) for key in COMPARE_KEYS]
+    for phase in current["phases"]:
+        for stat in ("p50_s", "p95_s"):
+            key = f"phases.{phase}.{stat}"
+            rows.append((key, _lookup(current, key), _lookup(baseline, key)))
+    for key, now, before in rows:
+        if now is None or before is None:
+            continue
+        change = f"{(now - before) / before:+.0%}" if before else "n/a"
+        print(f" {key:<36}{before:>12.2f}{now:>12.2f}{change:>10}")
+    print("-" * 72)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Offline VisionQA throughput/latency benchmark")
+    parser.add_argument("--audits", type=int, default=12, help="Number of synthetic pages to audit")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=2.0, help="Mean fake generate latency (s)")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Share of generate calls failing with 429")
+    parser.add_argument("--error-503", type=float, default=0.0, help="Share of generate calls failing with 503")
+    parser.add_argument("--image-kb", type=int, default=IMAGE_KB, help="Weight of each synthetic image")
+    parser.add_argument("--capture", choices=CAPTURE_MODES, default="video")
+    parser.add_argument("--keyframes", action="store_true")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--no-transcode", action="store_true")
+    parser.add_argument("--no-browser", action="store_true",
+                        help="Skip Chromium; every audit replays a synthetic video")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-artifacts", action="store_true", help="Keep recordings and reports")
+    parser.add_argument("--out", metavar="FILE", help="Result JSON path (default: output/benchmarks/)")
+    parser.add_argument("--compare", metavar="FILE", help="Earlier result JSON to diff against")
+    args = parser.parse_args()
+
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+    report, run_metrics = asyncio.run(run_benchmark(args))
+    out = Path(args.out) if args.out else RESULTS_DIR / f"bench_{report['run_id']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 72)
+    print(f" BENCHMARK: {report['succeeded']}/{report['audits']} audits in {report['elapsed_s']}s "
+          f"-> {report['audits_per_min']} audits/min")
+    print(f" Latency per audit: {report['latency']}")
+    print(f" Peak RSS (incl. children): {report['peak_rss_mb']} MB | "
+          f"retries {report['scheduler']['retries']}, backoff {report['scheduler']['sleep_s']}s")
+    for error in report["errors"][:5]:
+        print(f"   ! {error}")
+    run_metrics.print_profile()
+    print(f" Results: {out.absolute()}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Synthetic website for benchmarks: pages of configurable height, image weight
+and popup behaviour, served from a local HTTP server on a background thread.
+
+    /page?height=6000&images=20&image_kb=80&popup=late
+    /img/<n>.bmp?kb=80
+"""
+
+import itertools
+import random
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# --- CONFIGURATION ---
+PAGE_HEIGHTS = [1500, 6000, 20000]
+IMAGE_COUNTS = [0, 12, 40]
+IMAGE_KB = 80
+POPUP_MODES = ["none", "banner", "late", "modal"]
+LATE_POPUP_DELAY_MS = 2000
+
+POPUPS = {
+    "none": "",
+    # Matches the onetrust rule in agents/popups.py
+    "banner": """<div id="onetrust-banner" style="position:fixed;bottom:0;left:0;right:0;padding:24px;background:#222;color:#fff">
+        We use cookies. <button id="onetrust-accept-btn-handler"
+        onclick="this.parentNode.remove()">Accept</button></div>""",
+    # Injected after load, so only the MutationObserver can catch it
+    "late": """<script>setTimeout(() => {
+        const d = document.createElement('div');
+        d.style.cssText = 'position:fixed;inset:auto 0 0 0;padding:24px;background:#333;color:#fff';
+        d.innerHTML = 'Cookies? <button onclick="this.parentNode.remove()">Accept All</button>';
+        document.body.appendChild(d);
+    }, %d);</script>""" % LATE_POPUP_DELAY_MS,
+    # Full-screen overlay matched by button text
+    "modal": """<div style="position:fixed;inset:0;background:rgba(0,0,0,.7);display:flex;align-items:center;justify-content:center">
+        <div style="background:#fff;padding:40px">Consent required
+        <button onclick="this.closest('div').parentNode.remove()">I Agree</button></div></div>""",
+}
+
+
+def _bmp(kb, seed):
+    """An uncompressed 24-bit BMP of roughly `kb` KB; decodes instantly, weighs exactly."""
+    width = 256
+    height = max(1, kb * 1024 // (width * 3))
+    rng = random.Random(seed)
+    row = bytes(rng.randrange(256) for _ in range(width * 3))
+    pixels = row * height
+    header = struct.pack("<2sIHHI", b"BM", 54 + len(pixels), 0, 0, 54)
+    info = struct.pack("<IiiHHIIiiII", 40, width, height, 1, 24, 0, len(pixels), 2835, 2835, 0, 0)
+    return header + info + pixels
+
+
+def render_page(height, images, image_kb, popup):
+    blocks = []
+    section_height = 600
+    for i in range(max(1, height // section_height)):
+        hue = (i * 47) % 360
+        blocks.append(f'<section style="height:{section_height}px;background:hsl({hue},40%,92%);padding:24px">'
+                      f'<h2>Section {i + 1}</h2><p>{"Lorem ipsum dolor sit amet. " * 20}</p></section>')
+    for i in range(images):
+        blocks.insert(min(len(blocks), i % len(blocks) + 1),
+                      f'<img src="/img/{i}.bmp?kb={image_kb}" width="256" loading="lazy" alt="">')
+    return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>Bench {height}/{images}/{popup}</title></head>
+<body style="margin:0;font-family:sans-serif">{''.join(blocks)}{POPUPS.get(popup, '')}</body></html>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/page":
+            body = render_page(int(query.get("height", 6000)), int(query.get("images", 0)),
+                               int(query.get("image_kb", IMAGE_KB)), query.get("popup", "none")).encode()
+            content_type = "text/html; charset=utf-8"
+        elif url.path.startswith("/img/"):
+            seed = url.path.rsplit("/", 1)[-1].split(".")[0]
+            body = _bmp(int(query.get("kb", IMAGE_KB)), seed)
+            content_type = "image/bmp"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # Keep benchmark output readable
+
+
+class SyntheticSite:
+    """
+    with SyntheticSite() as site:
+        urls = site.urls(20)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def urls(self, count, image_kb=IMAGE_KB):
+        """`count` page URLs cycling through the height x images x popup matrix."""
+        matrix = itertools.cycle(itertools.product(PAGE_HEIGHTS, IMAGE_COUNTS, POPUP_MODES))
+        urls = []
+        for i, (height, images, popup) in zip(range(count), matrix):
+            query = urlencode({"height": height, "images": images, "image_kb": image_kb, "popup": popup, "n": i})
+            urls.append(f"{self.base_url}/page?{query}")
+        return urls
@@ -1,12 +1,20 @@
 import asyncio
 import argparse
+import os
 import sys
 import json
 import re
+import time
 from pathlib import Path
-from agents.browser import BrowserRecorder
-from agents.analyst import GeminiAnalyst
-from utils.reporter import HTMLReporter  # Makes sure utils/reporter.py exists
+# Playwright, google-genai and OpenCV are imported inside the functions that
+# audit in-process, so `--server` (thin client) calls start instantly.
+from agents.profiles import CAPTURE_MODES, SCROLL_MODES, HAR_MODES, DEVICE_PROFILES
+from agents.heuristics import TRIAGE_MODES
+from agents.crawler import MAX_DEPTH, MAX_PAGES, SiteCrawler, fetch_sitemap
+from utils import metrics
+from utils.results import AuditResult
+from audit import AuditOptions, audit_url
+from service import DEFAULT_HOST, DEFAULT_PORT, QUEUE_SIZE, ServiceClient, ServiceError, serve, submittable_options
 
 import webbrowser
 
@@ -19,89 +27,361 @@ def print_header():
 def print_console_summary(data):
     """Prints the 'Roast' to the terminal"""
     print("\n" + "-" * 60)
-    print(f" UX SCORE: {data.get('ux_score', '?')}/10")
-    print(f" SUMMARY: {data.get('description', 'N/A')}")
+    print(f" UX SCORE: {data.ux_score}/10")
+    for device, info in data.extra.get("devices", {}).items():
+        print(f"   {device:<8} {info['viewport']:>10}: "
+              + (f"{info['ux_score']}/10, {info['issue_count']} issues" if "error" not in info
+                 else f"failed ({info['error']})"))
+    print(f" SUMMARY: {data.description}")
     print("-" * 60)
     
-    issues = data.get('issues', [])
+    issues = data.sorted_issues()
     if not issues:
         print(" No major issues found.")
     else:
-        # Sort by severity
-        severity_map = {"High": 0, "Medium": 1, "Low": 2}
-        issues.sort(key=lambda x: severity_map.get(x.get('severity', 'Low'), 3))
-        
         print(f" DETECTED ISSUES ({len(issues)}):")
         for i, issue in enumerate(issues, 1):
-            sev = issue.get('severity', 'Low')
-            icon = "🔴" if sev == "High" else "🟡" if sev == "Medium" else "🟢"
-            print(f"   {i}. {icon} [{sev}] {issue.get('issue', 'Issue')}")
-            print(f"      ↳ {issue.get('details', '')}")
+            icon = "🔴" if issue.severity == "High" else "🟡" if issue.severity == "Medium" else "🟢"
+            device = f" ({issue.extra['device']})" if "device" in issue.extra else ""
+            source = " [DOM]" if issue.extra.get("source") == "dom" else ""
+            print(f"   {i}. {icon} [{issue.severity}]{source} {issue.issue}{device}")
+            print(f"      ↳ {issue.details}")
+    incremental = data.extra.get("incremental")
+    if incremental and incremental["mode"] != "baseline":
+        statuses = [i.extra.get("status") for i in issues]
+        print(f" RE-AUDIT ({incremental['mode']}): {statuses.count('new')} new, "
+              f"{statuses.count('carried')} carried, {len(data.extra.get('resolved_issues', []))} resolved")
+    # Single device: notes on the result itself; device matrix: one set per device
+    runs = data.extra.get("devices") or {None: data.extra}
+    for device, info in runs.items():
+        checks = info.get("dom_checks")
+        if checks:
+            found = ", ".join(f"{n} {kind}" for kind, n in checks["counts"].items()) or "nothing"
+            triage = f", Gemini {info['triage']}" if info.get("triage") else ""
+            label = f" ({device})" if device else ""
+            print(f" DOM CHECKS{label}: {checks['viewports']} viewports, {found}{triage}")
     print("-" * 60)
 
-async def run_audit(url):
+def write_run_metrics(run_metrics, json_path, options):
+    """Per-run metrics JSON, optional Prometheus textfile, optional --profile table."""
+    run_metrics.write_json(json_path)
+    if options.prom_file:
+        run_metrics.write_prometheus(options.prom_file)
+    if options.profile:
+        run_metrics.print_profile()
+    print(f" Metrics: {Path(json_path).absolute()}")
+
+
+async def run_audit(url, options=None, open_report=True):
     print_header()
+    options = options or AuditOptions()
+    run_metrics = metrics.start_run()
 
     # 1. SETUP
     output_dir = Path("output")
     output_dir.mkdir(exist_ok=True)
     
-    # 2. RECORDING PHASE
-    print(f" PHASE 1: DATA COLLECTION")
+    # 2. RECORDING + ANALYSIS PHASE
+    print(f" PHASE 1: DATA COLLECTION ({options.capture})")
     print(f"   Target: {url}")
     
-    recorder = BrowserRecorder(output_dir=output_dir)
-    video_path = await recorder.record_session(url)
-    
-    if not video_path:
-        print(" Fatal Error: Browser failed to record video.")
-        return
-
-    # 3. ANALYSIS PHASE
-    print(f"\n PHASE 2: AI ANALYSIS")
-    
+    from agents.browser_pool import BrowserPool
     try:
-        analyst = GeminiAnalyst()
-        video_file = analyst.upload_video(video_path)
-        raw_result = analyst.analyze_video_full(video_file)
-        
-        # Parse JSON (Handle Markdown wrapping)
-        clean_json = raw_result.strip()
-        if clean_json.startswith('```'):
-            clean_json = re.sub(r'^```(?:json)?\s*', '', clean_json)
-            clean_json = re.sub(r'\s*```$', '', clean_json)
-        
-        data = json.loads(clean_json)
-        
-        # 4. REPORTING PHASE
-        if data:
-            # A. Console Output (Instant Gratification)
-            print_console_summary(data)
-            
-            # B. HTML Artifact (The "Vibe Engineering" Proof)
-            reporter = HTMLReporter(output_dir=output_dir)
-            report_path = reporter.generate_report(data, Path(video_path).name)
-            
-            print(f"\n SUCCESS: Report Generated!")
-            print(f" Open this file: {report_path.absolute()}")
-
-            webbrowser.open(f"file://{report_path.absolute()}")
-            
+        from agents.analyst import GeminiAnalyst
+        analyst = GeminiAnalyst(use_cache=options.use_cache)
     except Exception as e:
         print(f"\n Error during analysis phase: {e}")
-        import traceback
-        traceback.print_exc()
+        return
+
+    # One Chromium for the run: a device matrix records in parallel contexts of it
+    async with BrowserPool(size=1) as pool:
+        recorder = options.recorder(output_dir, pool)
+        result = await audit_url(url, recorder, analyst, output_dir, options)
+    write_run_metrics(run_metrics, output_dir / "metrics" / f"metrics_{run_metrics.run_id}.json", options)
+
+    if result["status"] != "ok":
+        print(f"\n Fatal Error: {result['error']}")
+        return
+
+    # 3. REPORTING PHASE
+    # A. Console Output (Instant Gratification)
+    print_console_summary(AuditResult.from_dict(result["data"]))
+
+    # B. HTML Artifact (The "Vibe Engineering" Proof)
+    report_path = Path(result["report"])
+    print(f"\n SUCCESS: Report Generated!")
+    print(f" Open this file: {report_path.absolute()}")
+
+    if open_report:
+        webbrowser.open(f"file://{report_path.absolute()}")
+
+def read_urls(source):
+    """Reads one URL per line from a file, or from stdin when source is '-'."""
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(source).read_text(encoding="utf-8").splitlines()
+
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#") and line not in urls:
+            urls.append(line)
+    return urls
+
+def run_remote(urls, server, options, open_report=True):
+    """
+    Thin client: the audits run in a `main.py --serve` daemon (warm browsers,
+    one shared Gemini client). Returns how many audits did not succeed.
+    """
+    print_header()
+    client = ServiceClient(server)
+    jobs = [client.submit(url, submittable_options(options)) for url in urls]
+    for job in jobs:
+        print(f" Submitted {job['url']} -> job {job['id']}")
+
+    failed = 0
+    for job in jobs:
+        result = client.wait(job["id"])
+        if result["status"] != "ok":
+            print(f"\n {job['url']}: {result['status']} ({result.get('error')})")
+            failed += result["status"] != "skipped"
+            continue
+        print_console_summary(AuditResult.from_dict(result["data"]))
+        print(f" Report: {client.report_url(job['id'])}")
+        if open_report and len(jobs) == 1:
+            webbrowser.open(client.report_url(job["id"]))
+    return failed
+
+def write_result(result_dir, index, result):
+    safe_url = re.sub(r'[^A-Za-z0-9._-]+', '_', result["url"].split('://')[-1])[:60]
+    result_file = result_dir / f"{index:04d}_{safe_url}.json"
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+async def run_batch(urls, concurrency=4, options=None):
+    print_header()
+    print(f" BATCH MODE: {len(urls)} URLs, concurrency {concurrency}")
+
+    output_dir = Path("output")
+    output_dir.mkdir(exist_ok=True)
+    run_metrics = metrics.start_run()
+    batch_dir = output_dir / f"batch_{run_metrics.run_id}"
+    batch_dir.mkdir(exist_ok=True)
+
+    from agents.analyst import GeminiAnalyst
+    from agents.browser_pool import BrowserPool
+
+    options = options or AuditOptions()
+    analyst = GeminiAnalyst(use_cache=options.use_cache)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def worker(index, url, recorder):
+        async with limit:
+            result = await audit_url(url, recorder, analyst, output_dir, options)
+
+        icon = "✅" if result["status"] == "ok" else "❌"
+        print(f" {icon} [{index}/{len(urls)}] {url} ({result['duration_s']}s)"
+              + (f" -> {result['error']}" if result["error"] else ""))
+
+        write_result(batch_dir, index, result)
+        return result
+
+    started = time.perf_counter()
+    # One warm Chromium serves every recording; each session gets its own context
+    async with BrowserPool(size=1) as pool:
+        recorder = options.recorder(output_dir, pool)
+        results = await asyncio.gather(*(worker(i, url, recorder) for i, url in enumerate(urls, 1)))
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        "total": len(results),
+        "succeeded": sum(1 for r in results if r["status"] == "ok"),
+        "failed": sum(1 for r in results if r["status"] != "ok"),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "cache": analyst.cache.stats() if analyst.cache else None,
+        "results": [{k: v for k, v in r.items() if k != "data"} for r in results],
+    }
+    summary_path = batch_dir / "summary.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    write_run_metrics(run_metrics, batch_dir / "metrics.json", options)
+
+    print("\n" + "-" * 60)
+    print(f" BATCH DONE: {summary['succeeded']}/{summary['total']} succeeded in {summary['elapsed_s']}s")
+    print(f" Summary: {summary_path.absolute()}")
+    print("-" * 60)
+    return summary
+
+async def run_crawl(start_url, concurrency=4, max_pages=MAX_PAGES, max_depth=MAX_DEPTH,
+                    sitemap=None, options=None):
+    print_header()
+    print(f" CRAWL MODE: {start_url} (up to {max_pages} pages, depth {max_depth}, concurrency {concurrency})")
+
+    output_dir = Path("output")
+    output_dir.mkdir(exist_ok=True)
+    run_metrics = metrics.start_run()
+    crawl_dir = output_dir / f"crawl_{run_metrics.run_id}"
+    crawl_dir.mkdir(exist_ok=True)
+
+    from agents.analyst import GeminiAnalyst
+    from agents.browser_pool import BrowserPool
+
+    options = options or AuditOptions()
+    analyst = GeminiAnalyst(use_cache=options.use_cache)
+    crawler = SiteCrawler(start_url, max_pages=max_pages, max_depth=max_depth)
+
+    if sitemap:
+        sitemap_url = crawler.sitemap_url if sitemap == "auto" else sitemap
+        urls = await asyncio.to_thread(fetch_sitemap, sitemap_url, crawler.max_visits)
+        print(f" Sitemap: {crawler.seed(urls)} new page(s) from {sitemap_url}")
+
+    audited = 0
+
+    async def visit(url):
+        nonlocal audited
+        result = await audit_url(url, recorder, analyst, output_dir, options)
+        result["depth"] = crawler.depth.get(url)
+        result["parent"] = crawler.parent.get(url)
+        if result["status"] == "skipped":
+            print(f" ⏭️  {url} -> {result['error']}")
+            return result
+
+        audited += 1
+        icon = "✅" if result["status"] == "ok" else "❌"
+        print(f" {icon} [{audited}/{max_pages}] {url} (depth {result['depth']}, {result['duration_s']}s)"
+              + (f" -> {result['error']}" if result["error"] else ""))
+        write_result(crawl_dir, audited, result)
+        return result
+
+    started = time.perf_counter()
+    async with BrowserPool(size=1) as pool:
+        recorder = options.recorder(output_dir, pool, page_hook=crawler.inspect_page)
+        results = await crawler.run(visit, concurrency)
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        "start_url": crawler.start_url,
+        "discovered": len(crawler.depth),
+        "visited": len(results),
+        "audited": sum(1 for r in results if r["status"] == "ok"),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "templates": len(crawler.templates),
+        "max_pages": max_pages,
+        "max_depth": max_depth,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "cache": analyst.cache.stats() if analyst.cache else None,
+        "results": [{k: v for k, v in r.items() if k != "data"} for r in results],
+        "site_map": crawler.site_map(),
+    }
+    summary_path = crawl_dir / "summary.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    write_run_metrics(run_metrics, crawl_dir / "metrics.json", options)
+
+    print("\n" + "-" * 60)
+    print(f" CRAWL DONE: {summary['audited']} pages audited, {summary['skipped']} duplicates skipped, "
+          f"{summary['failed']} failed, {summary['discovered']} URLs discovered in {summary['elapsed_s']}s")
+    print(f" Summary: {summary_path.absolute()}")
 
 def main():
     parser = argparse.ArgumentParser(description="VisionQA - AI Automated UX Testing")
-    parser.add_argument("url", help="The website URL to audit")
+    parser.add_argument("url", nargs="?", help="The website URL to audit")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="Audit every URL in FILE (one per line, '-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Max audits in flight at once in batch/crawl mode, or --serve workers (default: 4)")
+    parser.add_argument("--crawl", action="store_true",
+                        help="Crawl the site from URL: follow same-origin links, skip duplicate templates")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES,
+                        help=f"Crawl mode: pages to record and analyze (default: {MAX_PAGES})")
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH,
+                        help=f"Crawl mode: link hops to follow from the start URL (default: {MAX_DEPTH})")
+    parser.add_argument("--sitemap", nargs="?", const="auto", metavar="URL",
+                        help="Crawl mode: also seed from a sitemap (default: <origin>/sitemap.xml)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a daemon: HTTP job API with warm browsers (--concurrency workers)")
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help=f"--serve: address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"--serve: port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help=f"--serve: queued jobs before new ones are refused with 429 (default: {QUEUE_SIZE})")
+    parser.add_argument("--server", metavar="URL",
+                        help="Send the audit(s) to a running --serve daemon instead of running in-process")
+    parser.add_argument("--no-open", action="store_true",
+                        help="Do not open the report in a browser when done (implied when $CI is set)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore cached Gemini results and always re-analyze")
+    parser.add_argument("--keyframes", action="store_true",
+                        help="Send deduplicated keyframes to Gemini instead of the full video")
+    parser.add_argument("--segmented", action="store_true",
+                        help="Split long recordings into overlapping windows analyzed in parallel")
+    parser.add_argument("--dom-checks", action="store_true",
+                        help="Measure contrast, font size, overlap and density in the page while recording")
+    parser.add_argument("--triage", choices=TRIAGE_MODES, default=None,
+                        help="Pages that pass every DOM check skip Gemini or send only keyframes (implies --dom-checks)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Re-audit against the last run of the URL: only changed parts go to Gemini")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream Gemini's answer and print each issue as soon as it is complete")
+    parser.add_argument("--capture", choices=CAPTURE_MODES, default="video",
+                        help="Record a video, or stream viewport screenshots (no video file)")
+    parser.add_argument("--devices", metavar="LIST",
+                        help=f"Record in several device profiles at once, e.g. desktop,mobile or 'all' "
+                             f"({', '.join(DEVICE_PROFILES)}); one combined report with per-device scores")
+    parser.add_argument("--scroll", choices=SCROLL_MODES, default="adaptive",
+                        help="Adaptive (settle-aware, stops at the bottom) or the old fixed 20s scroll")
+    parser.add_argument("--popup-rules", metavar="FILE",
+                        help="JSON list of popup/consent rules replacing the built-in set")
+    parser.add_argument("--block-domains", metavar="LIST",
+                        help="Comma-separated extra domains to block (on top of the tracker list)")
+    parser.add_argument("--block-types", metavar="LIST",
+                        help="Comma-separated resource types to block, e.g. media,websocket")
+    parser.add_argument("--no-block", action="store_true",
+                        help="Disable all request blocking")
+    parser.add_argument("--no-transcode", action="store_true",
+                        help="Send/report the raw WebM instead of transcoded MP4s")
+    parser.add_argument("--har", choices=HAR_MODES,
+                        help="record: save the session to output/har/; replay: re-audit from it offline")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a per-phase timing/bytes/tokens breakdown at the end")
+    parser.add_argument("--prom-file", metavar="FILE",
+                        help="Also write run metrics in Prometheus textfile-collector format")
     args = parser.parse_args()
+
+    if not args.url and not args.batch and not args.serve:
+        parser.error("either a URL or --batch FILE is required")
+    if args.crawl and not args.url:
+        parser.error("--crawl needs a start URL")
+    if args.server and (args.crawl or args.serve):
+        parser.error("--server works with a URL or --batch, not with --crawl/--serve")
+    open_report = not (args.no_open or os.environ.get("CI"))
     
     if sys.platform == 'win32':
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
     try:
-        asyncio.run(run_audit(args.url))
+        options = AuditOptions.from_args(args)
+        if args.serve:
+            asyncio.run(serve(options, max(1, args.concurrency), max(1, args.queue_size), args.host, args.port))
+        elif args.server:
+            urls = read_urls(args.batch) if args.batch else [args.url]
+            try:
+                failed = run_remote(urls, args.server, options, open_report)
+            except (ServiceError, OSError) as e:
+                sys.exit(f" Service error ({args.server}): {e}")
+            sys.exit(1 if failed else 0)
+        elif args.crawl:
+            asyncio.run(run_crawl(args.url, max(1, args.concurrency), max(1, args.max_pages),
+                                  max(0, args.max_depth), args.sitemap, options))
+        elif args.batch:
+            asyncio.run(run_batch(read_urls(args.batch), max(1, args.concurrency), options))
+        else:
+            asyncio.run(run_audit(args.url, options, open_report))
     except KeyboardInterrupt:
         print("\n\n Audit interrupted by user.")
 
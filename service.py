@@ -0,0 +1,448 @@
+"""
+VisionQA Audit Service
+A long-running daemon: one warm Chromium pool and one shared Gemini client
+serve every audit, fed by a bounded job queue behind a small local HTTP API.
+
+    python main.py --serve                       # start the daemon
+    python main.py https://example.com --server http://127.0.0.1:8765
+
+API (JSON unless noted):
+    POST   /jobs              {"url": ..., "options": {...}} -> 202 job, 429 when the queue is full
+    GET    /jobs              recent jobs
+    GET    /jobs/<id>         status of one job
+    GET    /jobs/<id>/result  full result (409 until the job has finished)
+    GET    /jobs/<id>/report  HTML report (redirects into /files/)
+    DELETE /jobs/<id>         cancel a queued or running job
+    GET    /files/<path>      reports, videos and thumbnails from the output folder
+    GET    /health            queue depth, running jobs, draining flag
+"""
+
+import asyncio
+import json
+import math
+import mimetypes
+import re
+import signal
+import time
+import urllib.error
+import urllib.request
+import uuid
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from audit import AuditOptions, audit_url
+from agents.profiles import CAPTURE_MODES, DEVICE_PROFILES, HAR_MODES, SCROLL_MODES
+from agents.heuristics import TRIAGE_MODES
+from utils import metrics
+
+# --- CONFIGURATION ---
+DEFAULT_HOST = "127.0.0.1"   # Local only: the API has no authentication
+DEFAULT_PORT = 8765
+QUEUE_SIZE = 100             # Queued (not yet running) jobs before submissions get 429
+MAX_JOB_HISTORY = 1000       # Finished jobs kept in memory; results stay on disk
+DRAIN_TIMEOUT_SECONDS = 300  # On shutdown, running jobs get this long to finish
+REQUEST_TIMEOUT_SECONDS = 30
+MAX_BODY_BYTES = 1_000_000
+FILE_CHUNK_BYTES = 256 * 1024
+CLIENT_POLL_SECONDS = (1, 2, 3, 5)   # Thin-client status polling, then every 5s
+
+# Options a job may set; stream/profile/prom_file only make sense on a terminal
+JOB_OPTIONS = {"use_cache", "keyframes", "capture", "scroll", "popup_rules", "block_domains",
+               "block_resource_types", "har", "transcode", "segmented", "incremental", "devices",
+               "dom_checks", "triage"}
+FINISHED = ("ok", "failed", "skipped", "cancelled")
+
+STATUS_TEXT = {200: "OK", 202: "Accepted", 302: "Found", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+               429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ServiceError(Exception):
+    """An HTTP error answer: status code plus message."""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+@dataclass
+class Job:
+    id: str
+    url: str
+    options: object          # main.AuditOptions
+    status: str = "queued"   # queued -> running -> ok | failed | skipped | cancelled
+    submitted: float = field(default_factory=time.time)
+    started: float = None
+    finished: float = None
+    result: dict = None
+    task: asyncio.Task = field(default=None, repr=False)
+
+    def summary(self):
+        result = self.result or {}
+        return {
+            "id": self.id, "url": self.url, "status": self.status,
+            "submitted": self.submitted, "started": self.started, "finished": self.finished,
+            "ux_score": result.get("ux_score"), "issue_count": result.get("issue_count"),
+            "report": f"/jobs/{self.id}/report" if result.get("report") else None,
+            "error": result.get("error"),
+            "options": submittable_options(self.options),
+        }
+
+
+def job_options(defaults, overrides):
+    """The daemon's default AuditOptions with a job's overrides applied (validated)."""
+    if overrides is None:
+        overrides = {}
+    if not isinstance(overrides, dict):
+        raise ServiceError(400, "options must be a JSON object")
+    unknown = set(overrides) - JOB_OPTIONS
+    if unknown:
+        raise ServiceError(400, f"Unknown option(s): {', '.join(sorted(unknown))}")
+    checks = {"capture": CAPTURE_MODES, "scroll": SCROLL_MODES, "har": HAR_MODES + (None,),
+              "triage": TRIAGE_MODES + (None,)}
+    for name, allowed in checks.items():
+        if name in overrides and overrides[name] not in allowed:
+            raise ServiceError(400, f"{name} must be one of {', '.join(map(str, allowed))}")
+    if overrides.get("devices") and any(d not in DEVICE_PROFILES for d in overrides["devices"]):
+        raise ServiceError(400, f"devices must be among {', '.join(DEVICE_PROFILES)}")
+    return replace(defaults, **overrides)
+
+
+class AuditService:
+    """
+    Job queue + workers + HTTP front end. Backpressure: at most `queue_size`
+    jobs wait, further submissions get 429 with a Retry-After estimate.
+    Shutdown (SIGINT/SIGTERM) drains: no new jobs, queued and running ones
+    finish (up to DRAIN_TIMEOUT_SECONDS), then the browsers are closed.
+    """
+
+    def __init__(self, options=None, workers=4, queue_size=QUEUE_SIZE, output_dir="output",
+                 host=DEFAULT_HOST, port=DEFAULT_PORT, analyst=None, pool=None):
+        self.options = options or AuditOptions()
+        self.workers = max(1, workers)
+        self.output_dir = Path(output_dir)
+        self.jobs_dir = self.output_dir / "service"
+        self.host, self.port = host, port
+        self.analyst = analyst
+        self.pool = pool
+        self.jobs = {}            # id -> Job, oldest first
+        self.queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.draining = False
+        self.durations = []       # Recent job wall times, for Retry-After
+        self._workers = []
+        self._server = None
+
+    async def start(self):
+        from agents.analyst import GeminiAnalyst
+        from agents.browser_pool import BrowserPool
+
+        self.output_dir.mkdir(exist_ok=True)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        if self.analyst is None:
+            self.analyst = GeminiAnalyst(use_cache=self.options.use_cache)
+        if self.pool is None:
+            self.pool = BrowserPool(size=1)
+        await self.pool.start()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f" Service listening on http://{self.host}:{self.port} "
+              f"({self.workers} workers, queue {self.queue.maxsize})")
+
+    # --- jobs ---
+
+    def submit(self, url, overrides=None):
+        if self.draining:
+            raise ServiceError(503, "Service is shutting down")
+        if not re.match(r"^https?://", url or ""):
+            raise ServiceError(400, "url must be an http(s) URL")
+        job = Job(uuid.uuid4().hex[:12], url, job_options(self.options, overrides))
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise ServiceError(429, "Queue is full, retry later",
+                               {"Retry-After": str(self.retry_after())}) from None
+        self.jobs[job.id] = job
+        self._forget_old_jobs()
+        return job
+
+    def cancel(self, job_id):
+        job = self._job(job_id)
+        if job.status == "queued":
+            # Left in the queue; the worker that picks it up drops it
+            job.status, job.finished = "cancelled", time.time()
+        elif job.status == "running" and job.task is not None:
+            job.task.cancel()
+        return job
+
+    def retry_after(self):
+        """Seconds until a queue slot is likely free: a recent job's wall time / workers."""
+        recent = self.durations[-20:]
+        per_job = sum(recent) / len(recent) if recent else 30
+        return max(1, math.ceil(per_job / self.workers))
+
+    def _job(self, job_id):
+        if job_id not in self.jobs:
+            raise ServiceError(404, f"No job {job_id}")
+        return self.jobs[job_id]
+
+    def _forget_old_jobs(self):
+        finished = [j for j in self.jobs.values() if j.status in FINISHED]
+        for job in finished[:max(0, len(finished) - MAX_JOB_HISTORY)]:
+            del self.jobs[job.id]
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status == "cancelled":
+                    continue
+                job.task = asyncio.create_task(self._run_job(job))
+                # wait() rather than await: a cancelled job must not cancel its worker
+                await asyncio.wait({job.task})
+            finally:
+                self.queue.task_done()
+
+    async def _run_job(self, job):
+        job.status, job.started = "running", time.time()
+        run_metrics = metrics.start_run(job.id)   # This task's context only
+        print(f" ▶ [{job.id}] {job.url}")
+        try:
+            recorder = job.options.recorder(self.output_dir, self.pool)
+            # use_cache is per job: the shared analyst is reused, only its cache differs
+            analyst = self.analyst.with_cache(job.options.use_cache)
+            job.result = await audit_url(job.url, recorder, analyst, self.output_dir, job.options)
+            job.status = job.result["status"]
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            job.result = {"url": job.url, "status": "cancelled", "error": "Cancelled"}
+        except Exception as e:
+            job.status = "failed"
+            job.result = {"url": job.url, "status": "failed", "error": str(e)}
+        job.finished = time.time()
+        self.durations = self.durations[-99:] + [job.finished - job.started]
+        print(f" ■ [{job.id}] {job.status} in {job.finished - job.started:.1f}s"
+              + (f" -> {job.result.get('error')}" if job.result.get("error") else ""))
+
+        with open(self.jobs_dir / f"{job.id}.json", "w", encoding="utf-8") as f:
+            json.dump({**job.summary(), "result": job.result}, f, indent=2, ensure_ascii=False)
+        run_metrics.write_json(self.jobs_dir / f"{job.id}_metrics.json")
+
+    async def drain(self, timeout=DRAIN_TIMEOUT_SECONDS):
+        """Stop taking jobs, let the queue empty (cancelling what is left after `timeout`), then close."""
+        self.draining = True
+        print(f"\n Draining {self.queue.qsize()} queued and "
+              f"{sum(j.status == 'running' for j in self.jobs.values())} running job(s)...")
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(" Drain timed out; cancelling the remaining jobs.")
+            for job in list(self.jobs.values()):
+                self.cancel(job.id)
+            running = [j.task for j in self.jobs.values() if j.task and not j.task.done()]
+            await asyncio.gather(*running, return_exceptions=True)
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.pool.close()
+        print(" Service stopped.")
+
+    # --- HTTP ---
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, body = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT_SECONDS)
+            if method == "GET" and path.startswith("/files/"):
+                await self._send_file(writer, path[len("/files/"):])
+                return
+            status, payload, headers = 200, None, {}
+            try:
+                status, payload = self._route(method, path, body)
+            except ServiceError as e:
+                status, payload, headers = e.status, {"error": str(e)}, e.headers
+            if status == 302:
+                headers, payload = {"Location": payload}, {"location": payload}
+            self._send(writer, status, json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                       "application/json", headers)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            self._send(writer, 400, b'{"error": "Bad request"}', "application/json")
+        except ServiceError as e:
+            self._send(writer, e.status, json.dumps({"error": str(e)}).encode("utf-8"), "application/json")
+        except Exception as e:
+            # A bug in one request must still get an answer, and must not kill the server
+            print(f" Service error: {type(e).__name__}: {e}")
+            self._send(writer, 500, b'{"error": "Internal server error"}', "application/json")
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        method, target, _ = request_line.split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ServiceError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), unquote(urlparse(target).path), body
+
+    def _route(self, method, path, body):
+        """(status, payload) for every JSON endpoint."""
+        if path == "/health":
+            return 200, {
+                "status": "draining" if self.draining else "ok",
+                "queued": self.queue.qsize(),
+                "running": sum(j.status == "running" for j in self.jobs.values()),
+                "workers": self.workers,
+            }
+        if path == "/jobs":
+            if method == "POST":
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    raise ServiceError(400, "Body must be JSON") from None
+                if not isinstance(payload, dict):
+                    raise ServiceError(400, "Body must be a JSON object")
+                job = self.submit(payload.get("url"), payload.get("options"))
+                return 202, {**job.summary(), "position": self.queue.qsize()}
+            if method == "GET":
+                return 200, [job.summary() for job in reversed(self.jobs.values())]
+            raise ServiceError(405, "Use GET or POST")
+
+        match = re.fullmatch(r"/jobs/([0-9a-f]+)(/result|/report)?", path)
+        if not match:
+            raise ServiceError(404, f"No route for {path}")
+        job_id, sub = match.groups()
+        if method == "DELETE" and not sub:
+            return 200, self.cancel(job_id).summary()
+        if method != "GET":
+            raise ServiceError(405, "Use GET (or DELETE on a job)")
+        job = self._job(job_id)
+        if not sub:
+            return 200, job.summary()
+        if job.status not in FINISHED:
+            raise ServiceError(409, f"Job is {job.status}")
+        if sub == "/result":
+            return 200, job.result
+        if not (job.result or {}).get("report"):
+            raise ServiceError(404, "This job has no report")
+        # Served from /files/ so the report's relative video/thumbnail links resolve
+        return 302, f"/files/{Path(job.result['report']).relative_to(self.output_dir).as_posix()}"
+
+    async def _send_file(self, writer, relative):
+        root = self.output_dir.resolve()
+        path = (root / relative).resolve()
+        if root not in path.parents or not path.is_file():
+            self._send(writer, 404, b'{"error": "Not found"}', "application/json")
+            return
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        self._send(writer, 200, None, content_type, {"Content-Length": str(path.stat().st_size)})
+        with open(path, "rb") as f:
+            while chunk := await asyncio.to_thread(f.read, FILE_CHUNK_BYTES):
+                writer.write(chunk)
+                await writer.drain()
+
+    def _send(self, writer, status, body, content_type, headers=None):
+        head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'OK')}",
+                f"Content-Type: {content_type}", "Connection: close"]
+        headers = dict(headers or {})
+        if body is not None:
+            headers["Content-Length"] = str(len(body))
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + (body or b""))
+
+
+async def serve(options=None, workers=4, queue_size=QUEUE_SIZE, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Runs the daemon until SIGINT/SIGTERM, then drains."""
+    service = AuditService(options, workers=workers, queue_size=queue_size, host=host, port=port)
+    await service.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass   # Windows: Ctrl+C arrives as KeyboardInterrupt instead
+    try:
+        await stop.wait()
+    finally:
+        await service.drain()
+
+
+class ServiceClient:
+    """Blocking client for a running service; stdlib only, so it starts instantly."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+                return json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise ServiceError(e.code, message, dict(e.headers)) from None
+
+    def submit(self, url, options=None):
+        """Submits a job, waiting out 429 backpressure as the server suggests."""
+        while True:
+            try:
+                return self._request("POST", "/jobs", {"url": url, "options": options or {}})
+            except ServiceError as e:
+                if e.status != 429:
+                    raise
+                delay = int(e.headers.get("Retry-After", 5))
+                print(f" Server queue full; retrying in {delay}s")
+                time.sleep(delay)
+
+    def status(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def result(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}/result")
+
+    def cancel(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}")
+
+    def wait(self, job_id):
+        """Polls until the job has finished; returns its full result."""
+        last, polls = None, 0
+        while True:
+            job = self.status(job_id)
+            if job["status"] != last:
+                print(f" Job {job_id}: {job['status']}")
+                last = job["status"]
+            if job["status"] in FINISHED:
+                return self.result(job_id)
+            time.sleep(CLIENT_POLL_SECONDS[min(polls, len(CLIENT_POLL_SECONDS) - 1)])
+            polls += 1
+
+    def report_url(self, job_id):
+        return f"{self.base_url}/jobs/{job_id}/report"
+
+
+def submittable_options(options):
+    """The JSON-safe subset of an AuditOptions that a job may carry."""
+    return {f.name: getattr(options, f.name) for f in fields(options) if f.name in JOB_OPTIONS}
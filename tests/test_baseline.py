@@ -0,0 +1,119 @@
+import numpy as np
+
+from utils.baseline import (BaselineStore, RecordingDiff, blended_score, diff_recordings,
+                            reconcile_issues)
+
+BITS = 256
+
+
+def frame(seed):
+    return np.random.default_rng(seed).integers(0, 2, BITS).astype(bool)
+
+
+def recording(seeds):
+    """One fingerprint per second."""
+    return [(float(t), frame(seed)) for t, seed in enumerate(seeds)]
+
+
+def issue(timestamp, title, severity="Medium"):
+    return {"timestamp": timestamp, "severity": severity, "issue": title, "details": ""}
+
+
+def test_identical_recordings_are_unchanged():
+    old = recording(range(20))
+    diff = diff_recordings(old, old, 20.0)
+    assert diff.changed_fraction == 0 and diff.unchanged and diff.windows == []
+
+
+def test_matching_ignores_scroll_timing():
+    old = recording(range(20))
+    new = [(t + 2.0, h) for t, h in old[:18]]     # Same frames, two seconds later
+    diff = diff_recordings(old, new, 20.0)
+    assert diff.unchanged
+    assert diff.to_new_time(5.0) == 7.0
+
+
+def test_changed_frames_become_padded_windows():
+    seeds = list(range(30))
+    seeds[10], seeds[11] = 1000, 1001              # Frames no baseline frame resembles
+    diff = diff_recordings(recording(range(30)), recording(seeds), 30.0)
+    assert not diff.unchanged and not diff.full
+    assert diff.windows == [(7.0, 14.0)]
+    assert diff.in_windows(10.0) and not diff.in_windows(20.0)
+
+
+def test_single_changed_frame_counts_as_unchanged():
+    seeds = list(range(30))
+    seeds[10] = 1000                               # 1 of 30 frames: noise (an ad, a cursor)
+    assert diff_recordings(recording(range(30)), recording(seeds), 30.0).unchanged
+
+
+def test_far_apart_changes_stay_separate_and_large_change_is_full():
+    seeds = list(range(30))
+    seeds[5], seeds[25] = 1000, 1001
+    diff = diff_recordings(recording(range(30)), recording(seeds), 30.0)
+    assert diff.windows == [(2.0, 8.0), (22.0, 28.0)]
+    everything = diff_recordings(recording(range(30)), recording(range(500, 530)), 30.0)
+    assert everything.full
+
+
+def test_missing_baseline_means_full_reaudit():
+    diff = diff_recordings([], recording(range(5)), 5.0)
+    assert diff.full and diff.windows == [(0.0, 5.0)]
+
+
+def test_reconcile_labels_new_carried_and_resolved():
+    diff = RecordingDiff(duration=30.0, changed_fraction=0.2, windows=[(5.0, 15.0)])
+    previous = [issue("00:02", "Header overlaps logo"),       # Outside the window: carried as is
+                issue("00:10", "Low contrast footer"),        # Inside, found again: carried
+                issue("00:12", "Broken image")]               # Inside, not found: resolved
+    fresh = [issue("00:11", "Low contrast footer"), issue("00:08", "Button cut off")]
+    issues, resolved = reconcile_issues(previous, fresh, diff)
+    status = {i["issue"]: i["status"] for i in issues}
+    assert status == {"Header overlaps logo": "carried", "Low contrast footer": "carried",
+                      "Button cut off": "new"}
+    assert [i["issue"] for i in resolved] == ["Broken image"]
+    assert [i["timestamp"] for i in issues] == sorted(i["timestamp"] for i in issues)
+
+
+def test_blended_score_weights_by_reanalyzed_share():
+    diff = RecordingDiff(duration=20.0, changed_fraction=0.5, windows=[(0.0, 5.0)])
+    assert blended_score(8, 4, diff) == 7
+    assert blended_score(8, None, diff) == 8
+
+
+def test_store_round_trip_strips_comparison_labels(tmp_path):
+    store = BaselineStore(tmp_path)
+    fingerprints = recording(range(3))
+    result = {"ux_score": 6, "issues": [dict(issue("00:01", "x"), status="new")],
+              "incremental": {"mode": "partial"}, "resolved_issues": []}
+    store.save("https://example.com", fingerprints, result, 3.0, variant="mobile")
+    assert store.load("https://example.com") is None
+    loaded = store.load("https://example.com", variant="mobile")
+    assert all((a == b).all() for (_, a), (_, b) in zip(loaded["fingerprints"], fingerprints))
+    assert loaded["result"] == {"ux_score": 6, "issues": [issue("00:01", "x")]}
+
+
+def test_failed_window_keeps_its_issues_carried():
+    diff = RecordingDiff(duration=30.0, changed_fraction=0.3, windows=[(0.0, 6.0), (20.0, 26.0)])
+    previous = [issue("00:03", "Menu overlaps hero"), issue("00:22", "Footer text clipped")]
+    analyzed = diff.keep_analyzed([None, "second window result"])
+    assert analyzed == [("second window result", (20.0, 26.0))]
+    assert diff.windows == [(20.0, 26.0)] and diff.covered_seconds == 6.0
+
+    issues, resolved = reconcile_issues(previous, [], diff)
+    assert [(i["issue"], i["status"]) for i in issues] == [("Menu overlaps hero", "carried")]
+    assert [i["issue"] for i in resolved] == ["Footer text clipped"]
+    assert blended_score(8, 4, diff) == 7
+
+
+def test_touch_keeps_fingerprints_and_result(tmp_path):
+    store = BaselineStore(tmp_path)
+    fingerprints = recording(range(3))
+    store.save("https://example.com", fingerprints, {"ux_score": 6, "issues": []}, 3.0)
+    store.touch("https://example.com")
+    loaded = store.load("https://example.com")
+    assert loaded["checked"] and loaded["result"]["ux_score"] == 6
+    assert all((a == b).all() for (_, a), (_, b) in zip(loaded["fingerprints"], fingerprints))
+    store.touch("https://unknown.example")   # No baseline: nothing to update
+    assert store.load("https://unknown.example") is None
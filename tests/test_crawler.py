@@ -0,0 +1,57 @@
+import asyncio
+
+from agents.browser import SessionStats
+from agents.crawler import SiteCrawler, normalize_url
+
+
+def test_normalize_lowercases_and_drops_default_port_and_fragment():
+    assert normalize_url("HTTPS://Example.COM:443/a/#top") == "https://example.com/a/"
+    assert normalize_url("http://example.com:8080") == "http://example.com:8080/"
+
+
+def test_normalize_resolves_relative_and_dot_segments():
+    assert normalize_url("../b/./c", "https://example.com/x/y/") == "https://example.com/x/b/c"
+
+
+def test_normalize_sorts_query_and_strips_tracking():
+    url = "https://example.com/p?b=2&utm_source=x&a=1&gclid=abc&ref=home&_ga=1"
+    assert normalize_url(url) == "https://example.com/p?a=1&b=2"
+
+
+def test_normalize_keeps_params_that_only_share_a_tracking_prefix():
+    for key in ("reference", "refinement", "refresh", "gclid_page", "_gallery"):
+        assert normalize_url(f"https://example.com/p?{key}=1") == f"https://example.com/p?{key}=1"
+
+
+def test_normalize_rejects_non_http():
+    assert normalize_url("mailto:someone@example.com") is None
+    assert normalize_url("javascript:void(0)") is None
+    assert normalize_url("") is None
+
+
+def test_enqueue_same_origin_pages_once():
+    crawler = SiteCrawler("https://example.com/")
+    assert crawler.enqueue("https://example.com/a", 1)
+    assert not crawler.enqueue("https://example.com/a#section", 1)
+    assert not crawler.enqueue("https://other.com/a", 1)
+    assert not crawler.enqueue("https://example.com/file.pdf", 1)
+    assert crawler.enqueue("https://example.com/a?reference=1", 1)
+
+
+class FakePage:
+    url = "https://example.com/"
+
+    async def evaluate(self, script, arg):
+        await asyncio.sleep(0.01)   # Sibling sessions arrive while this one is inspecting
+        return {"links": [], "canonical": None, "structure": "main(h1,p)"}
+
+
+def test_device_sessions_share_one_decision():
+    crawler = SiteCrawler("https://example.com/")
+    sessions = [SessionStats() for _ in range(3)]
+
+    async def go():
+        return await asyncio.gather(*(crawler.inspect_page(FakePage(), crawler.start_url, s) for s in sessions))
+
+    assert asyncio.run(go()) == [True, True, True]
+    assert crawler.accepted == 1 and all(s.skipped is None for s in sessions)
@@ -0,0 +1,58 @@
+import asyncio
+
+from agents.heuristics import HeuristicChecker
+
+
+class FakePage:
+    """Answers CHECK_VIEWPORT_JS with canned snapshots (or raises)."""
+
+    def __init__(self, *snapshots):
+        self.snapshots = list(snapshots)
+
+    async def evaluate(self, script, options):
+        snapshot = self.snapshots.pop(0)
+        if isinstance(snapshot, Exception):
+            raise snapshot
+        return snapshot
+
+
+def snapshot(**findings):
+    return {"scroll_y": 0, "elements": 10, "density": 20,
+            "findings": {"contrast": [], "font_size": [], "overlap": [], "occluded": [], "density": [], **findings}}
+
+
+def run_checks(page, steps):
+    checker = HeuristicChecker()
+
+    async def go():
+        for step in range(steps):
+            await checker.check(page, step)
+
+    asyncio.run(go())
+    return checker
+
+
+def test_clean_page():
+    checker = run_checks(FakePage(snapshot(), snapshot()), 2)
+    summary = checker.summary()
+    assert summary["clean"] and summary["score"] == 10 and summary["issues"] == []
+
+
+def test_failed_checks_are_not_clean():
+    checker = run_checks(FakePage(RuntimeError("detached"), RuntimeError("detached")), 2)
+    assert checker.summary()["viewports"] == 0
+    assert not checker.clean
+
+
+def test_partly_failed_checks_are_not_clean():
+    checker = run_checks(FakePage(snapshot(), RuntimeError("detached")), 2)
+    assert not checker.clean
+
+
+def test_findings_deduped_and_grouped():
+    low = {"selector": "p.note", "text": "Hi", "value": 2.0, "limit": 4.5, "box": [0, 0, 1, 1]}
+    checker = run_checks(FakePage(snapshot(contrast=[low]), snapshot(contrast=[low])), 2)
+    issues = checker.issues()
+    assert len(issues) == 1
+    assert issues[0]["severity"] == "High" and issues[0]["source"] == "dom"
+    assert not checker.clean and checker.score() == 8
@@ -0,0 +1,58 @@
+import json
+
+from utils.jsonstream import IssueStreamParser
+
+DOCUMENT = json.dumps({
+    "description": "A page with \"quotes\" and {braces}",
+    "ux_score": 6,
+    "issues": [
+        {"timestamp": "00:01", "severity": "High", "issue": "Banner } covers [nav]", "details": "a \"b\""},
+        {"timestamp": "00:04", "severity": "Low", "issue": "Nested", "details": "x", "box": {"x": 1}},
+    ],
+    "notes": [{"issue": "not an issue"}],
+})
+
+
+def feed_in_chunks(text, size):
+    parser = IssueStreamParser()
+    emitted = []
+    for i in range(0, len(text), size):
+        emitted.append(parser.feed(text[i:i + size]))
+    return parser, emitted
+
+
+def test_issues_match_full_parse_for_any_chunk_size():
+    expected = json.loads(DOCUMENT)["issues"]
+    for size in (1, 2, 7, 64, len(DOCUMENT)):
+        parser, _ = feed_in_chunks(DOCUMENT, size)
+        assert parser.issues == expected
+
+
+def test_issue_emitted_as_soon_as_it_closes():
+    first_end = DOCUMENT.index('"box"')   # Inside the second issue: the first one is complete
+    parser = IssueStreamParser()
+    assert [i["issue"] for i in parser.feed(DOCUMENT[:first_end])] == ["Banner } covers [nav]"]
+    assert [i["issue"] for i in parser.feed(DOCUMENT[first_end:])] == ["Nested"]
+
+
+def test_objects_outside_the_issues_array_are_ignored():
+    parser, _ = feed_in_chunks(DOCUMENT, 5)
+    assert all(i["issue"] != "not an issue" for i in parser.issues)
+
+
+def test_truncated_issue_is_not_emitted():
+    text = '{"issues": [{"issue": "done", "severity": "Low"}, {"issue": "half'
+    parser, _ = feed_in_chunks(text, 3)
+    assert parser.issues == [{"issue": "done", "severity": "Low"}]
+
+
+def test_consumed_text_is_dropped():
+    issue = {"issue": "x" * 50, "severity": "Low"}
+    text = json.dumps({"issues": [issue] * 200})
+    parser = IssueStreamParser()
+    longest = 0
+    for i in range(0, len(text), 16):
+        parser.feed(text[i:i + 16])
+        longest = max(longest, len(parser.text))
+    assert len(parser.issues) == 200
+    assert longest < 2 * len(json.dumps(issue))
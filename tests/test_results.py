@@ -0,0 +1,61 @@
+import pytest
+
+from utils.results import AuditResult, Issue, parse_audit
+
+GOOD = '{"description": "Fine", "ux_score": 7, "issues": [{"timestamp": "00:03", "severity": "High", "issue": "x", "details": "y"}]}'
+
+
+def test_strict_json():
+    result = parse_audit(GOOD)
+    assert (result.ux_score, len(result.issues)) == (7, 1)
+    assert "repaired" not in result.extra and "salvaged" not in result.extra
+
+
+def test_repair_fences_comments_and_trailing_commas():
+    text = ('```json\n{"description": "Fine", // summary\n "ux_score": 5,\n'
+            ' "issues": [{"timestamp": "00:01", "severity": "Low", "issue": "a", "details": "b"},],}\n```')
+    result = parse_audit(text)
+    assert result.ux_score == 5 and len(result.issues) == 1
+    assert result.extra["repaired"] is True
+
+
+def test_salvage_keeps_complete_issues_of_truncated_output():
+    text = ('{"description": "Cut \\"off\\"", "ux_score": 4, "issues": ['
+            '{"timestamp": "00:01", "severity": "High", "issue": "kept", "details": "d"}, '
+            '{"timestamp": "00:09", "severity": "Low", "issue": "lost')
+    result = parse_audit(text)
+    assert [i.issue for i in result.issues] == ["kept"]
+    assert result.description == 'Cut "off"' and result.ux_score == 4
+    assert result.extra["salvaged"] is True
+
+
+def test_unusable_output_raises():
+    with pytest.raises(ValueError):
+        parse_audit("The model refused to answer.")
+
+
+def test_score_clamped_and_unknown_keys_kept():
+    result = AuditResult.from_dict({"ux_score": "12.6", "issues": ["junk", {"severity": "critical"}], "segments": 3})
+    assert result.ux_score == 10
+    assert len(result.issues) == 1 and result.issues[0].severity == "High"
+    assert result.to_dict()["segments"] == 3
+
+
+def test_issue_round_trip_keeps_extra():
+    issue = Issue.from_dict({"timestamp": "01:05", "severity": "Medium", "issue": "i", "details": "d", "device": "mobile"})
+    assert issue.seconds == 65
+    assert issue.to_dict()["device"] == "mobile"
+
+
+def test_merge_devices_keeps_per_device_notes():
+    desktop = AuditResult.from_dict({"ux_score": 8, "issues": [{"timestamp": "00:01", "issue": "a"}],
+                                     "resolved_issues": [{"timestamp": "00:02", "issue": "gone"}],
+                                     "dom_checks": {"viewports": 2}, "triage": "keyframes"})
+    mobile = AuditResult.from_dict({"ux_score": 5, "incremental": {"mode": "partial"}})
+    merged = AuditResult.merge_devices({"desktop": desktop, "mobile": mobile})
+    assert merged.ux_score == 6
+    assert merged.issues[0].extra["device"] == "desktop"
+    assert merged.extra["resolved_issues"] == [{"timestamp": "00:02", "issue": "gone", "device": "desktop"}]
+    assert merged.extra["devices"]["desktop"]["dom_checks"] == {"viewports": 2}
+    assert merged.extra["devices"]["desktop"]["triage"] == "keyframes"
+    assert merged.extra["devices"]["mobile"]["incremental"] == {"mode": "partial"}
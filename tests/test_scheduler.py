@@ -0,0 +1,175 @@
+import asyncio
+import time
+
+import pytest
+
+from agents import scheduler
+from agents.scheduler import (BREAKER_COOLDOWN_SECONDS, BREAKER_FAILURE_THRESHOLD, ModelScheduler,
+                              _ModelState, _TokenBucket, classify_error, retry_after_seconds)
+
+
+class FakeError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(scheduler, "jittered_backoff", lambda attempt: 0)
+
+
+def half_open_model(name="m"):
+    model = _ModelState(name, {"rpm": 60, "tpm": 1_000_000})
+    model.state, model.open_until = "open", 0.0
+    return model
+
+
+# --- Token bucket ---
+
+def test_bucket_waits_for_refill():
+    bucket = _TokenBucket(60)   # 1 token per second
+    bucket.take(60, bucket.updated)
+    assert bucket.wait_time(1, bucket.updated) == pytest.approx(1.0)
+    assert bucket.wait_time(1, bucket.updated + 1) == 0.0
+
+
+def test_bucket_oversized_request_waits_for_full_bucket():
+    bucket = _TokenBucket(60)
+    assert bucket.wait_time(500, bucket.updated) == 0.0
+    bucket.take(500, bucket.updated)
+    assert bucket.tokens == 0
+
+
+def test_bucket_adjust_refunds_up_to_capacity():
+    bucket = _TokenBucket(100)
+    bucket.take(50, bucket.updated)
+    bucket.adjust(-80)
+    assert bucket.tokens == 100
+
+
+# --- Circuit breaker ---
+
+def test_breaker_opens_after_threshold():
+    model = _ModelState("m", {"rpm": 60, "tpm": 1_000_000})
+    now = time.monotonic()
+    for _ in range(BREAKER_FAILURE_THRESHOLD - 1):
+        model.failed(now)
+    assert model.state == "closed"
+    model.failed(now)
+    assert model.state == "open"
+    assert model.wait_time(1, now + 1) == pytest.approx(BREAKER_COOLDOWN_SECONDS - 1)
+
+
+def test_breaker_half_open_allows_one_probe():
+    model = half_open_model()
+    now = time.monotonic()
+    assert model.wait_time(1, now) == 0.0
+    assert model.state == "half_open"
+    model.take(1, now)
+    assert model.probing
+    assert model.wait_time(1, now) > 0
+
+
+def test_failed_probe_reopens_with_doubled_cooldown():
+    model = half_open_model()
+    now = time.monotonic()
+    model.wait_time(1, now)
+    model.take(1, now)
+    model.failed(now)
+    assert model.state == "open" and not model.probing
+    assert model.cooldown == 2 * BREAKER_COOLDOWN_SECONDS
+    assert model.open_until == now + 2 * BREAKER_COOLDOWN_SECONDS
+
+
+def test_successful_probe_closes_circuit():
+    model = half_open_model()
+    now = time.monotonic()
+    model.wait_time(1, now)
+    model.take(1, now)
+    model.succeeded()
+    assert (model.state, model.failures, model.probing) == ("closed", 0, False)
+    assert model.cooldown == BREAKER_COOLDOWN_SECONDS
+
+
+# --- Scheduler.run ---
+
+def probe_scheduler():
+    sched = ModelScheduler(["m"], limits={"m": {"rpm": 60, "tpm": 1_000_000}})
+    sched.models[0].state, sched.models[0].open_until = "open", 0.0
+    return sched, sched.models[0]
+
+
+def test_rate_limited_probe_releases_slot():
+    sched, model = probe_scheduler()
+    calls = []
+
+    async def call(name):
+        calls.append(name)
+        if len(calls) == 1:
+            raise FakeError("429 RESOURCE_EXHAUSTED retry in 0.01s", code=429)
+        return "ok"
+
+    model_name, result = asyncio.run(sched.run(call, est_tokens=1))
+    assert (model_name, result, len(calls)) == ("m", "ok", 2)
+    assert model.state == "closed" and not model.probing
+
+
+def test_fatal_probe_releases_slot():
+    sched, model = probe_scheduler()
+
+    async def call(name):
+        raise FakeError("API key not valid", code=400)
+
+    with pytest.raises(FakeError):
+        asyncio.run(sched.run(call, est_tokens=1))
+    assert not model.probing
+    assert model.wait_time(1, time.monotonic()) == 0.0
+
+
+def test_cancelled_probe_releases_slot():
+    sched, model = probe_scheduler()
+
+    async def call(name):
+        await asyncio.sleep(10)
+
+    async def go():
+        task = asyncio.create_task(sched.run(call, est_tokens=1))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(go())
+    assert not model.probing
+
+
+def test_missing_model_falls_back_to_next():
+    sched = ModelScheduler(["a", "b"], limits={"a": {"rpm": 60, "tpm": 10_000}, "b": {"rpm": 60, "tpm": 10_000}})
+
+    async def call(name):
+        if name == "a":
+            raise FakeError("404 NOT_FOUND", code=404)
+        return name
+
+    assert asyncio.run(sched.run(call, est_tokens=1)) == ("b", "b")
+    assert sched.models[0].state == "open"
+
+
+# --- Error helpers ---
+
+@pytest.mark.parametrize("error, kind", [
+    (FakeError("quota", code=429), "rate_limited"),
+    (FakeError("503 UNAVAILABLE"), "unavailable"),
+    (asyncio.TimeoutError(), "unavailable"),
+    (FakeError("models/x is NOT_FOUND", code=404), "missing"),
+    (FakeError("PERMISSION_DENIED", code=403), "fatal"),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_retry_after_from_message():
+    assert retry_after_seconds(FakeError("{'retryDelay': '34s'}")) == 34.0
+    assert retry_after_seconds(FakeError("Please retry in 2.5s.")) == 2.5
+    assert retry_after_seconds(FakeError("no hint")) is None
@@ -0,0 +1,211 @@
+"""
+Per-URL baselines for incremental re-audits: the frame fingerprints of the
+last recording plus its result. A new recording is matched frame-by-frame
+against the baseline; only the time windows that look different need to go
+back to Gemini, and issues are labelled new / carried / resolved.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from utils.segments import same_issue
+from utils.timecode import format_timestamp, parse_timestamp
+
+# --- CONFIGURATION ---
+BASELINE_DIR = Path("output") / ".baselines"
+FRAME_CHANGE_THRESHOLD = 0.05    # dHash distance above which a frame has no match (stricter than keyframe dedupe)
+UNCHANGED_MAX_FRACTION = 0.05    # At most this share of changed frames -> reuse the old result
+FULL_REAUDIT_FRACTION = 0.6      # Changed windows covering this much -> just analyze everything
+CHANGE_PADDING_SECONDS = 3       # Context kept around each changed frame
+MIN_WINDOW_SECONDS = 6           # Very short windows give the model too little to judge
+ISSUE_MATCH_TOLERANCE_SECONDS = 5
+
+
+def _hash_to_hex(bits):
+    return np.packbits(bits).tobytes().hex()
+
+
+def _hex_to_hash(text, size):
+    return np.unpackbits(np.frombuffer(bytes.fromhex(text), dtype=np.uint8))[:size].astype(bool)
+
+
+class BaselineStore:
+    """One JSON file per (variant, URL) under output/.baselines/."""
+
+    def __init__(self, root=BASELINE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, url, variant=""):
+        key = hashlib.sha256(f"{variant}|{url}".encode("utf-8")).hexdigest()[:24]
+        return self.root / f"{key}.json"
+
+    def load(self, url, variant=""):
+        """{"fingerprints": [(t, hash)], "result": dict, "duration": s, ...} or None."""
+        try:
+            with open(self._path(url, variant), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        size = data.get("hash_bits", 256)
+        data["fingerprints"] = [(t, _hex_to_hash(h, size)) for t, h in data.get("fingerprints", [])]
+        return data
+
+    def save(self, url, fingerprints, result, duration, variant=""):
+        # Labels belong to one comparison; the stored result is the plain current state
+        result = {k: v for k, v in result.items() if k not in ("resolved_issues", "incremental")}
+        result["issues"] = [{k: v for k, v in i.items() if k != "status"} for i in result.get("issues", [])]
+        payload = {
+            "url": url,
+            "variant": variant,
+            "saved": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "duration": round(duration, 2),
+            "hash_bits": int(fingerprints[0][1].size) if fingerprints else 256,
+            "fingerprints": [(round(t, 2), _hash_to_hex(h)) for t, h in fingerprints],
+            "result": result,
+        }
+        self._write(url, variant, payload)
+
+    def touch(self, url, variant=""):
+        """Records a run that reused the baseline; its fingerprints and result stay as they are."""
+        try:
+            with open(self._path(url, variant), "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return
+        payload["checked"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._write(url, variant, payload)
+
+    def _write(self, url, variant, payload):
+        path = self._path(url, variant)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+
+
+@dataclass
+class RecordingDiff:
+    duration: float
+    changed_fraction: float
+    windows: list = field(default_factory=list)    # [(start, end)] on the new timeline
+    time_map: list = field(default_factory=list)   # [(old_t, new_t)] for matched frames
+
+    @property
+    def unchanged(self):
+        return self.changed_fraction <= UNCHANGED_MAX_FRACTION
+
+    @property
+    def covered_seconds(self):
+        return sum(end - start for start, end in self.windows)
+
+    @property
+    def full(self):
+        return self.duration <= 0 or self.covered_seconds >= FULL_REAUDIT_FRACTION * self.duration
+
+    def to_new_time(self, old_t):
+        """Where something seen at old_t in the baseline appears in the new recording."""
+        if not self.time_map:
+            return old_t
+        before, after = min(self.time_map, key=lambda pair: abs(pair[0] - old_t))
+        return max(0.0, min(self.duration, after + (old_t - before)))
+
+    def in_windows(self, t):
+        return any(start <= t <= end for start, end in self.windows)
+
+    def keep_analyzed(self, results):
+        """
+        Drops the windows whose analysis failed (None in `results`, one per
+        window) and returns [(result, window)] for the rest. Issues in a failed
+        window were not re-checked, so they must be carried, not resolved.
+        """
+        analyzed = [(r, w) for r, w in zip(results, self.windows) if r is not None]
+        self.windows = [w for _, w in analyzed]
+        return analyzed
+
+
+def _merge_windows(times, duration, padding=CHANGE_PADDING_SECONDS, min_length=MIN_WINDOW_SECONDS):
+    windows = []
+    for t in sorted(times):
+        start, end = max(0.0, t - padding), min(duration, t + padding)
+        if end - start < min_length:
+            grow = (min_length - (end - start)) / 2
+            start, end = max(0.0, start - grow), min(duration, end + grow)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def diff_recordings(old, new, duration, threshold=FRAME_CHANGE_THRESHOLD):
+    """
+    Each new frame is matched to its closest baseline frame (any time: scroll
+    timing differs between runs). Frames with no close match are "changed".
+    """
+    if not old or not new:
+        return RecordingDiff(duration, 1.0, [(0.0, duration)])
+
+    old_bits = np.stack([h for _, h in old])
+    new_bits = np.stack([h for _, h in new])
+    # (new, old) matrix of differing-bit fractions; recordings are ~1 frame/s, so this stays small
+    distances = (new_bits[:, None, :] != old_bits[None, :, :]).mean(axis=2)
+    best = distances.argmin(axis=1)
+    best_distance = distances[np.arange(len(new)), best]
+
+    changed_times, time_map = [], []
+    for j, (new_t, _) in enumerate(new):
+        if best_distance[j] > threshold:
+            changed_times.append(new_t)
+        else:
+            time_map.append((old[best[j]][0], new_t))
+
+    return RecordingDiff(
+        duration=duration,
+        changed_fraction=len(changed_times) / len(new),
+        windows=_merge_windows(changed_times, duration),
+        time_map=time_map,
+    )
+
+
+def reconcile_issues(previous, fresh, diff):
+    """
+    previous: issue dicts from the baseline (old timeline); fresh: issue dicts
+    found in diff.windows (new timeline). Returns (issues, resolved):
+      - previous issues outside the changed windows are carried over (re-timed);
+      - previous issues inside them are carried if found again, else resolved;
+      - fresh issues not seen before are new.
+    """
+    issues, resolved = [], []
+    fresh = [dict(i, status="new") for i in fresh]
+
+    for issue in previous:
+        seconds = diff.to_new_time(parse_timestamp(issue.get("timestamp")) or 0.0)
+        moved = dict(issue, timestamp=format_timestamp(seconds))
+        if not diff.in_windows(seconds):
+            issues.append(dict(moved, status="carried"))
+            continue
+        match = next((f for f in fresh if f["status"] == "new"
+                      and same_issue(moved, f, ISSUE_MATCH_TOLERANCE_SECONDS)), None)
+        if match is not None:
+            match["status"] = "carried"
+        else:
+            resolved.append(dict(moved, status="resolved"))
+
+    issues.extend(fresh)
+    issues.sort(key=lambda i: parse_timestamp(i.get("timestamp")) or 0)
+    return issues, resolved
+
+
+def blended_score(previous_score, fresh_score, diff):
+    """Score weighted by how much of the recording was actually re-analyzed."""
+    if diff.duration <= 0 or fresh_score is None:
+        return previous_score
+    share = min(1.0, diff.covered_seconds / diff.duration)
+    return round(previous_score * (1 - share) + fresh_score * share)
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# --- CONFIGURATION ---
+CACHE_DIR = Path("output") / ".cache"
+ANALYSIS_CACHE_MAX_BYTES = 200 * 1024 * 1024    # 200 MB
+ANALYSIS_CACHE_MAX_AGE_SECONDS = 7 * 24 * 3600  # 1 week
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Content hash of a file, streamed so large videos never sit in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    On-disk cache of parsed Gemini results.
+
+    Entries are keyed by (video content hash, prompt, model, generation config),
+    so a re-run on the same recording skips both the upload and the inference.
+    Old entries are evicted by age, then least-recently-used until under max_bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR / "analysis",
+                 max_bytes=ANALYSIS_CACHE_MAX_BYTES,
+                 max_age_seconds=ANALYSIS_CACHE_MAX_AGE_SECONDS):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(video_hash, prompt, model, config):
+        payload = json.dumps(
+            {"video": video_hash, "prompt": prompt, "model": model, "config": config},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, *keys):
+        """Returns the first cached result among `keys`, or None. Counts one hit or miss."""
+        for key in keys:
+            path = self._path(key)
+            try:
+                if time.time() - path.stat().st_mtime > self.max_age_seconds:
+                    self._remove(path)
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                os.utime(path)  # refresh for LRU eviction
+            except (OSError, ValueError):
+                continue
+
+            with self._lock:
+                self.hits += 1
+            return entry.get("result")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, result, model=None):
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        entry = {"model": model, "created": time.time(), "result": result}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)  # atomic, so readers never see half a file
+        self.evict()
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self.evictions += 1
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class UploadRegistry:
+    """
+    Maps a video's content hash to the Gemini file it was uploaded as.
+
+    Gemini keeps uploaded files for ~48h, so retries and re-analyses of the
+    same recording can reuse the remote file instead of uploading it again.
+    """
+
+    # Don't hand out a file that is about to expire mid-analysis
+    EXPIRY_MARGIN_SECONDS = 15 * 60
+    DEFAULT_TTL_SECONDS = 47 * 3600
+
+    def __init__(self, registry_path=CACHE_DIR / "uploads.json"):
+        self.registry_path = Path(registry_path)
+        self.registry_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.registry_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries):
+        tmp_path = self.registry_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def get(self, video_hash):
+        """Returns the remote file name for this content, if it hasn't expired."""
+        with self._lock:
+            entry = self._load().get(video_hash)
+        if not entry or entry["expires"] - self.EXPIRY_MARGIN_SECONDS < time.time():
+            return None
+        return entry["name"]
+
+    def put(self, video_hash, name, expires=None):
+        with self._lock:
+            entries = self._load()
+            now = time.time()
+            # Drop expired entries while we're rewriting the file anyway
+            entries = {k: v for k, v in entries.items() if v["expires"] > now}
+            entries[video_hash] = {
+                "name": name,
+                "expires": expires or now + self.DEFAULT_TTL_SECONDS,
+            }
+            self._save(entries)
+
+    def forget(self, video_hash):
+        with self._lock:
+            entries = self._load()
+            if entries.pop(video_hash, None) is not None:
+                self._save(entries)
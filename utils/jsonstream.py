@@ -0,0 +1,95 @@
+"""
+Incremental parser for the audit JSON as it streams in: every object in the
+top-level "issues" array is returned as soon as its closing brace arrives,
+long before the whole document is complete.
+"""
+
+import json
+
+
+class IssueStreamParser:
+    """
+    feed() text chunks; it returns the issues completed by that chunk.
+    Only tracks enough JSON structure (strings, escapes, nesting, the current
+    key) to know where each issue starts and ends, so feeding is O(chunk).
+    Text before the issue (or string) still being read is dropped after every
+    chunk, so memory stays at one issue rather than the whole response.
+    """
+
+    def __init__(self, array_key="issues"):
+        self.array_key = array_key
+        self.text = ""
+        self.pos = 0
+        self.stack = []           # "{" / "[" for every open container
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_string = None   # Most recent complete string (candidate key)
+        self.current_key = None   # Key whose value we are in, at object level
+        self.array_depth = None   # Depth of the target array once it is open
+        self.item_start = None    # Offset of the issue object being read
+        self.issues = []
+
+    def feed(self, chunk):
+        self.text += chunk
+        completed = []
+        text = self.text
+        for i in range(self.pos, len(text)):
+            ch = text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self.last_string = text[self.string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self.string_start = i
+            elif ch == ":":
+                if self.stack and self.stack[-1] == "{":
+                    self.current_key = self.last_string
+            elif ch in "{[":
+                if (ch == "[" and self.array_depth is None and len(self.stack) == 1
+                        and self.current_key == self.array_key):
+                    self.array_depth = len(self.stack) + 1
+                elif ch == "{" and self.array_depth is not None and len(self.stack) == self.array_depth:
+                    self.item_start = i
+                self.stack.append(ch)
+            elif ch in "}]":
+                if not self.stack:
+                    continue
+                self.stack.pop()
+                if (ch == "}" and self.item_start is not None
+                        and self.array_depth is not None and len(self.stack) == self.array_depth):
+                    issue = self._decode(text[self.item_start:i + 1])
+                    if issue is not None:
+                        self.issues.append(issue)
+                        completed.append(issue)
+                    self.item_start = None
+                elif ch == "]" and self.array_depth is not None and len(self.stack) == self.array_depth - 1:
+                    self.array_depth = -1  # Array closed; never reopen
+        self._trim(len(text))
+        return completed
+
+    def _trim(self, end):
+        """Drops consumed text and shifts the offsets that point into the rest."""
+        keep = min(o for o in (self.item_start, self.string_start if self.in_string else None, end)
+                   if o is not None)
+        self.text = self.text[keep:]
+        self.pos = end - keep
+        if self.item_start is not None:
+            self.item_start -= keep
+        if self.in_string:
+            self.string_start -= keep
+
+    @staticmethod
+    def _decode(fragment):
+        try:
+            value = json.loads(fragment)
+        except ValueError:
+            return None
+        return value if isinstance(value, dict) else None
@@ -0,0 +1,207 @@
+"""
+Keyframe extraction: decode a recording, drop near-duplicate frames and keep a
+compact, timestamped set of JPEGs to send to Gemini instead of the full video.
+Also grabs small stills at given timestamps (issue thumbnails for the report)
+and fingerprints recordings for incremental re-audits.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# --- CONFIGURATION ---
+SAMPLE_FPS = 2              # Frames per second considered as candidates
+HASH_SIZE = 16              # dHash grid -> 16*16 = 256-bit fingerprint
+DUPLICATE_THRESHOLD = 0.08  # Fraction of differing hash bits still counted as "same frame"
+MAX_KEYFRAMES = 40
+MAX_WIDTH = 1280            # Keyframes are downscaled to at most this width
+JPEG_QUALITY = 70
+THUMB_WIDTH = 320           # Issue thumbnails in the report
+THUMB_QUALITY = 60
+FINGERPRINT_FPS = 1         # Frames per second fingerprinted for re-audit baselines
+
+
+@dataclass
+class Keyframe:
+    timestamp: float  # Seconds from the start of the ORIGINAL recording
+    jpeg: bytes
+    frame_index: int
+
+
+def dhash(gray, hash_size=HASH_SIZE):
+    """Difference hash of a grayscale frame, as a flat boolean array."""
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).ravel()
+
+
+def hash_distance(a, b):
+    """Fraction of bits that differ between two dHashes."""
+    return np.count_nonzero(a != b) / a.size
+
+
+def _encode(frame, max_width=MAX_WIDTH, quality=JPEG_QUALITY):
+    height, width = frame.shape[:2]
+    if width > max_width:
+        frame = cv2.resize(frame, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buf.tobytes()
+
+
+def video_duration(video_path):
+    """Duration in seconds, counting frames when the container has no duration (raw WebM)."""
+    if cv2 is None:
+        raise ImportError("Reading video duration needs OpenCV. Run: pip install opencv-python-headless")
+    capture = cv2.VideoCapture(str(video_path))
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frames = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        if frames and frames > 0:
+            return frames / fps
+        count = 0
+        while capture.grab():
+            count += 1
+        return count / fps
+    finally:
+        capture.release()
+
+
+def extract_keyframes(video_path, sample_fps=SAMPLE_FPS, threshold=DUPLICATE_THRESHOLD,
+                      max_keyframes=MAX_KEYFRAMES, max_width=MAX_WIDTH, quality=JPEG_QUALITY):
+    """
+    Returns the frames of `video_path` that differ visibly from the previous
+    keyframe. Timestamps are taken from the decoder, so they map 1:1 onto the
+    original recording. If more than `max_keyframes` survive, the most
+    distinct ones are kept.
+    """
+    if cv2 is None:
+        raise ImportError("Keyframe extraction needs OpenCV. Run: pip install opencv-python-headless")
+
+    capture = cv2.VideoCapture(str(video_path))
+    if not capture.isOpened():
+        raise ValueError(f"Cannot decode video: {video_path}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    stride = max(1, int(round(fps / sample_fps)))
+
+    kept = []       # (distance_from_previous_keyframe, Keyframe)
+    last_hash = None
+    last_frame = None
+    index = -1
+    try:
+        while True:
+            if not capture.grab():
+                break
+            index += 1
+            if index % stride:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                continue
+
+            timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or index / fps
+            last_frame = (timestamp, frame, index)
+
+            frame_hash = dhash(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+            distance = 1.0 if last_hash is None else hash_distance(frame_hash, last_hash)
+            if distance <= threshold:
+                continue
+
+            last_hash = frame_hash
+            kept.append((distance, Keyframe(timestamp, _encode(frame, max_width, quality), index)))
+    finally:
+        capture.release()
+
+    # Always include the final state of the page
+    if last_frame and (not kept or kept[-1][1].frame_index != last_frame[2]):
+        timestamp, frame, frame_index = last_frame
+        kept.append((1.0, Keyframe(timestamp, _encode(frame, max_width, quality), frame_index)))
+
+    if len(kept) > max_keyframes:
+        kept = sorted(kept, key=lambda item: item[0], reverse=True)[:max_keyframes]
+        kept.sort(key=lambda item: item[1].frame_index)
+
+    return [keyframe for _, keyframe in kept]
+
+
+def extract_frames_at(video_path, timestamps, max_width=THUMB_WIDTH, quality=THUMB_QUALITY):
+    """
+    {second: jpeg} for the first frame at or after each requested second, in a
+    single sequential decode (no seeking, which is slow and inexact on WebM).
+    Only the frames that are kept get converted; timestamps past the end of
+    the video get the last frame.
+    """
+    if cv2 is None:
+        raise ImportError("Thumbnail extraction needs OpenCV. Run: pip install opencv-python-headless")
+
+    targets = sorted({max(0.0, float(t)) for t in timestamps})
+    stills = {}
+    if not targets:
+        return stills
+
+    capture = cv2.VideoCapture(str(video_path))
+    if not capture.isOpened():
+        raise ValueError(f"Cannot decode video: {video_path}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    fallback_stride = max(1, int(round(fps)))  # Remember ~1 frame/s for targets past the end
+    last = None
+    index = -1
+    try:
+        while targets and capture.grab():
+            index += 1
+            timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or index / fps
+            due = [t for t in targets if t <= timestamp]
+            if not due and index % fallback_stride:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                continue
+            last = frame
+            if due:
+                jpeg = _encode(frame, max_width, quality)
+                for t in due:
+                    stills[t] = jpeg
+                targets = targets[len(due):]
+    finally:
+        capture.release()
+
+    if targets and last is not None:
+        jpeg = _encode(last, max_width, quality)
+        for t in targets:
+            stills[t] = jpeg
+    return stills
+
+
+def frame_fingerprints(video_path, sample_fps=FINGERPRINT_FPS, hash_size=HASH_SIZE):
+    """[(timestamp, dhash)] sampled at `sample_fps`: a cheap visual summary of a recording."""
+    if cv2 is None:
+        raise ImportError("Fingerprinting needs OpenCV. Run: pip install opencv-python-headless")
+
+    capture = cv2.VideoCapture(str(video_path))
+    if not capture.isOpened():
+        raise ValueError(f"Cannot decode video: {video_path}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    stride = max(1, int(round(fps / sample_fps)))
+    fingerprints = []
+    index = -1
+    try:
+        while capture.grab():
+            index += 1
+            if index % stride:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                continue
+            timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or index / fps
+            fingerprints.append((timestamp, dhash(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), hash_size)))
+    finally:
+        capture.release()
+    return fingerprints
@@ -0,0 +1,181 @@
+"""
+Lightweight run instrumentation: timed spans per pipeline phase plus counters
+(bytes, tokens, retries, sleep time). Code anywhere in the pipeline calls
+span()/count(); they record into the RunMetrics bound to the current asyncio
+context, and are no-ops when nothing is bound (e.g. python -m agents.analyst).
+"""
+
+import contextvars
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+_current = contextvars.ContextVar("visionqa_metrics", default=None)
+_labels = contextvars.ContextVar("visionqa_metric_labels", default={})
+
+# Display order for the --profile table; unknown phases are listed after these
+PHASE_ORDER = [
+    "browser_launch", "context_create", "navigation", "settle", "popups", "scroll",
+    "video_save", "screenshot", "transcode", "hash", "keyframes", "upload", "ready_wait",
+    "inference", "first_issue", "thumbnails", "report", "audit",
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class RunMetrics:
+    """Everything measured during one run (single audit or batch)."""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.started = time.time()
+        self.spans = []                      # {"name", "seconds", **labels}
+        self.counters = defaultdict(float)   # (name, frozen labels) -> value
+
+    def observe(self, name, seconds, **labels):
+        self.spans.append({"name": name, "seconds": round(seconds, 4), **labels})
+
+    def count(self, name, value=1, **labels):
+        self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def phase_summary(self):
+        """{phase: {count, total_s, p50_s, p95_s, max_s}} in pipeline order."""
+        grouped = defaultdict(list)
+        for span in self.spans:
+            grouped[span["name"]].append(span["seconds"])
+        order = {name: i for i, name in enumerate(PHASE_ORDER)}
+        return {
+            name: {
+                "count": len(values),
+                "total_s": round(sum(values), 3),
+                "p50_s": round(_percentile(values, 50), 3),
+                "p95_s": round(_percentile(values, 95), 3),
+                "max_s": round(max(values), 3),
+            }
+            for name, values in sorted(grouped.items(), key=lambda kv: (order.get(kv[0], len(order)), kv[0]))
+        }
+
+    def counter_list(self):
+        return [{"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())]
+
+    def to_dict(self):
+        return {
+            "run_id": self.run_id,
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "wall_s": round(time.time() - self.started, 2),
+            "phases": self.phase_summary(),
+            "counters": self.counter_list(),
+            "spans": self.spans,
+        }
+
+    def write_json(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def write_prometheus(self, path):
+        """
+        Writes the node_exporter textfile-collector format. The file is written
+        next to the target and renamed, so the collector never reads half a file.
+        """
+        lines = [
+            "# HELP visionqa_phase_seconds_total Time spent per pipeline phase.",
+            "# TYPE visionqa_phase_seconds_total counter",
+        ]
+        for name, phase in self.phase_summary().items():
+            lines.append(f'visionqa_phase_seconds_total{{phase="{name}"}} {phase["total_s"]}')
+        lines += [
+            "# HELP visionqa_phase_runs_total Completed spans per pipeline phase.",
+            "# TYPE visionqa_phase_runs_total counter",
+        ]
+        for name, phase in self.phase_summary().items():
+            lines.append(f'visionqa_phase_runs_total{{phase="{name}"}} {phase["count"]}')
+
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"visionqa_{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value:g}" if label_text else f"{metric} {value:g}")
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        tmp.replace(path)
+        return path
+
+    def print_profile(self):
+        """The --profile breakdown table."""
+        phases = self.phase_summary()
+        # Shares are relative to whole audits; phases overlap across concurrent URLs
+        total = phases.get("audit", {}).get("total_s") or sum(p["total_s"] for p in phases.values()) or 1
+        print("\n" + "-" * 72)
+        print(f" {'PHASE':<16}{'N':>5}{'TOTAL s':>10}{'P50 s':>9}{'P95 s':>9}{'MAX s':>9}{'SHARE':>9}")
+        print("-" * 72)
+        for name, p in phases.items():
+            print(f" {name:<16}{p['count']:>5}{p['total_s']:>10.2f}{p['p50_s']:>9.2f}"
+                  f"{p['p95_s']:>9.2f}{p['max_s']:>9.2f}{p['total_s'] / total:>8.0%}")
+        print("-" * 72)
+        for counter in self.counter_list():
+            labels = ", ".join(f"{k}={v}" for k, v in counter["labels"].items())
+            value = counter["value"]
+            shown = f"{value / 1e6:.2f} MB" if counter["name"].endswith("bytes") else f"{value:g}"
+            print(f" {counter['name']:<28}{labels:<28}{shown:>15}")
+        print("-" * 72)
+
+
+def start_run(run_id=None):
+    """Binds a new RunMetrics to the current context (and the tasks it spawns)."""
+    metrics = RunMetrics(run_id)
+    _current.set(metrics)
+    return metrics
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def bind(**labels):
+    """Adds labels (e.g. url=...) to every span recorded inside the block."""
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def observe(name, seconds, **labels):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.observe(name, seconds, **{**_labels.get(), **labels})
+
+
+def count(name, value=1, **labels):
+    """Counters are keyed by their explicit labels only, so they aggregate across URLs."""
+    metrics = _current.get()
+    if metrics is not None and value:
+        metrics.count(name, value, **labels)
+
+
+@contextmanager
+def span(name, **labels):
+    """Times the block (works in sync and async code: `with span("upload"): await ...`)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
@@ -1,13 +1,87 @@
 import json
 import os
+import re
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+from utils import metrics
+from utils.keyframes import extract_frames_at
+from utils.results import AuditResult, Issue
+
+# --- CONFIGURATION ---
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
+STYLESHEET = "report.css"
+BYTECODE_CACHE_DIR = Path("output") / ".cache" / "jinja"
+INDEX_FILENAME = "index.html"
+INDEX_LOG_FILENAME = "index.jsonl"
+INDEX_ROWS_MARKER = "<!-- /rows -->"   # New index rows are inserted right before this
+INDEX_TAIL_BYTES = 8192                # The marker is always within this many bytes of the end
+THUMB_DIR = "thumbs"                   # Issue thumbnails, next to the reports
+
+# Reports may be generated from worker threads; index appends must not interleave
+_index_lock = threading.Lock()
+
+SEVERITY_STYLES = {
+    "High": ("border-red-500", "bg-red-100 text-red-800"),
+    "Medium": ("border-yellow-500", "bg-yellow-100 text-yellow-800"),
+    "Low": ("border-blue-500", "bg-blue-100 text-blue-800"),
+}
+
+
+def _purge_css(css, used):
+    """Keeps the rules whose class selectors all appear in `used` (plain rules always stay)."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    kept = []
+    for selector, body in re.findall(r"([^{}]+)\{([^{}]*)\}", css):
+        classes = [c.replace("\\", "") for c in re.findall(r"\.((?:\\.|[\w-])+)", selector)]
+        if all(c in used for c in classes):
+            kept.append(f"{' '.join(selector.split())}{{{' '.join(body.split())}}}")
+    return "".join(kept)
+
+
+@lru_cache(maxsize=1)
+def _inline_css():
+    """report.css purged against every template (and this module's class strings), once per process."""
+    sources = [p.read_text(encoding="utf-8") for p in TEMPLATE_DIR.glob("*.html")]
+    sources.append(Path(__file__).read_text(encoding="utf-8"))
+    used = set(re.findall(r"[\w.:-]+", " ".join(sources)))
+    return Markup(_purge_css((TEMPLATE_DIR / STYLESHEET).read_text(encoding="utf-8"), used))
+
+
+@lru_cache(maxsize=1)
+def _environment():
+    """
+    One Jinja environment per process: templates are compiled once and kept in
+    memory, and the compiled bytecode is cached on disk for the next process.
+    """
+    BYTECODE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=select_autoescape(["html"]),
+        bytecode_cache=FileSystemBytecodeCache(str(BYTECODE_CACHE_DIR)),
+        auto_reload=False,
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    env.globals["inline_css"] = _inline_css()
+    return env
+
+
+def _template(name):
+    return _environment().get_template(name)
+
+
 class HTMLReporter:
     def __init__(self, output_dir="output"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
-    
+
     def _get_grade(self, score):
         if score >= 9: return "A+", "text-green-600 bg-green-50"
         if score >= 8: return "A", "text-green-500 bg-green-50"
@@ -15,111 +89,137 @@ class HTMLReporter:
         if score >= 4: return "C", "text-yellow-600 bg-yellow-50"
         return "F", "text-red-600 bg-red-50"
 
-    def generate_report(self, json_data, video_filename):
+    def generate_report(self, json_data, video_filename=None, report_name=None, url=None):
+        started = time.perf_counter()
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-        score = json_data.get('ux_score', 0)
+        # Accepts an AuditResult or a plain dict (e.g. a saved JSON report)
+        result = json_data if isinstance(json_data, AuditResult) else AuditResult.from_dict(json_data)
+        score = result.ux_score
         grade, grade_color = self._get_grade(score)
-        issues = json_data.get('issues', [])
-        
-        # Sort issues: High -> Medium -> Low
-        priority_map = {"High": 0, "Medium": 1, "Low": 2}
-        issues.sort(key=lambda x: priority_map.get(x.get('severity', 'Low'), 3))
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>VisionQA Audit Report</title>
-            <script src="https://cdn.tailwindcss.com"></script>
-            <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;700&display=swap" rel="stylesheet">
-            <style>
-                body {{ font-family: 'Inter', sans-serif; background-color: #F3F4F6; }}
-                .glass {{ background: rgba(255, 255, 255, 0.95); backdrop-filter: blur(10px); }}
-            </style>
-        </head>
-        <body class="p-8">
-            <div class="max-w-4xl mx-auto space-y-6">
-                
-                <div class="glass rounded-2xl p-8 shadow-sm border border-gray-200 flex justify-between items-center">
-                    <div>
-                        <h1 class="text-3xl font-bold text-gray-900 tracking-tight">VisionQA <span class="text-indigo-600">Audit</span></h1>
-                        <p class="text-gray-500 mt-2">Generated on {timestamp}</p>
-                    </div>
-                    <div class="text-right">
-                        <div class="text-sm font-semibold text-gray-400 uppercase tracking-wider">UX Score</div>
-                        <div class="text-6xl font-black {grade_color.split()[0]}">{score}<span class="text-3xl text-gray-300">/10</span></div>
-                        <div class="inline-block px-3 py-1 rounded-full text-xs font-bold mt-2 {grade_color}">{grade} GRADE</div>
-                    </div>
-                </div>
-
-                <div class="glass rounded-2xl p-8 shadow-sm border border-gray-200">
-                    <h2 class="text-lg font-bold text-gray-900 mb-4 flex items-center">
-                        <svg class="w-5 h-5 mr-2 text-indigo-500" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M15 10l4.553-2.276A1 1 0 0121 8.618v6.764a1 1 0 01-1.447.894L15 14M5 18h8a2 2 0 002-2V8a2 2 0 00-2-2H5a2 2 0 00-2 2v8a2 2 0 002 2z"></path></svg>
-                        Verification Artifact (Video)
-                    </h2>
-                    <div class="aspect-w-16 aspect-h-9 bg-gray-900 rounded-lg overflow-hidden">
-                        <video controls class="w-full h-full object-contain">
-                            <source src="{video_filename}" type="video/mp4">
-                            Your browser does not support the video tag.
-                        </video>
-                    </div>
-                </div>
-
-                <div class="glass rounded-2xl p-8 shadow-sm border border-gray-200">
-                    <h2 class="text-lg font-bold text-gray-900 mb-2">Executive Summary</h2>
-                    <p class="text-gray-700 leading-relaxed text-lg">{json_data.get('description', 'No summary provided.')}</p>
-                </div>
-
-                <div class="space-y-4">
-                    <h2 class="text-xl font-bold text-gray-900 ml-1">Detected Issues ({len(issues)})</h2>
-                    
-                    {''.join([self._render_issue(i) for i in issues])}
-                    
-                    { '<div class="p-8 text-center text-gray-500 italic">✨ Clean Bill of Health! No significant issues found.</div>' if not issues else '' }
-                </div>
-
-            </div>
-        </body>
-        </html>
-        """
-        
+        issues = result.sorted_issues()
+
         # Save HTML file
-        report_filename = f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        # Named after the video so concurrent audits never overwrite each other
+        report_name = report_name or (Path(video_filename).stem if video_filename
+                                      else datetime.now().strftime('%Y%m%d_%H%M%S'))
+        # Device matrix: one card (score + video) per device, issues seek in their own device's video
+        devices = result.extra.get("devices") or {}
+        videos = {name: info.get("video") for name, info in devices.items()} or {None: video_filename}
+        thumbs = {}
+        for device, video in videos.items():
+            device_issues = [i for i in issues if i.extra.get("device") == device]
+            name = f"{report_name}_{device}" if device else report_name
+            for seconds, path in self._write_thumbnails(device_issues, video, name).items():
+                thumbs[device, seconds] = path
+
+        device_cards = []
+        for device, info in devices.items():
+            card_grade, card_color = self._get_grade(info["ux_score"]) if "ux_score" in info else ("-", "text-gray-500 bg-gray-100")
+            device_cards.append({
+                "name": device, "viewport": info.get("viewport"), "score": info.get("ux_score"),
+                "grade": card_grade, "grade_color": card_color, "issue_count": info.get("issue_count", 0),
+                "error": info.get("error"), "video": info.get("video"),
+                "video_mime": self._video_mime_type(info.get("video")), "poster": thumbs.get((device, 0.0)),
+                "incremental": info.get("incremental"), "dom_checks": info.get("dom_checks"),
+                "triage": info.get("triage"),
+            })
+
+        html_content = _template("report.html").render(
+            url=url,
+            timestamp=timestamp,
+            score=score,
+            grade=grade,
+            grade_color=grade_color,
+            description=result.description,
+            video_filename=video_filename,
+            video_mime=self._video_mime_type(video_filename),
+            poster=thumbs.get((None, 0.0)),
+            devices=device_cards,
+            issue_blocks=[self._render_issue(i, thumbs.get((i.extra.get("device"), i.seconds))) for i in issues],
+            incremental=result.extra.get("incremental"),
+            dom_checks=result.extra.get("dom_checks"),
+            triage=result.extra.get("triage"),
+            resolved=[Issue.from_dict(i) for i in result.extra.get("resolved_issues", [])],
+        )
+
+        report_filename = f"report_{report_name}.html"
         report_path = self.output_dir / report_filename
-        
+
         with open(report_path, "w", encoding="utf-8") as f:
             f.write(html_content)
-            
+
+        self.append_to_index({
+            "timestamp": timestamp,
+            "url": url or report_name,
+            "score": score,
+            "grade": grade,
+            "grade_color": grade_color,
+            "counts": result.severity_counts(),
+            "report": report_filename,
+        })
+        metrics.observe("report", time.perf_counter() - started)
         return report_path
 
-    def _render_issue(self, issue):
-        severity = issue.get('severity', 'Low')
-        
-        colors = {
-            "High": "border-l-4 border-red-500 bg-white",
-            "Medium": "border-l-4 border-yellow-500 bg-white",
-            "Low": "border-l-4 border-blue-500 bg-white"
-        }
-        
-        badge_colors = {
-            "High": "bg-red-100 text-red-800",
-            "Medium": "bg-yellow-100 text-yellow-800",
-            "Low": "bg-blue-100 text-blue-800"
-        }
-
-        return f"""
-        <div class="p-6 rounded-lg shadow-sm {colors.get(severity, 'bg-white')} transition hover:shadow-md">
-            <div class="flex justify-between items-start">
-                <div class="flex items-center space-x-3">
-                    <span class="px-2.5 py-0.5 rounded-full text-xs font-medium {badge_colors.get(severity)}">
-                        {severity.upper()}
-                    </span>
-                    <span class="text-sm text-gray-400 font-mono">{issue.get('timestamp', '00:00')}</span>
-                </div>
-            </div>
-            <h3 class="mt-2 text-lg font-bold text-gray-900">{issue.get('issue', 'Unknown Issue')}</h3>
-            <p class="mt-1 text-gray-600">{issue.get('details', '')}</p>
-        </div>
-        """
\ No newline at end of file
+    def append_to_index(self, entry):
+        """
+        Adds one row to output/index.html without re-rendering it: the new row
+        is written over the tail at the rows marker and the tail is put back.
+        Every entry is also appended to index.jsonl for scripts.
+        """
+        index_path = self.output_dir / INDEX_FILENAME
+        row = _template("index_row.html").render(**entry).encode("utf-8")
+        with _index_lock:
+            if not index_path.exists():
+                index_path.write_text(_template("index.html").render(), encoding="utf-8")
+
+            with open(index_path, "r+b") as f:
+                size = f.seek(0, os.SEEK_END)
+                tail_start = max(0, size - INDEX_TAIL_BYTES)
+                f.seek(tail_start)
+                tail = f.read()
+                marker = tail.rfind(INDEX_ROWS_MARKER.encode("utf-8"))
+                if marker < 0:
+                    raise ValueError(f"{index_path} has no rows marker; delete it to rebuild.")
+                f.seek(tail_start + marker)
+                f.write(row + tail[marker:])
+                f.truncate()
+
+            with open(self.output_dir / INDEX_LOG_FILENAME, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _write_thumbnails(self, issues, video_filename, report_name):
+        """
+        {seconds: relative path} for a poster (0.0) and every issue timestamp,
+        all taken in one decode pass. Best effort: a report without thumbnails
+        is still a report.
+        """
+        video_path = self.output_dir / video_filename if video_filename else None
+        if video_path is None or not video_path.exists():
+            return {}
+        try:
+            with metrics.span("thumbnails"):
+                stills = extract_frames_at(video_path, [0.0] + [i.seconds for i in issues])
+        except Exception as e:
+            print(f"    Thumbnails skipped: {e}")
+            return {}
+
+        thumb_dir = self.output_dir / THUMB_DIR
+        thumb_dir.mkdir(exist_ok=True)
+        thumbs, written = {}, {}
+        for seconds, jpeg in stills.items():
+            # Neighbouring timestamps often resolve to the same frame; write it once
+            if id(jpeg) not in written:
+                name = f"{report_name}_{len(written):02d}.jpg"
+                (thumb_dir / name).write_bytes(jpeg)
+                written[id(jpeg)] = f"{THUMB_DIR}/{name}"
+            thumbs[seconds] = written[id(jpeg)]
+        return thumbs
+
+    def _video_mime_type(self, video_filename):
+        if video_filename and str(video_filename).lower().endswith(".webm"):
+            return "video/webm"
+        return "video/mp4"
+
+    def _render_issue(self, issue, thumb=None):
+        border, badge = SEVERITY_STYLES.get(issue.severity, SEVERITY_STYLES["Low"])
+        return Markup(_template("issue.html").render(issue=issue, border=border, badge=badge, thumb=thumb))
@@ -0,0 +1,218 @@
+"""
+The audit result model: one typed shape for what Gemini returns, shared by the
+analyst, the console summary and the HTML report, plus the single tolerant
+parser that turns model text into it.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field, replace
+
+from utils.jsonstream import IssueStreamParser
+from utils.timecode import parse_timestamp
+
+SEVERITIES = ("High", "Medium", "Low")
+SEVERITY_ORDER = {"High": 0, "Medium": 1, "Low": 2}
+SEVERITY_ALIASES = {"critical": "High", "major": "High", "moderate": "Medium", "minor": "Low"}
+# Per-device run notes kept by AuditResult.merge_devices (issues are tagged instead)
+DEVICE_NOTES = ("incremental", "dom_checks", "triage")
+
+# Passed to the SDK as response_schema, so the model is constrained to this shape
+RESULT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "description": {"type": "STRING"},
+        "ux_score": {"type": "INTEGER"},
+        "issues": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "timestamp": {"type": "STRING"},
+                    "severity": {"type": "STRING", "enum": list(SEVERITIES)},
+                    "issue": {"type": "STRING"},
+                    "details": {"type": "STRING"},
+                },
+                "required": ["timestamp", "severity", "issue", "details"],
+                "property_ordering": ["timestamp", "severity", "issue", "details"],
+            },
+        },
+    },
+    "required": ["description", "ux_score", "issues"],
+    # Summary first, so streamed issues aren't held back by it
+    "property_ordering": ["description", "ux_score", "issues"],
+}
+
+
+def _severity(value):
+    text = str(value or "Low").strip()
+    text = SEVERITY_ALIASES.get(text.lower(), text.capitalize())
+    return text if text in SEVERITY_ORDER else "Low"
+
+
+@dataclass(slots=True)
+class Issue:
+    timestamp: str = "00:00"
+    severity: str = "Low"
+    issue: str = "Unknown Issue"
+    details: str = ""
+    extra: dict = field(default_factory=dict)  # Any other keys, kept verbatim
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {"timestamp", "severity", "issue", "details"}
+        return cls(
+            timestamp=str(data.get("timestamp") or "00:00"),
+            severity=_severity(data.get("severity")),
+            issue=str(data.get("issue") or "Unknown Issue"),
+            details=str(data.get("details") or ""),
+            extra={k: v for k, v in data.items() if k not in known},
+        )
+
+    def to_dict(self):
+        return {"timestamp": self.timestamp, "severity": self.severity,
+                "issue": self.issue, "details": self.details, **self.extra}
+
+    @property
+    def seconds(self):
+        return parse_timestamp(self.timestamp) or 0.0
+
+    @property
+    def rank(self):
+        return SEVERITY_ORDER.get(self.severity, 3)
+
+
+@dataclass(slots=True)
+class AuditResult:
+    description: str = "No summary provided."
+    ux_score: int = 0
+    issues: list = field(default_factory=list)   # [Issue]
+    extra: dict = field(default_factory=dict)    # e.g. segments, failed_segments, salvaged
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {"description", "ux_score", "issues"}
+        try:
+            score = int(round(float(data.get("ux_score", 0))))
+        except (TypeError, ValueError):
+            score = 0
+        return cls(
+            description=str(data.get("description") or "No summary provided."),
+            ux_score=max(0, min(10, score)),
+            issues=[Issue.from_dict(i) for i in data.get("issues") or [] if isinstance(i, dict)],
+            extra={k: v for k, v in data.items() if k not in known},
+        )
+
+    def to_dict(self):
+        return {"description": self.description, "ux_score": self.ux_score,
+                "issues": [i.to_dict() for i in self.issues], **self.extra}
+
+    @classmethod
+    def merge_devices(cls, results):
+        """
+        One result from {device: AuditResult}: every issue (and resolved
+        issue) is tagged with its device, the overall score is the mean of
+        the device scores, and extra["devices"] keeps each device's own
+        score, summary and per-run notes (incremental, dom_checks, triage).
+        """
+        if not results:
+            raise ValueError("No device results to merge.")
+        issues, resolved, devices = [], [], {}
+        for name, result in results.items():
+            issues.extend(replace(i, extra={**i.extra, "device": name}) for i in result.issues)
+            resolved.extend({**i, "device": name} for i in result.extra.get("resolved_issues", []))
+            devices[name] = {"ux_score": result.ux_score, "description": result.description,
+                             "issue_count": len(result.issues)}
+            devices[name].update((k, result.extra[k]) for k in DEVICE_NOTES if k in result.extra)
+        scores = [d["ux_score"] for d in devices.values()]
+        extra = {"devices": devices}
+        if resolved:
+            extra["resolved_issues"] = resolved
+        return cls(
+            description=next(iter(results.values())).description,
+            ux_score=round(sum(scores) / len(scores)),
+            issues=issues,
+            extra=extra,
+        )
+
+    def sorted_issues(self):
+        """High -> Medium -> Low, then by time. The one place severity sorting lives."""
+        return sorted(self.issues, key=lambda i: (i.rank, i.seconds))
+
+    def severity_counts(self):
+        counts = {s: 0 for s in SEVERITIES}
+        for issue in self.issues:
+            counts[issue.severity] = counts.get(issue.severity, 0) + 1
+        return counts
+
+
+def _strip_fences(text):
+    clean = text.strip()
+    if clean.startswith('```'):
+        clean = re.sub(r'^```(?:json)?\s*', '', clean)
+        clean = re.sub(r'\s*```$', '', clean)
+    return clean
+
+
+def _repair(text):
+    start = text.find("{")
+    if start < 0:
+        return None
+    candidate = text[start:]
+    candidate = re.sub(r'//[^\n"]*\n', '\n', candidate)        # Comments copied from the prompt
+    candidate = re.sub(r',\s*([}\]])', r'\1', candidate)       # Trailing commas
+    try:
+        value = json.loads(candidate)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _salvage(text):
+    """
+    Last resort for truncated output: keep every complete issue plus whatever
+    summary fields are readable. A half-written issue is dropped, not guessed.
+    """
+    parser = IssueStreamParser()
+    issues = parser.feed(text)
+    score = re.search(r'"ux_score"\s*:\s*(\d+)', text)
+    description = re.search(r'"description"\s*:\s*"((?:[^"\\]|\\.)*)"', text)
+    if not issues and not score:
+        return None
+    return {
+        "description": json.loads(f'"{description.group(1)}"') if description else "No summary provided.",
+        "ux_score": int(score.group(1)) if score else 0,
+        "issues": issues,
+        "salvaged": True,
+    }
+
+
+def parse_audit(text):
+    """
+    The single parse path for model output: strict JSON first, then repair
+    (fences, comments, trailing commas), then salvage of the complete issues
+    of a truncated answer. Raises ValueError only when nothing usable is left, so callers can
+    decide whether a re-query is worth it.
+    """
+    if isinstance(text, AuditResult):
+        return text
+    if isinstance(text, dict):
+        return AuditResult.from_dict(text)
+
+    clean = _strip_fences(text or "")
+    try:
+        data = json.loads(clean)
+        if isinstance(data, dict):
+            return AuditResult.from_dict(data)
+    except ValueError:
+        pass
+
+    data = _repair(clean)
+    if data is not None:
+        data.setdefault("repaired", True)
+        return AuditResult.from_dict(data)
+
+    data = _salvage(clean)
+    if data is not None:
+        return AuditResult.from_dict(data)
+    raise ValueError(f"Model output is not usable JSON: {clean[:200]!r}")
@@ -0,0 +1,104 @@
+"""
+Helpers for segmented analysis: split a recording into overlapping windows,
+move each window's issue timestamps back onto the full timeline and merge
+the per-window results into one.
+"""
+
+from difflib import SequenceMatcher
+
+from utils.results import SEVERITY_ORDER
+from utils.timecode import format_timestamp, parse_timestamp
+
+# --- CONFIGURATION ---
+SEGMENT_SECONDS = 30
+SEGMENT_OVERLAP_SECONDS = 5
+SEGMENT_CONCURRENCY = 3
+SEGMENT_RETRIES = 2
+DUPLICATE_TITLE_SIMILARITY = 0.6
+
+
+def plan_segments(duration, window=SEGMENT_SECONDS, overlap=SEGMENT_OVERLAP_SECONDS):
+    """[(start, end), ...] covering 0..duration with `overlap` seconds shared between neighbours."""
+    if duration <= window:
+        return [(0.0, float(duration))]
+    step = window - overlap
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(start + window, duration)
+        segments.append((start, end))
+        if end >= duration:
+            break
+        start += step
+    # A tiny tail window adds a model call for almost no new footage
+    if len(segments) > 1 and segments[-1][1] - segments[-1][0] <= overlap:
+        segments.pop()
+        segments[-1] = (segments[-1][0], float(duration))
+    return segments
+
+
+def shift_issues(issues, offset, end=None):
+    """Copies issues with timestamps moved from segment-relative to original-video time."""
+    shifted = []
+    for issue in issues:
+        issue = dict(issue)
+        seconds = (parse_timestamp(issue.get("timestamp", 0)) or 0) + offset
+        if end is not None:
+            seconds = min(seconds, end)  # The model sometimes overshoots the clip length
+        issue["timestamp"] = format_timestamp(seconds)
+        shifted.append(issue)
+    return shifted
+
+
+def same_issue(a, b, tolerance):
+    """Close in time and with similar titles (issue dicts)."""
+    ta, tb = parse_timestamp(a.get("timestamp")), parse_timestamp(b.get("timestamp"))
+    if ta is None or tb is None or abs(ta - tb) > tolerance:
+        return False
+    title_a = str(a.get("issue", "")).lower().strip()
+    title_b = str(b.get("issue", "")).lower().strip()
+    return SequenceMatcher(None, title_a, title_b).ratio() >= DUPLICATE_TITLE_SIMILARITY
+
+
+def dedupe_issues(issues, tolerance=SEGMENT_OVERLAP_SECONDS):
+    """
+    Drops issues reported twice by overlapping windows: close in time and with
+    similar titles. The more severe (then more detailed) report wins.
+    """
+    ranked = sorted(issues, key=lambda i: (SEVERITY_ORDER.get(i.get("severity", "Low"), 3),
+                                           -len(str(i.get("details", "")))))
+    kept = []
+    for issue in ranked:
+        if not any(same_issue(issue, other, tolerance) for other in kept):
+            kept.append(issue)
+    kept.sort(key=lambda i: parse_timestamp(i.get("timestamp")) or 0)
+    return kept
+
+
+def merge_segment_results(results, segments):
+    """
+    Combines per-window results (None for windows that failed for good).
+    The score is the duration-weighted mean of the windows that succeeded.
+    """
+    issues, weighted, total = [], 0.0, 0.0
+    description = None
+    failed = []
+    for data, (start, end) in zip(results, segments):
+        if data is None:
+            failed.append({"start": format_timestamp(start), "end": format_timestamp(end)})
+            continue
+        description = description or data.get("description")
+        issues.extend(shift_issues(data.get("issues", []), start, end))
+        if isinstance(data.get("ux_score"), (int, float)):
+            weighted += data["ux_score"] * (end - start)
+            total += end - start
+
+    merged = {
+        "description": description or "No summary provided.",
+        "ux_score": round(weighted / total) if total else 0,
+        "issues": dedupe_issues(issues),
+        "segments": len(segments),
+    }
+    if failed:
+        merged["failed_segments"] = failed
+    return merged
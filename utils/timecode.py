@@ -0,0 +1,18 @@
+def format_timestamp(seconds):
+    """12.7 -> '00:12' (the MM:SS format the audit prompt asks for)."""
+    seconds = max(0, int(round(seconds)))
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_timestamp(value):
+    """'01:05' / '1:05.5' / '00:01:05' / 65 -> seconds as float; None if unparseable."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        parts = [float(p) for p in str(value).strip().split(":")]
+    except ValueError:
+        return None
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
@@ -0,0 +1,121 @@
+"""
+Post-recording transcode stage.
+Playwright writes VP8 WebM at the full viewport size; this turns it into a small
+H.264 MP4 for upload and a full-quality MP4 for the report, using ffmpeg in a
+separate process so the event loop keeps running other sessions.
+"""
+
+import asyncio
+import shutil
+import time
+from pathlib import Path
+
+from utils import metrics
+
+# Named profiles. height/fps of None keep the source value.
+TRANSCODE_PROFILES = {
+    "analysis": {"height": 720, "fps": 5, "crf": 34, "preset": "veryfast", "maxrate": "600k"},
+    "archive": {"height": None, "fps": None, "crf": 23, "preset": "medium", "maxrate": None},
+}
+
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+
+def _ffmpeg_args(src, dst, profile):
+    filters = []
+    if profile["height"]:
+        filters.append(f"scale=-2:{profile['height']}")
+    if profile["fps"]:
+        filters.append(f"fps={profile['fps']}")
+
+    args = ["ffmpeg", "-y", "-v", "error", "-i", str(src), "-an"]
+    if filters:
+        args += ["-vf", ",".join(filters)]
+    args += ["-c:v", "libx264", "-preset", profile["preset"], "-crf", str(profile["crf"])]
+    if profile["maxrate"]:
+        rate = int(profile["maxrate"].rstrip("k"))
+        args += ["-maxrate", profile["maxrate"], "-bufsize", f"{rate * 2}k"]
+    # yuv420p + faststart: plays in every browser and streams before fully loaded
+    args += ["-pix_fmt", "yuv420p", "-movflags", "+faststart", str(dst)]
+    return args
+
+
+async def _run_ffmpeg(args, what):
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg ({what}) failed: {stderr.decode(errors='replace').strip()[-500:]}")
+
+
+async def transcode(src, dst, profile_name):
+    """Encodes src into dst with a named profile; returns size/time info."""
+    profile = TRANSCODE_PROFILES[profile_name]
+    src, dst = Path(src), Path(dst)
+
+    started = time.perf_counter()
+    with metrics.span("transcode", profile=profile_name):
+        await _run_ffmpeg(_ffmpeg_args(src, dst, profile), profile_name)
+
+    info = {
+        "profile": profile_name,
+        "path": str(dst),
+        "bytes_in": src.stat().st_size,
+        "bytes_out": dst.stat().st_size,
+        "encode_s": round(time.perf_counter() - started, 2),
+    }
+    metrics.count("transcoded_bytes", info["bytes_out"], profile=profile_name)
+    print(f"    Transcoded [{profile_name}]: {info['bytes_in'] / 1e6:.2f} MB -> "
+          f"{info['bytes_out'] / 1e6:.2f} MB in {info['encode_s']}s")
+    return info
+
+
+async def cut_segment(src, dst, start, duration):
+    """Re-encodes [start, start+duration) of src into dst (accurate cuts, analysis quality)."""
+    profile = TRANSCODE_PROFILES["analysis"]
+    await _run_ffmpeg([
+        "ffmpeg", "-y", "-v", "error", "-ss", f"{start:.3f}", "-i", str(src), "-t", f"{duration:.3f}",
+        "-an", "-c:v", "libx264", "-preset", profile["preset"], "-crf", str(profile["crf"]),
+        "-pix_fmt", "yuv420p", "-movflags", "+faststart", str(dst),
+    ], "segment cut")
+    return str(dst)
+
+
+async def transcode_recording(raw_path, keep_raw=False):
+    """
+    Produces {"analysis": path, "archive": path} from a raw recording.
+    Both encodes run in parallel. Without ffmpeg, or when it fails on this
+    recording, the raw WebM is used for both, which is still a correctly
+    labelled container.
+    """
+    raw_path = Path(raw_path)
+    if not ffmpeg_available():
+        print("    ffmpeg not found; using the raw WebM for analysis and report.")
+        return {"analysis": str(raw_path), "archive": str(raw_path)}
+
+    analysis_path = raw_path.with_name(f"{raw_path.stem}_analysis.mp4")
+    archive_path = raw_path.with_suffix(".mp4")
+    outcomes = await asyncio.gather(
+        transcode(raw_path, analysis_path, "analysis"),
+        transcode(raw_path, archive_path, "archive"),
+        return_exceptions=True,
+    )
+    errors = [e for e in outcomes if isinstance(e, Exception)]
+    if errors:
+        print(f"    Transcode failed ({errors[0]}); using the raw WebM for analysis and report.")
+        metrics.count("transcode_failures")
+        analysis_path.unlink(missing_ok=True)
+        archive_path.unlink(missing_ok=True)
+        return {"analysis": str(raw_path), "archive": str(raw_path)}
+    if not keep_raw:
+        raw_path.unlink(missing_ok=True)
+    return {"analysis": str(analysis_path), "archive": str(archive_path)}